@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""表达式解析的耗时，对比单次扫描的词法解析和原先多次正则替换的解析，结果一致性由tests/test_config.py检查."""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests'))
+
+from pyvoxel.config import ConfigMethod  # noqa: E402
+from analyse_legacy import CORPUS, analyse_legacy, generate  # noqa: E402
+
+
+def uncached(expr, localkeys=()):
+    """不使用解析缓存的单次扫描."""
+    ConfigMethod.ANALYSE_CACHE.clear()
+    return ConfigMethod.analyse(expr, localkeys)
+
+
+def bench(size, number=20):
+    """返回原先的解析、单次扫描和命中缓存的耗时（毫秒）."""
+    expr = generate(size)
+    result = []
+    for analyse in (analyse_legacy, uncached, ConfigMethod.analyse):
+        begin = time.perf_counter()
+        for _ in range(number):
+            analyse(expr)
+        result.append((time.perf_counter() - begin) / number * 1e3)
+    return result
+
+
+def bench_short(number=200):
+    """返回原先的解析、单次扫描和命中缓存对短表达式的平均耗时（微秒）."""
+    result = []
+    for analyse in (analyse_legacy, uncached, ConfigMethod.analyse):
+        begin = time.perf_counter()
+        for _ in range(number):
+            for expr, localkeys in CORPUS:
+                analyse(expr, localkeys)
+        result.append((time.perf_counter() - begin) / number / len(CORPUS) * 1e6)
+    return result
+
+
+if __name__ == '__main__':
+    legacy, scan, cached = bench_short()
+    print('{} short expressions: legacy {:.1f}us, scan {:.1f}us, cached {:.1f}us'.format(len(CORPUS), legacy, scan, cached))
+    print()
+    print('{:>6} {:>12} {:>12} {:>12}'.format('terms', 'legacy', 'scan', 'cached'))
+    for size in (10, 50, 200, 1000):
+        legacy, scan, cached = bench(size)
+        print('{:>6} {:>10.2f}ms {:>10.2f}ms {:>10.2f}ms'.format(size, legacy, scan, cached))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""大量绑定相同表达式的兄弟节点，对比逐个计算和使用numpy批量计算的传播耗时."""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyvoxel.log import Log  # noqa: E402
+from pyvoxel.config import Config  # noqa: E402
+from pyvoxel.bulk import Bulk  # noqa: E402
+
+
+def generate(count):
+    """生成count个子节点的配置，子节点的位置由父节点的位置和间距计算."""
+    lines = ['<Row(Node) -> row>:', '    x: 0', '    spacing: 2']
+    for n in range(count):
+        lines.append('    Node:')
+        lines.append('        index: {}'.format(n))
+        lines.append('        x: p.x + index * p.spacing')
+        lines.append('        y: (x * x + index * index) ** 0.5 * p.spacing + x / (index + 1)')
+    return '\n'.join(lines) + '\n'
+
+
+def bench(count, number=10, repeat=3):
+    """返回逐个计算和批量计算时每次修改父节点属性的耗时，以及只计算所有子节点y属性的耗时."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        row = Config(cache=False).load(generate(count)).children[0].create(compact=True)
+    keys = [(child, 'y') for child in row.children]
+    propagate = {False: [], True: []}
+    evaluate = {False: [], True: []}
+    for _ in range(repeat):
+        for enabled in (False, True):
+            Bulk.enabled = enabled
+            begin = time.perf_counter()
+            for n in range(number):
+                row.x = n
+                row.spacing = n % 3 + 1
+            propagate[enabled].append((time.perf_counter() - begin) / number / 2)
+            last = row.children[-1]
+            assert abs(last.y - ((last.x * last.x + last.index * last.index) ** 0.5 * row.spacing + last.x / (last.index + 1))) < 1e-9
+
+            begin = time.perf_counter()
+            if enabled:
+                assert not Bulk.update(keys)
+            else:
+                for node, name in keys:
+                    node._update_value(name)
+            evaluate[enabled].append(time.perf_counter() - begin)
+    Bulk.disable()
+    return min(propagate[False]), min(propagate[True]), min(evaluate[False]), min(evaluate[True])
+
+
+if __name__ == '__main__':
+    Log.setLevel('WARNING')
+    if not Bulk.available:
+        print('numpy not installed')
+        sys.exit(1)
+    counts = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000]
+    print('{:>8} {:>12} {:>12} {:>12} {:>12}'.format('nodes', 'propagate', 'bulk', 'evaluate', 'bulk'))
+    for count in counts:
+        times = bench(count)
+        print('{:>8} {:>10.2f}ms {:>10.2f}ms {:>10.2f}ms {:>10.2f}ms'.format(count, *(t * 1000 for t in times)))
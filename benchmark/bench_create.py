@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""实例化大量节点的耗时."""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pyvoxel.log import Log  # noqa: E402
+from pyvoxel.config import Config  # noqa: E402
+import bench_memory  # noqa: E402
+
+
+def bench(count, repeat=3):
+    """返回实例化包含count个子节点的节点树的耗时，分别使用__dict__和__slots__保存属性."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        root = Config(cache=False).load(bench_memory.generate(count))
+    grid = root.children[-1]
+    result = []
+    for compact in (False, True):
+        times = []
+        for _ in range(repeat):
+            begin = time.perf_counter()
+            grid.create(compact=compact)
+            times.append(time.perf_counter() - begin)
+        result.append(min(times))
+    return result
+
+
+if __name__ == '__main__':
+    Log.setLevel('WARNING')
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    print('{:>8} {:>12} {:>12} {:>12}'.format('nodes', 'dict', 'slots', 'per node'))
+    for count in counts:
+        loose, compact = bench(count)
+        print('{:>8} {:>10.1f}ms {:>10.1f}ms {:>10.2f}us'.format(count, loose * 1000, compact * 1000, loose / count * 1e6))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""绑定表达式的计算耗时，对比每次编译字符串和使用缓存的代码对象."""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyvoxel.config import ConfigMethod  # noqa: E402
+from pyvoxel.node import Node  # noqa: E402
+
+
+EXPRS = [
+    'p.x + index * spacing',
+    'p.testa + p.testb * p.testb - c0.testc',
+    '(c0.c0.width + c1.width) / 2 + p.margin * (p.p.scale - 1)',
+    '[c0.x + c1.x, c0.y + c1.y, max(c0.z, c1.z)]',
+]
+
+
+def bench_eval(number):
+    """单个表达式计算的耗时（微秒）."""
+    result = []
+    for raw in EXPRS:
+        expr, xmap, smap = ConfigMethod.analyse(raw)
+        local = dict(smap)
+        local.update({iname: max if pname == 'self.max' else 2 for iname, pname in xmap.items()})  # 内建函数也被解析为变量
+        code = ConfigMethod.compile(expr)
+
+        source = timeit.timeit(lambda: eval(expr, None, local), number=number)
+        compiled = timeit.timeit(lambda: eval(code, None, local), number=number)
+        result.append((raw, source / number * 1e6, compiled / number * 1e6))
+    return result
+
+
+def bench_update(number):
+    """Node._update_value一次更新的耗时（微秒）."""
+    class Target(Node):
+        pass
+
+    expr, xmap, smap = ConfigMethod.analyse('p.x + index * spacing')
+    local = {iname: 1 for iname in xmap}
+
+    result = []
+    for name, reflex in (('source', lambda: expr), ('compiled', lambda: ConfigMethod.compile(expr))):
+        node = Target()
+        node._reflex = {'y': (reflex(), dict(local))}
+        if name == 'source':  # 模拟每次更新都从字符串表达式开始，编译结果来自共享的缓存
+            def update():
+                node._reflex['y'] = expr, node._reflex['y'][1]
+                node._update_value('y')
+        else:
+            def update():
+                node._update_value('y')
+        result.append((name, timeit.timeit(update, number=number) / number * 1e6))
+    return result
+
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print('{:<70} {:>10} {:>10}'.format('expression', 'eval(str)', 'eval(code)'))
+    for raw, source, compiled in bench_eval(number):
+        print('{:<70} {:>8.3f}us {:>8.3f}us'.format(raw, source, compiled))
+    print()
+    for name, cost in bench_update(number):
+        print('Node._update_value {:<10} {:>8.3f}us'.format(name, cost))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""深层继承链<T(S(s), t1)>下配置加载和属性访问的耗时."""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyvoxel.config import Config, ConfigSource  # noqa: E402
+from pyvoxel.manager import Manager  # noqa: E402
+
+
+def generate(depth, attrs=4):
+    """生成继承链，每一层继承上一层和一个公共的基类，并添加属性和子节点."""
+    lines = ['<Mixin(Node) -> m>:', '    mixin: 1']
+    lines.append('<Chain0(Node) -> c>:')
+    lines.append('    a0_0: 0')
+    for i in range(1, depth):
+        lines.append('<Chain{i}(Chain{j}(c), Mixin(m)) -> c>:'.format(i=i, j=i - 1))
+        for n in range(attrs):
+            lines.append('    a{i}_{n}: a{j}_{n} + mixin'.format(i=i, j=i - 1, n=n) if i > 1 else '    a{i}_{n}: a0_0 + {n}'.format(i=i, n=n))
+        lines.append('    Node:')
+        lines.append('        v{i}: p.a{i}_0 * 2'.format(i=i))
+    return '\n'.join(lines) + '\n'
+
+
+def bench(depth, number=1000):
+    """返回加载耗时和最深节点attr, ids, children的访问耗时（秒）."""
+    config = Config(cache=False)
+    sconfig = {
+        'globals': sys.modules[Config.__module__].__dict__,
+        'plugins': Manager.plugins,
+    }
+    lines = generate(depth).split('\n')
+
+    begin = time.perf_counter()
+    is_success, info = config._load(ConfigSource(lines), sconfig)
+    load_time = time.perf_counter() - begin
+    if not is_success:
+        raise Exception(info)
+    root, _ = info
+
+    node = root.children[-1]
+    begin = time.perf_counter()
+    for _ in range(number):
+        node.attr, node.ids, node.children
+    access_time = (time.perf_counter() - begin) / number
+    return load_time, access_time
+
+
+if __name__ == '__main__':
+    print('{:>6} {:>12} {:>14}'.format('depth', 'load', 'access'))
+    for depth in (8, 16, 32, 64, 128):
+        load_time, access_time = bench(depth)
+        print('{:>6} {:>10.2f}ms {:>12.2f}us'.format(depth, load_time * 1e3, access_time * 1e6))
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""高度图地形按相机距离选择LOD，对比全部使用原始精度的块时的三角形数和内存."""
+import collections
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pyvoxel.log import Log  # noqa: E402
+from pyvoxel.plugins.terrain.chunk import ChunkStore  # noqa: E402
+from pyvoxel.plugins.terrain.lod import LodTree  # noqa: E402
+import bench_terrain  # noqa: E402
+
+
+def bench(width, height, radius):
+    """返回生成LOD的耗时、选择节点的耗时、每层选择的节点数以及两种方式的三角形数和网格字节数."""
+    store = ChunkStore(16)
+    bench_terrain.generate(store, width, height)
+    lod = LodTree(store, radius=radius)
+    begin = time.perf_counter()
+    lod.refresh()
+    refresh = time.perf_counter() - begin
+
+    camera = (width / 2, width / 2, height)
+    begin = time.perf_counter()
+    selected = lod.select(camera)
+    select = time.perf_counter() - begin
+
+    full = [lod.mesh(0, key) for key in store.chunks]
+    meshes = [lod.mesh(level, key) for level, key in selected]
+    levels = collections.Counter(level for level, _ in selected)
+    return (refresh, select, [levels[level] for level in range(lod.levels + 1)], lod.nbytes, store.nbytes,
+            sum(mesh.triangles for mesh in full), sum(mesh.triangles for mesh in meshes),
+            sum(mesh.nbytes for mesh in full), sum(mesh.nbytes for mesh in meshes))
+
+
+if __name__ == '__main__':
+    Log.setLevel('WARNING')
+    widths = [int(arg) for arg in sys.argv[1:]] or [512, 1024]
+    height = 128
+    print('{:>6} {:>10} {:>8} {:>20} {:>8} {:>8} {:>10} {:>10} {:>10} {:>10}'.format(
+        'width', 'refresh', 'select', 'level 0/1/2/3', 'lod', 'chunks', 'full tris', 'lod tris', 'full mesh', 'lod mesh'))
+    for width in widths:
+        refresh, select, levels, lod_bytes, chunk_bytes, full_tris, lod_tris, full_mesh, lod_mesh = bench(width, height, 64)
+        print('{:>6} {:>8.0f}ms {:>6.1f}ms {:>20} {:>6.1f}MB {:>6.1f}MB {:>10} {:>10} {:>8.1f}MB {:>8.1f}MB'.format(
+            width, refresh * 1000, select * 1000, '/'.join(str(count) for count in levels), lod_bytes / 1e6, chunk_bytes / 1e6,
+            full_tris, lod_tris, full_mesh / 1e6, lod_mesh / 1e6))
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""日志调用的耗时，对比同步日志、异步日志和关闭的日志级别."""
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyvoxel.log import Log  # noqa: E402
+
+
+def bench(count):
+    """返回每次调用Log.debug的耗时."""
+    begin = time.perf_counter()
+    for n in range(count):
+        Log.debug('Bind %s.%s failed - %s not found', 'Node', n, 'self.p.x')
+    return (time.perf_counter() - begin) / count
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    stream = open(os.devnull, 'w')
+    for handler in Log.handlers:
+        handler.setStream(stream)
+
+    sync_time = bench(count)
+    Log.start_async()
+    async_time = bench(count)
+    Log.stop_async()
+    Log.setLevel(logging.INFO)
+    disabled_time = bench(count)
+    Log.setLevel(logging.DEBUG)
+    stream.close()
+
+    print('{} calls'.format(count))
+    print('sync     {:>8.2f} us/call'.format(sync_time * 1e6))
+    print('async    {:>8.2f} us/call'.format(async_time * 1e6))
+    print('disabled {:>8.2f} us/call'.format(disabled_time * 1e6))
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""实例化节点的内存占用，对比使用__dict__和__slots__保存属性的节点."""
+import contextlib
+import gc
+import io
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyvoxel.config import Config  # noqa: E402
+
+
+def generate(count, attrs=8):
+    """生成包含count个子节点的配置，子节点有静态属性，其中一半有依赖父节点的动态属性."""
+    lines = ['<Scene(Node) -> scene>:', '    spacing: 2']
+    lines.append('<Item(Node) -> item>:')
+    for n in range(attrs):
+        lines.append('    a{n}: {n}'.format(n=n))
+    lines.append('<Grid(Scene(scene)) -> grid>:')
+    for n in range(count):
+        lines.append('    Item(item):')
+        if n % 2 == 0:
+            lines.append('        x: p.spacing * a0')
+    return '\n'.join(lines) + '\n'
+
+
+def object_size(node):
+    """节点对象本身和__dict__的字节数，不包含属性值."""
+    size = sys.getsizeof(node)
+    if hasattr(node, '__dict__'):
+        size += sys.getsizeof(node.__dict__)
+    return size
+
+
+def allocated(grid, compact):
+    """实例化一次，返回分配的字节数和实例."""
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        begin = tracemalloc.get_traced_memory()[0]
+        scene = grid.create(compact=compact)
+        end = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return end - begin, scene
+
+
+def bench(count, compact):
+    """
+    返回每个节点首次实例化和再次实例化时分配的字节数，以及节点对象本身的字节数.
+
+    首次实例化包含配置节点缓存的模板，再次实例化时只有实例本身的数据
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        root = Config(cache=False).load(generate(count))
+    grid = root.children[-1]
+
+    first, scene = allocated(grid, compact)
+    del scene
+    gc.collect()
+    again, scene = allocated(grid, compact)
+    assert len(scene.children) == count
+    return first / (count + 1), again / (count + 1), object_size(scene.children[0])
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print('{} nodes {:>16} {:>16} {:>16}'.format(count, 'first', 'instance', 'object'))
+    for name, compact in (('Node     (__dict__) ', False), ('NodeBase (__slots__)', True)):
+        first, again, size = bench(count, compact=compact)
+        print('{} {:>10.0f} bytes/node {:>10.0f} bytes/node {:>6} bytes/node'.format(name, first, again, size))
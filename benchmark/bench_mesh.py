@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""生成高度图地形所有块的网格，对比合并相同材质的面和每个面单独生成矩形的速度以及三角形数."""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pyvoxel.log import Log  # noqa: E402
+from pyvoxel.plugins.terrain.chunk import ChunkStore  # noqa: E402
+from pyvoxel.plugins.terrain.mesh import build  # noqa: E402
+import bench_terrain  # noqa: E402
+
+
+def bench(store, greedy):
+    """返回生成所有块的网格的耗时和三角形数，读取相邻体素的耗时单独统计."""
+    begin = time.perf_counter()
+    padded = [(store.padded(key), store.origin(key)) for key in store.chunks]
+    read = time.perf_counter() - begin
+
+    triangles = 0
+    begin = time.perf_counter()
+    for values, origin in padded:
+        triangles += build(values, origin, greedy).triangles
+    return read, time.perf_counter() - begin, triangles
+
+
+if __name__ == '__main__':
+    Log.setLevel('WARNING')
+    widths = [int(arg) for arg in sys.argv[1:]] or [128, 256]
+    height = 128
+    print('{:>6} {:>8} {:>10} {:>12} {:>12} {:>12} {:>12} {:>8}'.format(
+        'width', 'chunks', 'read', 'greedy', 'naive', 'greedy tris', 'naive tris', 'ratio'))
+    for width in widths:
+        store = ChunkStore(16)
+        bench_terrain.generate(store, width, height)
+        read, greedy, greedy_triangles = bench(store, True)
+        _, naive, naive_triangles = bench(store, False)
+        chunks = len(store)
+        print('{:>6} {:>8} {:>8.0f}ms {:>8.0f}/s {:>8.0f}/s {:>12} {:>12} {:>7.1f}x'.format(
+            width, chunks, read * 1000, chunks / greedy, chunks / naive,
+            greedy_triangles, naive_triangles, naive_triangles / max(greedy_triangles, 1)))
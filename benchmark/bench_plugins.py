@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""插件管理的启动时间，对比顺序导入、并行导入和延迟导入."""
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP = '''
+import sys, time
+sys.path.insert(0, {root!r})
+sys.path.insert(0, '.')
+begin = time.perf_counter()
+from pyvoxel.log import Log
+Log.setLevel('WARNING')
+from pyvoxel.manager import Manager
+Manager.auto_load(lazy={lazy}, workers={workers})
+end = time.perf_counter()
+assert Manager('Plugin0').test() == 0
+if not {lazy}:
+    assert Manager('Plugin{last}').test() == {last}
+    slowest = max(Manager.load_time.items(), key=lambda item: item[1])
+    print(slowest[0], slowest[1])
+print(end - begin)
+'''
+
+
+def generate(plugin_dir, count, work=20000, wait=0.002):
+    """生成count个用户插件，每个插件导入时做一些模块级计算和等待io."""
+    os.makedirs(plugin_dir)
+    open(os.path.join(plugin_dir, '__init__.py'), 'w').close()
+    for n in range(count):
+        path = os.path.join(plugin_dir, 'plugin{}'.format(n))
+        os.makedirs(path)
+        open(os.path.join(path, '__init__.py'), 'w').close()
+        with open(os.path.join(path, 'plugin{}.py'.format(n)), 'w') as fp:
+            fp.write('import time\n\nTABLE = [i * i for i in range({work})]\ntime.sleep({wait})\n\n\n'.format(work=work, wait=wait))
+            fp.write('class Plugin{n}(object):\n    def test(self):\n        return {n}\n'.format(n=n))
+
+
+def startup(cwd, count, lazy, workers=1):
+    """在新进程中启动插件管理，返回启动耗时和导入最慢的插件，插件索引保存在cwd下."""
+    code = STARTUP.format(root=ROOT, lazy=lazy, workers=workers, last=count - 1)
+    env = dict(os.environ, XDG_CACHE_HOME=os.path.join(cwd, 'cache'))
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=cwd, env=env).decode('utf-8').split()
+    slowest = '{} {:.1f}ms'.format(output[0], float(output[1]) * 1000) if len(output) > 1 else ''
+    return float(output[-1]), slowest
+
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [10, 100, 500]
+    workers = 8
+    print('{:>8} {:>12} {:>12} {:>12} {:>12}  {}'.format('plugins', 'eager', 'parallel', 'lazy scan', 'lazy index', 'slowest'))
+    for count in counts:
+        with tempfile.TemporaryDirectory() as cwd:
+            generate(os.path.join(cwd, 'plugins'), count)
+            lazy_scan = startup(cwd, count, True)[0]  # 第一次启动时扫描目录并生成索引
+            lazy_index = startup(cwd, count, True)[0]
+            eager, slowest = startup(cwd, count, False)
+            parallel = startup(cwd, count, False, workers=workers)[0]
+            print('{:>8} {:>10.1f}ms {:>10.1f}ms {:>10.1f}ms {:>10.1f}ms  {}'.format(
+                count, eager * 1000, parallel * 1000, lazy_scan * 1000, lazy_index * 1000, slowest))
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""修改大配置中的一个属性后，对比重新加载整个配置和增量重新加载的耗时."""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyvoxel.log import Log  # noqa: E402
+from pyvoxel.config import Config  # noqa: E402
+
+
+def generate(count, value=0):
+    """生成count个根类的配置，每个根类有若干属性和子节点，修改value只会改变第一个根类."""
+    lines = ['<Block0(Node) -> b0>:', '    a: {}'.format(value), '    b: a + 1']
+    for n in range(1, count):
+        lines.append('<Block{n}(Node) -> b{n}>:'.format(n=n))
+        lines.append('    a: {n}'.format(n=n))
+        lines.append('    b: a * 2')
+        lines.append('    c: [a, b, {n}]'.format(n=n))
+        lines.append('    Node:')
+        lines.append('        d: p.a + p.b')
+    return '\n'.join(lines) + '\n'
+
+
+def bench(count, repeat=3):
+    """返回全量加载和增量加载的耗时."""
+    conf = Config(cache=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        conf.load(generate(count))
+        full = []
+        incremental = []
+        for n in range(repeat):
+            begin = time.perf_counter()
+            Config(cache=False).load(generate(count, n + 1))
+            full.append(time.perf_counter() - begin)
+
+            data = generate(count, n + 1)
+            begin = time.perf_counter()
+            root = conf.reload(data)
+            incremental.append(time.perf_counter() - begin)
+            assert root.children[0].attr['b'][3][0] == n + 2
+    return min(full), min(incremental)
+
+
+if __name__ == '__main__':
+    Log.setLevel('WARNING')
+    counts = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000]
+    print('{:>8} {:>12} {:>12}'.format('roots', 'load', 'reload'))
+    for count in counts:
+        full, incremental = bench(count)
+        print('{:>8} {:>10.1f}ms {:>10.1f}ms'.format(count, full * 1000, incremental * 1000))
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""对比从配置实例化节点树和从快照还原节点树的耗时."""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pyvoxel.log import Log  # noqa: E402
+from pyvoxel.config import Config  # noqa: E402
+from pyvoxel.snapshot import Snapshot  # noqa: E402
+import bench_memory  # noqa: E402
+
+
+def bench(count, path):
+    """返回加载配置并实例化、保存快照、还原快照以及只读打开快照的耗时和快照的字节数."""
+    begin = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        grid = Config(cache=False).load(bench_memory.generate(count)).children[-1].create()
+    create = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    assert Snapshot.save(grid, path)
+    save = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    node = Snapshot.load(path)
+    load = time.perf_counter() - begin
+    assert len(node.children) == count
+
+    begin = time.perf_counter()
+    with Snapshot.open(path) as reader:
+        assert len(reader.children(0)) == count
+    open_time = time.perf_counter() - begin
+    return create, save, load, open_time, os.path.getsize(path)
+
+
+if __name__ == '__main__':
+    Log.setLevel('WARNING')
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]
+    print('{:>8} {:>12} {:>12} {:>12} {:>12} {:>10}'.format('nodes', 'create', 'save', 'load', 'open', 'size'))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for count in counts:
+            create, save, load, open_time, size = bench(count, os.path.join(temp_dir, 'scene.pvs'))
+            print('{:>8} {:>10.1f}ms {:>10.1f}ms {:>10.1f}ms {:>10.2f}ms {:>8.1f}MB'.format(
+                count, create * 1000, save * 1000, load * 1000, open_time * 1000, size / 1e6))
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""加载大配置文件时的内存峰值，对比先读取整个文件再解析和逐行读取解析."""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyvoxel.log import Log  # noqa: E402
+from pyvoxel.config import Config, ConfigMethod  # noqa: E402
+
+
+def generate(fp, roots, children):
+    """写入roots个根类，每个根类有children个带注释和静态属性的子节点."""
+    for n in range(roots):
+        fp.write('<Block{n}(Node) -> b{n}>:\n'.format(n=n))
+        fp.write('    size: {n}\n'.format(n=n))
+        for m in range(children):
+            fp.write('    # generated child {m} of block {n}, padding the file like real generated configs do\n'.format(n=n, m=m))
+            fp.write('    Node:\n')
+            fp.write('        name: "child_{n}_{m}"\n'.format(n=n, m=m))
+            fp.write('        value: {m}\n'.format(m=m))
+
+
+def bench(path, stream):
+    """返回加载时的内存峰值、加载后保留的内存和耗时."""
+    ConfigMethod.CODE_CACHE.clear()  # 编译和解析缓存会保留到下一次加载
+    ConfigMethod.ANALYSE_CACHE.clear()
+    tracemalloc.start()
+    begin = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if stream:
+            root = Config(cache=False).load(path)
+        else:  # 读取整个文件后从字符串加载
+            with open(path, 'r', encoding='utf-8') as fp:
+                root = Config(cache=False).load(fp.read())
+    elapsed = time.perf_counter() - begin
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert root is not None
+    return peak, current, elapsed
+
+
+if __name__ == '__main__':
+    Log.setLevel('WARNING')
+    roots = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    children = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'large.pv')
+        with open(path, 'w', encoding='utf-8') as fp:
+            generate(fp, roots, children)
+        print('{} roots, {} children, {:.1f}MB'.format(roots, children, os.path.getsize(path) / 1e6))
+        print('{:>8} {:>12} {:>12} {:>12}'.format('', 'peak', 'retained', 'time'))
+        for name, stream in (('read', False), ('stream', True)):
+            peak, current, elapsed = bench(path, stream)
+            print('{:>8} {:>10.1f}MB {:>10.1f}MB {:>10.2f}s'.format(name, peak / 1e6, current / 1e6, elapsed))
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""生成高度图地形，对比分块存储和完整体素数组的内存占用，以及单个体素的读写速度."""
+import os
+import random
+import sys
+import time
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyvoxel.log import Log  # noqa: E402
+from pyvoxel.plugins.terrain.chunk import ChunkStore  # noqa: E402
+
+STONE, DIRT, GRASS = 1, 2, 3
+
+
+def heightmap(width, height, seed=0):
+    """起伏的高度图，高度在[height / 4, height * 3 / 4)之间."""
+    rng = numpy.random.RandomState(seed)
+    x, y = numpy.meshgrid(numpy.arange(width), numpy.arange(width), indexing='ij')
+    result = numpy.zeros((width, width))
+    for scale in (64, 32, 16):
+        phase = rng.uniform(0, numpy.pi * 2, 2)
+        result += numpy.sin(x / scale + phase[0]) * numpy.cos(y / scale + phase[1]) * scale
+    result = (result - result.min()) / (result.max() - result.min() + 1e-9)
+    return (height / 4 + result * height / 2).astype(numpy.int64)
+
+
+def generate(store, width, height):
+    """按块的列写入地形，z轴向上，地表为草，下面三层为土，再下面为石头."""
+    heights = heightmap(width, height)
+    z = numpy.arange(height)
+    size = store.size
+    for x in range(0, width, size):
+        for y in range(0, width, size):
+            top = heights[x:x + size, y:y + size, None]
+            column = numpy.zeros((size, size, height), dtype=numpy.uint16)
+            column[z < top - 4] = STONE
+            column[(z >= top - 4) & (z < top - 1)] = DIRT
+            column[z == top - 1] = GRASS
+            store.write((x, y, 0), column)
+
+
+def bench(width, height, count=100000):
+    """返回生成地形的耗时、块的统计、序号数组的字节数以及单个体素读写的耗时."""
+    store = ChunkStore(16)
+    begin = time.perf_counter()
+    generate(store, width, height)
+    build = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    store.fill((0, 0, 0), (width, width, height // 8), STONE)  # 覆盖整块的区域只保存一个材质
+    fill = time.perf_counter() - begin
+
+    chunks = len(store)
+    uniform = sum(1 for chunk in store.chunks.values() if chunk.uniform)
+    nbytes = store.nbytes
+
+    rng = random.Random(0)
+    points = [(rng.randrange(width), rng.randrange(width), rng.randrange(height)) for _ in range(count)]
+    begin = time.perf_counter()
+    for x, y, z in points:
+        store.get(x, y, z)
+    get = time.perf_counter() - begin
+    begin = time.perf_counter()
+    for x, y, z in points:
+        store.set(x, y, z, DIRT)
+    set_time = time.perf_counter() - begin
+    return build, fill, chunks, uniform, nbytes, get / count, set_time / count
+
+
+if __name__ == '__main__':
+    Log.setLevel('WARNING')
+    widths = [int(arg) for arg in sys.argv[1:]] or [256, 512, 1024]
+    height = 256
+    print('{:>6} {:>10} {:>10} {:>8} {:>8} {:>10} {:>10} {:>8} {:>8}'.format(
+        'width', 'build', 'fill', 'chunks', 'uniform', 'chunked', 'dense', 'get', 'set'))
+    for width in widths:
+        build, fill, chunks, uniform, nbytes, get, set_time = bench(width, height)
+        dense = width * width * height * 2
+        print('{:>6} {:>8.0f}ms {:>8.1f}ms {:>8} {:>8} {:>8.1f}MB {:>8.1f}MB {:>6.2f}us {:>6.2f}us'.format(
+            width, build * 1000, fill * 1000, chunks, uniform, nbytes / 1e6, dense / 1e6, get * 1e6, set_time * 1e6))
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""检查包含大量互不依赖根类的配置，对比单进程和进程池并行检查的耗时."""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pyvoxel.log import Log  # noqa: E402
+from pyvoxel.config import Config  # noqa: E402
+import bench_reload  # noqa: E402
+
+
+def bench(count, workers, repeat=3):
+    """返回检查count个根类的配置的耗时."""
+    data = bench_reload.generate(count)
+    times = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        errors = Config(cache=False).validate(data, workers=workers)
+        times.append(time.perf_counter() - begin)
+        assert not errors, errors[:3]
+    return min(times)
+
+
+if __name__ == '__main__':
+    Log.setLevel('WARNING')
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 5000]
+    workers = os.cpu_count() or 1
+    print('{} cpu'.format(workers))
+    print('{:>8} {:>12} {:>12}'.format('roots', 'serial', 'parallel'))
+    for count in counts:
+        serial = bench(count, 1)
+        parallel = bench(count, max(workers, 2))
+        print('{:>8} {:>10.1f}ms {:>10.1f}ms'.format(count, serial * 1000, parallel * 1000))
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""生成高度图地形所有块的网格，对比主线程、线程池和进程池的吞吐量，以及随工作数增加相对单线程的加速比."""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pyvoxel.log import Log  # noqa: E402
+from pyvoxel.plugins.terrain.chunk import ChunkStore  # noqa: E402
+from pyvoxel.plugins.terrain.schedule import MeshScheduler  # noqa: E402
+from pyvoxel.plugins.terrain.worker import MeshWorkers  # noqa: E402
+import bench_terrain  # noqa: E402
+
+
+def bench(store, workers, processes):
+    """返回生成所有块的网格的吞吐量，workers为0时在主线程中生成，先完整生成一次，启动工作进程的耗时不计入."""
+    pool = MeshWorkers(store.size, workers, processes) if workers else None
+    try:
+        scheduler = MeshScheduler(store, workers=pool)
+        scheduler.flush()
+        store.dirty.update(store.chunks)
+        begin = time.perf_counter()
+        scheduler.flush()
+        elapsed = time.perf_counter() - begin
+        assert len(scheduler.meshes) == len(store)
+    finally:
+        if pool is not None:
+            pool.close()
+    return len(store) / elapsed
+
+
+def counts(cpus):
+    """测试的工作数，2的幂直到cpu数的2倍，包括cpu数."""
+    result = {cpus}
+    workers = 1
+    while workers <= cpus * 2:
+        result.add(workers)
+        workers *= 2
+    return sorted(result)
+
+
+if __name__ == '__main__':
+    Log.setLevel('WARNING')
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    height = 128
+    cpus = os.cpu_count() or 1
+    store = ChunkStore(16)
+    bench_terrain.generate(store, width, height)
+    print('{} cpu, {}x{}x{}, {} chunks'.format(cpus, width, width, height, len(store)))
+    single = bench(store, 0, False)
+    print('{:>8} {:>12} {:>8} {:>12} {:>8}'.format('workers', 'threads', 'speedup', 'processes', 'speedup'))
+    print('{:>8} {:>10.0f}/s {:>7.2f}x {:>12} {:>8}'.format('main', single, 1, '-', '-'))
+    for workers in counts(cpus):
+        threads = bench(store, workers, False)
+        processes = bench(store, workers, True)
+        print('{:>8} {:>10.0f}/s {:>7.2f}x {:>10.0f}/s {:>7.2f}x'.format(workers, threads, threads / single, processes, processes / single))
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+基准测试集，结果保存为json，用于比较不同提交之间的性能.
+
+python benchmark/suite.py -o result.json
+python benchmark/suite.py --quick --compare result.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pyvoxel.log import Log  # noqa: E402
+from pyvoxel.config import Config, ConfigMethod, ConfigSource  # noqa: E402
+from pyvoxel.manager import Manager  # noqa: E402
+import bench_plugins  # noqa: E402
+
+
+def generate(roots=10, depth=3, width=3, inherit=2, terms=2):
+    """
+    生成配置.
+
+    roots: 根类的数量
+    depth, width: 每个根类中子节点的层数和每层的子节点数
+    inherit: 根类继承链的长度
+    terms: 表达式中引用其他属性的项数
+    """
+    lines = ['<Base0(Node) -> base0>:']
+    for n in range(terms):
+        lines.append('    a{n}: {n}'.format(n=n))
+    for i in range(1, inherit + 1):
+        lines.append('<Base{i}(Base{j}(base{j})) -> base{i}>:'.format(i=i, j=i - 1))
+        lines.append('    b{i}: a0 + {i}'.format(i=i))
+    base = 'Base{i}(base{i})'.format(i=inherit)
+
+    def node_lines(space, deep):
+        if deep == depth:
+            return []
+        result = []
+        for _ in range(width):
+            result.append(space + 'Node:')
+            expr = ' + '.join('p.{} * {}'.format('v' if k % 2 == 0 else 'w', k + 1) for k in range(terms))
+            result.append(space + '    v: ' + expr)
+            result.append(space + '    w: v + 1')
+            result.extend(node_lines(space + '    ', deep + 1))
+        return result
+
+    for r in range(roots):
+        lines.append('<Scene{r}({base}) -> scene{r}>:'.format(r=r, base=base))
+        lines.append('    v: ' + ' + '.join('a{n}'.format(n=n) for n in range(terms)))
+        lines.append('    w: v * 2')
+        lines.extend(node_lines('    ', 0))
+    return '\n'.join(lines) + '\n'
+
+
+def measure(func, repeat):
+    """多次运行，返回最小和平均耗时."""
+    times = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - begin)
+    return min(times), sum(times) / len(times)
+
+
+def sconfig():
+    """解析时可以使用的外部类."""
+    return {
+        'globals': sys.modules[Config.__module__].__dict__,
+        'plugins': Manager.plugins,
+    }
+
+
+def parse(text):
+    """解析配置，返回根节点."""
+    is_success, info = Config(cache=False)._load(ConfigSource(text.split('\n')), sconfig())
+    if not is_success:
+        raise Exception(info)
+    return info[0]
+
+
+def bench_load(params, repeat):
+    """Config.load的耗时."""
+    text = generate(**params)
+
+    def load():
+        ConfigMethod.ANALYSE_CACHE.clear()  # 每次都从没有解析缓存的状态开始加载
+        Config(cache=False).load(text)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return measure(load, repeat)
+
+
+def bench_execute(params, repeat):
+    """所有属性ConfigNode._execute的耗时，每次计算前恢复为未检查的属性."""
+    root = parse(generate(**params))
+    nodes = [node for node, deep in root.walk(isroot=False)]
+    raw = {node: {name: (line, note, 'uncheck', attr[1]) for name, (line, note, check, attr) in node._attr.items()} for node in nodes}
+
+    def execute():
+        for node in nodes:
+            for name, attr in raw[node].items():
+                node._set_attr(name, attr)
+        for node in nodes:
+            for name in raw[node]:
+                node._execute(name)
+    return measure(execute, repeat)
+
+
+def bench_propagate(params, repeat, number=100):
+    """修改根节点属性后传播到所有子节点的耗时，返回每次修改的耗时."""
+    root = parse(generate(**params))
+    with contextlib.redirect_stdout(io.StringIO()):
+        scene = root.children[-1].create()
+
+    def propagate():
+        for n in range(number):
+            scene.a0 = n
+    best, mean = measure(propagate, repeat)
+    return best / number, mean / number
+
+
+def bench_manager(params, repeat):
+    """在新进程中启动插件管理，返回扫描（使用索引）和全部导入的耗时."""
+    scan = []
+    load = []
+    with tempfile.TemporaryDirectory() as cwd:
+        bench_plugins.generate(os.path.join(cwd, 'plugins'), params['plugins'], work=1000, wait=0)
+        bench_plugins.startup(cwd, params['plugins'], True)  # 生成索引
+        for _ in range(repeat):
+            scan.append(bench_plugins.startup(cwd, params['plugins'], True)[0])
+            load.append(bench_plugins.startup(cwd, params['plugins'], False)[0])
+    return (min(scan), sum(scan) / repeat), (min(load), sum(load) / repeat)
+
+
+def cases(quick):
+    """测试用例，以默认参数为基础每次改变一个参数."""
+    base = {'roots': 5 if quick else 20, 'depth': 3, 'width': 3, 'inherit': 2, 'terms': 2}
+    variants = [{}]
+    for key, values in (('depth', (1, 4)), ('width', (1, 5)), ('inherit', (0, 8)), ('terms', (1, 8))):
+        for value in values:
+            variants.append({key: value})
+    for variant in variants:
+        params = dict(base)
+        params.update(variant)
+        yield params
+
+
+def run(quick=False):
+    """运行所有测试，返回结果列表."""
+    repeat = 3 if quick else 5
+    results = []
+
+    def record(name, params, timing):
+        best, mean = timing
+        results.append({'name': name, 'params': params, 'best': best, 'mean': mean})
+        print('{:<24} {:<60} {:>10.3f}ms'.format(name, json.dumps(params, sort_keys=True), best * 1000))
+
+    for params in cases(quick):
+        record('config.load', params, bench_load(params, repeat))
+        ConfigMethod.CODE_CACHE.clear()
+        record('confignode.execute', params, bench_execute(params, repeat))
+        record('node.propagate', params, bench_propagate(params, repeat))
+
+    for count in ((10, 100) if quick else (10, 100, 500)):
+        params = {'plugins': count}
+        scan, load = bench_manager(params, repeat)
+        record('manager.auto_scan', params, scan)
+        record('manager.auto_load', params, load)
+    return results
+
+
+def commit():
+    """当前的提交."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL).decode('utf-8').strip()
+    except Exception:
+        return ''
+
+
+def compare(results, path):
+    """和之前保存的结果比较，输出耗时的变化."""
+    with open(path, 'r', encoding='utf-8') as fp:
+        old = json.load(fp)
+    old_results = {(item['name'], json.dumps(item['params'], sort_keys=True)): item for item in old['results']}
+    print()
+    print('compare with {} ({})'.format(path, old['meta'].get('commit', '')[:8]))
+    for item in results:
+        key = item['name'], json.dumps(item['params'], sort_keys=True)
+        if key not in old_results:
+            continue
+        ratio = item['best'] / old_results[key]['best'] if old_results[key]['best'] else 0
+        print('{:<24} {:<60} {:>8.2f}x'.format(key[0], key[1], ratio))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='pyvoxel benchmark suite')
+    parser.add_argument('-o', '--output', help='保存结果的json文件')
+    parser.add_argument('--compare', help='用于比较的json文件')
+    parser.add_argument('--quick', action='store_true', help='减小配置规模和重复次数')
+    args = parser.parse_args()
+
+    Log.setLevel('WARNING')
+    results = run(quick=args.quick)
+    data = {
+        'meta': {
+            'commit': commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'quick': args.quick,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fp:
+            json.dump(data, fp, indent=2)
+    if args.compare:
+        compare(results, args.compare)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""使用numpy批量计算绑定的属性."""
+from pyvoxel.pattern.singleton import Singleton
+from pyvoxel.log import Log
+from pyvoxel.node import Propagation
+
+
+class BulkBase(Singleton):
+    """
+    批量计算属性传播中表达式相同的属性.
+
+    同一个配置类实例化的大量兄弟节点通常绑定相同的表达式，例如x: p.x + index * spacing
+    传播时同一层中使用同一个代码对象的属性，把表达式中的变量组成数组，只计算一次表达式再写回各个节点
+    每个变量的值必须全部是int或者全部是float，bool等其他类型的计算结果与逐个计算不同，退回到逐个计算
+    整数使用int64计算，同时用float64计算一次，结果不一致（int64溢出）时退回到逐个计算
+    计算出错（包括除零和溢出等浮点错误）时同样退回到逐个计算，错误由逐个计算时记录
+    节点的读取和写回仍然逐个进行，只有表达式本身的计算是批量的，表达式简单时加速有限
+
+    Bulk.enable()
+    with node.batch():
+        node.x = 1
+    """
+
+    DTYPE = {int: 'int64', float: 'float64'}  # 可以批量计算的变量类型，bool是int的子类，需要精确匹配类型
+
+    def __init__(self):
+        """默认关闭."""
+        self._numpy = False  # 第一次使用时导入，导入numpy较慢，没有开启批量计算时不导入
+        self.enabled = False
+        self.threshold = 64  # 表达式相同的属性数不小于该值时批量计算
+
+    @property
+    def numpy(self):
+        """numpy模块，没有安装时为None."""
+        if self._numpy is False:
+            try:
+                import numpy
+            except ImportError:  # numpy是可选的依赖，没有安装时逐个计算
+                numpy = None
+            self._numpy = numpy
+        return self._numpy
+
+    @property
+    def available(self):
+        """是否安装了numpy."""
+        return self.numpy is not None
+
+    @property
+    def enabled(self):
+        """是否开启了批量计算，开启时属性传播使用Bulk计算."""
+        return Propagation.bulk is self
+
+    @enabled.setter
+    def enabled(self, enabled):
+        Propagation.bulk = self if enabled else None
+
+    def enable(self, threshold=None):
+        """开始批量计算，没有安装numpy时返回False."""
+        if self.numpy is None:
+            Log.warning('Bulk binding requires numpy')
+            return False
+        if threshold is not None:
+            self.threshold = threshold
+        self.enabled = True
+        return True
+
+    def disable(self):
+        """停止批量计算."""
+        self.enabled = False
+
+    def update(self, keys):
+        """keys为可以同时计算的(节点, 属性)列表，批量计算表达式相同的属性，返回需要逐个计算的属性."""
+        groups = {}
+        for key in keys:
+            node, name = key
+            groups.setdefault(node._reflex[name][0], []).append(key)
+
+        rest = []
+        for expr, group in groups.items():
+            if len(group) < self.threshold or not self._evaluate(expr, group):
+                rest.extend(group)
+        return rest
+
+    def _arrays(self, local_list):
+        """表达式中的变量组成的数组，有变量不全是int或者不全是float时返回空."""
+        arrays = {}
+        for iname in local_list[0]:
+            values = [local[iname] for local in local_list]
+            types = set(map(type, values))
+            if len(types) != 1:
+                return None
+            dtype = self.DTYPE.get(types.pop())
+            if dtype is None:
+                return None
+            arrays[iname] = self.numpy.array(values, dtype=dtype)
+        return arrays
+
+    def _evaluate(self, expr, group):
+        """计算一组表达式相同的属性，无法批量计算或者结果可能与逐个计算不同时返回False."""
+        numpy = self.numpy
+        local_list = [node._reflex[name][1] for node, name in group]
+        try:
+            arrays = self._arrays(local_list)
+            if arrays is None:
+                return False
+            with numpy.errstate(all='raise'):
+                result = eval(expr, None, arrays)
+                if not isinstance(result, numpy.ndarray) or result.shape != (len(group),) or result.dtype.kind not in 'bif':
+                    return False
+                if any(array.dtype.kind == 'i' for array in arrays.values()):  # int64可能溢出，与float64的结果对比
+                    check = eval(expr, None, {iname: array.astype('float64') for iname, array in arrays.items()})
+                    if result.dtype.kind == 'b':
+                        if not numpy.array_equal(result, check):
+                            return False
+                    elif not numpy.allclose(result, check, rtol=1e-9, atol=0) or numpy.abs(check).max() >= 2 ** 62:
+                        return False
+        except Exception:
+            return False
+
+        for (node, name), value in zip(group, result.tolist()):
+            ovalue = getattr(node, name, None)
+            object.__setattr__(node, name, value)
+            try:
+                node._on_func(name, ovalue, value)
+            except Exception as ex:
+                Log.error(ex)
+        return True
+
+    def gather(self, nodes, name, dtype=None):
+        """节点属性组成的数组."""
+        return self.numpy.array([getattr(node, name) for node in nodes], dtype=dtype)
+
+    def scatter(self, nodes, name, values):
+        """把数组中的值依次设置到节点的属性，所有修改在一次批量修改中传播."""
+        if not nodes:
+            return
+        if isinstance(values, self.numpy.ndarray):
+            values = values.tolist()
+        with nodes[0].batch():
+            for node, value in zip(nodes, values):
+                setattr(node, name, value)
+
+
+Bulk = BulkBase()
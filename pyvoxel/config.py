@@ -1,11 +1,23 @@
 # -*- coding: utf-8 -*-
 """解析配置文件."""
 from pyvoxel.manager import Manager
-# from pyvoxel.node import Node
+from pyvoxel.node import EMPTY, NodeBase, Node, Propagation
 from pyvoxel.log import Log
 from ast import literal_eval
-import copy
+import ast
+import bisect
+from types import MappingProxyType
+import hashlib
+import io
+import keyword
+import os
+import pickle
 import re
+import sys
+import tokenize
+import weakref
+from array import array
+from collections import OrderedDict
 
 
 class ConfigMethod:
@@ -26,6 +38,25 @@ class ConfigMethod:
         'type': {k for k, v in globals()['__builtins__'].items() if k[0].islower() and isinstance(v, type)}
     }
 
+    CACHE_SIZE = 4096  # 下面每个缓存最多保留的条目数，超过时淘汰最久未使用的条目
+    CODE_CACHE = OrderedDict()  # 表达式对应的代码对象，避免每次计算时重新编译
+    UNFOLDABLE = OrderedDict()  # 没有可以折叠的运算的(表达式, 常量)，避免每次重新分析语法树
+    ANALYSE_CACHE = OrderedDict()  # 表达式对应的(用到的名称, {用到的别名: 解析结果})，相同的表达式只扫描一次
+
+    # 表达式的词法单元，数字和字符串前缀使用tokenize中的规则，与python的切分方式一致
+    TOKEN = re.compile(r'[ \t\f]*(?:' + '|'.join((  # 词法单元前面的空白一起匹配
+        r'(?P<number>(?=\.?\d)' + tokenize.Number + ')',
+        '(?P<string>' + tokenize.StringPrefix + r'''(?:\'\'\'(?:[^\\]|\\.)*?\'\'\'|"""(?:[^\\]|\\.)*?"""|'(?!'')(?:[^\\'\n]|\\.)*'|"(?!"")(?:[^\\"\n]|\\.)*"))''',
+        '(?P<error>' + tokenize.StringPrefix + r'''(?:\'\'\'|"""))''',  # 没有结束的三引号字符串
+        r'(?P<name>\w+)',
+        r'(?P<comment>#[^\r\n]*)',
+        r'(?P<newline>\r?\n|\r)',
+        r'(?P<open>[(\[{])',
+        r'(?P<close>[)\]}])',
+        r'(?P<op>\.\.\.|.)',
+    )) + ')', re.DOTALL)
+    LITERAL_NAMES = ('True', 'False', 'None', 'set')  # literal_eval中可以出现的名称
+
     BASE_ALIAS = '__ALIAS__'  # 默认别名，使用大写保证和其他别名不相同
     CLASS_SPLIT = '-'  # 类和别名之间的分割符必须是非法的别名字符
 
@@ -192,168 +223,266 @@ class ConfigMethod:
                 return True
         return False
 
+    @classmethod
+    def freeze(self, value):
+        """嵌套的字典转换为只读映射，用于实例之间共享的数据."""
+        if isinstance(value, (dict, MappingProxyType)):
+            return MappingProxyType({k: self.freeze(v) for k, v in value.items()})
+        return value
+
+    @classmethod
+    def thaw(self, value):
+        """只读映射转换回字典，只读映射不能序列化."""
+        if isinstance(value, (dict, MappingProxyType)):
+            return {k: self.thaw(v) for k, v in value.items()}
+        return value
+
+    @classmethod
+    def remember(self, cache, key, value):
+        """把条目放入有上限的缓存，超过上限时淘汰最久未使用的条目."""
+        cache[key] = value
+        if len(cache) > self.CACHE_SIZE:
+            cache.popitem(last=False)
+        return value
+
+    @classmethod
+    def compile(self, expr):
+        """编译表达式，相同的表达式只编译一次."""
+        code = self.CODE_CACHE.get(expr)
+        if code is None:
+            return self.remember(self.CODE_CACHE, expr, compile(expr, '<pv>', 'eval'))
+        self.CODE_CACHE.move_to_end(expr)
+        return code
+
+    @classmethod
+    def fold(self, expr, xmap, smap, const):
+        """常量折叠，const为值不会改变的变量，返回只包含变化部分的(expr, xmap, smap)，折叠后的常量放在smap中."""
+        values = dict(smap)
+        values.update(const)
+        key = expr, tuple(sorted(const))
+        if key in self.UNFOLDABLE:  # 没有可以折叠的运算，常量直接放在smap中
+            self.UNFOLDABLE.move_to_end(key)
+            return expr, {iname: pname for iname, pname in xmap.items() if iname not in const}, values
+
+        folder = ConfigFolder(values)
+        tree = folder.visit(ast.parse(expr, mode='eval'))
+        if not folder.folded:
+            self.remember(self.UNFOLDABLE, key, True)
+            return expr, {iname: pname for iname, pname in xmap.items() if iname not in const}, values
+        names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+        expr = ast.unparse(tree)
+        xmap = {iname: pname for iname, pname in xmap.items() if iname in names and iname not in const}
+        smap = {iname: value for iname, value in values.items() if iname in names and iname not in xmap}
+        return expr, xmap, smap
+
     @staticmethod
-    def analyse(expr, localkeys=()):
-        """解析expr表达式，localkeys为引用的别名列表."""
-        try:
-            literal_eval(expr)
-            return expr, {}, {}
-        except Exception:
-            pass
+    def is_adjacent(tokens, index):
+        """词法单元和前一个单元之间没有空白."""
+        return index > 0 and tokens[index][2] == tokens[index - 1][3]
 
-        #  表达式中的字符串不参与匹配，解析表达式中的字符串
-        cursor = None  # 字符串起始标识
-        sinfo = []  # 字符串起始位置
-        backslash = False  # 反斜杠
-        size = len(expr)  # 字符串长度
-        n = 0
-        while n < size:
-            if cursor is None:
-                if expr[n: n + 3] in ("'''", '"""'):
-                    cursor = expr[n: n + 3]
-                    begin = n
-                    n += 3
-                    continue
-                if expr[n] in ("'", '"'):  # 进入字符串
-                    cursor = expr[n]
-                    begin = n
-            elif backslash:  # 转义字符
-                backslash = False
-            elif expr[n] == '\\':  # 反斜杠
-                backslash = True
-            elif cursor in ("'''", '"""') and expr[n: n + 3] == cursor:
-                cursor = None
+    @classmethod
+    def is_dot(self, tokens, index):
+        """词法单元是紧跟在前一个单元后面的点."""
+        return tokens[index][1] == '.' and self.is_adjacent(tokens, index)
+
+    @classmethod
+    def is_path(self, name):
+        """是否是p或cx形式的节点路径."""
+        name = name.lower()
+        return name == 'p' or (name[:1] == 'c' and name[1:].isdigit())
+
+    @classmethod
+    def chain_name(self, tokens, index):
+        """解析属性链中的一段，parent缩写为p，children[x]缩写为cx，只有后面还有属性时才缩写."""
+        name = tokens[index][1]
+        index += 1
+        size = len(tokens)
+        if name.lower() == 'parent' and index < size and self.is_dot(tokens, index):
+            return 'p', index
+        if name.lower() == 'children' and index + 3 < size and self.is_dot(tokens, index + 3):
+            bracket, number, close = tokens[index: index + 3]  # 索引只能是数字且中间没有空白
+            if bracket[1] == '[' and number[1].isdigit() and close[1] == ']' and \
+                    all(self.is_adjacent(tokens, i) for i in range(index, index + 3)):
+                return 'c' + number[1], index + 3
+        return name, index
+
+    @classmethod
+    def split_chain(self, tokens, index, localkeys):
+        """从index开始解析形如a.parent.children[0].b的属性链，返回各段名称和结束位置."""
+        if tokens[index][1] in localkeys:
+            chain = [tokens[index][1]]
+            index += 1
+        else:  # self可省略，首个名称作为self的属性
+            name, index = self.chain_name(tokens, index)
+            chain = ['self', name]
+
+        size = len(tokens)
+        while index + 1 < size and self.is_dot(tokens, index):
+            if tokens[index + 1][0] != 'name' or not self.is_adjacent(tokens, index + 1):
+                break
+            name, index = self.chain_name(tokens, index + 1)
+            chain.append(name)
+
+        # cx.p.可以省略，p.cx.不可省略，省略后的点不能再参与下一次省略
+        path = chain[:1]
+        n = 1
+        while n < len(chain):
+            if n + 2 < len(chain) and chain[n][0] in 'cC' and self.is_path(chain[n]) and chain[n + 1].lower() == 'p':
+                path.append(chain[n + 2])
                 n += 3
-                sinfo.append((begin, n))
-                continue
-            elif cursor in ("'", '"') and expr[n] == cursor:
-                cursor = None
-                n += 1
-                sinfo.append((begin, n))
                 continue
+            path.append(chain[n])
             n += 1
+        return path, index
+
+    @classmethod
+    def scan(self, expr):
+        """把表达式切分成(类型, 字符串, 起始位置, 结束位置)的词法单元，括号不匹配或字符串没有结束时返回None."""
+        tokens = []
+        depth = 0
+        for match in self.TOKEN.finditer(expr):
+            kind = match.lastgroup
+            if kind == 'open':
+                depth += 1
+            elif kind == 'close':
+                depth -= 1
+            elif kind == 'error':
+                return None
+            elif kind == 'newline' and depth:  # 括号中的换行和空白一样
+                continue
+            start, end = match.span(kind)
+            tokens.append((kind, expr[start:end], start, end))
+        return tokens if depth == 0 else None
+
+    @classmethod
+    def analyse(self, expr, localkeys=()):
+        """解析expr表达式，localkeys为引用的别名列表，结果按表达式和其中用到的别名缓存."""
+        tokens = None
+        entry = self.ANALYSE_CACHE.get(expr)
+        if entry is None:
+            tokens = self.scan(expr)
+            entry = self.remember(self.ANALYSE_CACHE, expr, ({t[1] for t in tokens or () if t[0] == 'name'}, {}))
+        else:
+            self.ANALYSE_CACHE.move_to_end(expr)
+        names, results = entry
+        key = frozenset(name for name in names if name in localkeys)
+        if key not in results:
+            results[key] = self._analyse(expr, key, self.scan(expr) if tokens is None else tokens)
+        expr, xmap, smap = results[key]
+        return expr, dict(xmap), dict(smap)
+
+    @classmethod
+    def _analyse(self, expr, localkeys, tokens):
+        """单次扫描词法单元解析expr表达式，tokens为None时表达式不完整."""
+        if tokens is None:  # 表达式不完整，计算时会出错
+            return expr, {}, {}
 
-        #  替换字符串
-        smap = {}
-        offset = 0
-        for i, (begin, end) in enumerate(sinfo):
-            sname = '__s{i}'.format(i=i)
-            sval = expr[begin + offset:end + offset]
-            expr = expr.replace(sval, sname, 1)
+        if all(kind != 'name' or string in self.LITERAL_NAMES for kind, string, start, end in tokens):  # 有其他名称的不是字面量
             try:
-                smap[sname] = literal_eval(sval)  # 获取真实的字符串，这里出错说明前面的解析有问题
+                literal_eval(expr)
+                return expr, {}, {}
             except Exception:
-                Log.error('Analyse string error : ' + str(sval))
-            offset -= len(sval) - len(sname)
+                pass
 
         #  默认都有self, root两个变量
-        localkeys = tuple(set(localkeys) | set(('self', 'root')))
-
-        #  self可省略，匹配selfa, selfb, a.self
-        ptn = '(?:^|[^a-z0-9_.])(?=(?!((?:{localkeys})\\b))[a-z_]+[a-z0-9_]*)'.format(localkeys='|'.join(localkeys | smap.keys()))
-        bypass = 'self.'
-        offset = 0
-        for i, p in enumerate(re.finditer(ptn, expr, flags=re.I)):
-            index = p.span()[1] + offset
-            expr = expr[:index] + bypass + expr[index:]
-            offset += len(bypass)
-
-        #  parent缩写为p，children[x]缩写为cx
-        while True:
-            size = len(expr)
-            expr = re.sub('[.]parent[.]', '.p.', expr, flags=re.I)
-            expr = re.sub('[.]children\\[([0-9]+)\\][.]', lambda m: '.c{}.'.format(m.group(1)), expr, flags=re.I)
-            if len(expr) == size:
+        localkeys = set(localkeys) | set(('self', 'root'))
+
+        smap = {}  # 字符串映射
+        pattern = {}  # 变量映射
+        count = 0  # 匹配到的变量数，相同的变量使用相同的名称，但序号依然增加
+        result = []
+        cursor = 0  # 已处理的位置
+        index = 0
+        size = len(tokens)
+        while index < size:
+            kind, string, start, end = tokens[index]
+            if kind == 'newline':
                 break
+            result.append(expr[cursor:start])
+            cursor = end
 
-        #  cx.p.可以省略，p.cx.不可省略
-        expr = re.sub('[.]c[0-9]+[.]p[.]', '.', expr, flags=re.I)
+            # 表达式中的字符串不参与匹配，替换成__sx
+            if kind == 'string':
+                sname = '__s{i}'.format(i=len(smap))
+                try:
+                    smap[sname] = literal_eval(string)
+                except Exception:
+                    Log.error('Analyse string error : ' + str(string))
+                result.append(sname)
+                index += 1
+                continue
 
-        # 匹配self.p.c0.name, self, 不匹配a.self, selfa
-        ptn = '(?:{localkeys}).((?:p|c[0-9]+).)*[a-z_]+[a-z0-9_]*|(?:^|(?<=[^.]))\\b(?:{localkeys})\\b'.format(localkeys='|'.join(localkeys))
-        pattern = {}
+            # 紧跟在点后面的是属性，关键字和字符串映射不是变量
+            if kind != 'name' or keyword.iskeyword(string) or string in smap or \
+                    (index > 0 and tokens[index - 1][1] == '.' and self.is_adjacent(tokens, index)):
+                result.append(string)
+                index += 1
+                continue
 
-        #  查找所有变量
-        offset = 0
-        for i, p in enumerate(re.finditer(ptn, expr, flags=re.I)):
-            iname = '__x{i}'.format(i=i)
-            pname = p.group()
+            chain, index = self.split_chain(tokens, index, localkeys)
+            cursor = tokens[index - 1][3]
 
-            if pname in pattern:  # 相同的变量使用相同的名称
-                iname = pattern[pname]
-            else:
-                pattern[pname] = iname
+            # 匹配self.p.c0.name, self，路径之后的第一个名称为属性
+            n = 1
+            while n < len(chain) - 1 and self.is_path(chain[n]):
+                n += 1
+            if len(chain) > 1:
+                n += 1
+            pname = '.'.join(chain[:n])
 
-            #  不能直接用replace，会有名称部分包含的情况
-            sindex = p.span()[0] + offset
-            eindex = p.span()[1] + offset
-            expr = expr[:sindex] + iname + expr[eindex:]
-            offset -= len(pname) - len(iname)
+            if pname not in pattern:
+                pattern[pname] = '__x{i}'.format(i=count)
+            count += 1
+            result.append(pattern[pname])
+            if n < len(chain):
+                result.append('.' + '.'.join(chain[n:]))
+        result.append(expr[cursor:])
 
         xmap = {v: k for k, v in pattern.items()}
-        return expr, xmap, smap
-
-
-# 类中attr属性改变时触发on_attr事件，同时同步改变关联的值
-class Node:
-    """节点类."""
-
-    def __new__(cls):  # 不用在子类中调用super初始化
-        """初始化触发器等数据."""
-        cls._init(cls)
-        return super().__new__(cls)
-
-    def _init(cls):
-        if not hasattr(cls, '_confignode'):
-            return
-
-        confignode = cls._confignode
-        # confignode.create(cls)
-
-        # print(confignode.name, confignode.trigger, confignode.children)
-        # for child in confignode.children:
-        #     print(child.class_base[0].name, child.class_base[0].class_base)
-
-        #     cls.children.append(child_node())
+        return ''.join(result), xmap, smap
 
-    def __setattr__(self, name, value):
-        """改变变量时触发数据同步."""
-        ovalue = self.__dict__.get(name, None)
-        self.__dict__[name] = value
 
-        try:
-            self._on_func(name, ovalue, value)
-        except Exception as ex:
-            Log.error(ex)
+class ConfigFolder(ast.NodeTransformer):
+    """常量折叠，只由常量组成的运算在解析时计算，结果作为新的常量."""
 
-    #  调用on_函数
-    def _on_func(self, name, ovalue, value):
-        on_name = 'on_' + name
-        if on_name in self.__dict__:
-            on_func = self.__dict__[on_name]
-            on_func(ovalue, value)
+    # 可以折叠的运算，函数调用可能有副作用，列表和字典等可变对象需要每次新建，不折叠
+    FOLDABLE = (ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Subscript, ast.Tuple)
+    PREFIX = '__c'
 
-        if name in self._trigger:
-            for node, nname in self._trigger[name]:
-                node._update_value(nname, (self, name), value)
+    def __init__(self, values):
+        """values为常量的值."""
+        self.values = values
+        self.folded = 0  # 折叠的运算数
 
-    #  更新关联类的值
-    def _update_value(self, name, base, basev):
+    def is_const(self, node):
+        """节点是否为常量."""
+        if isinstance(node, ast.Constant):
+            return True
+        return isinstance(node, ast.Name) and node.id in self.values
+
+    def generic_visit(self, node):
+        """先折叠子节点，子节点都是常量时计算该节点."""
+        node = super().generic_visit(node)
+        if not isinstance(node, self.FOLDABLE):
+            return node
+        if isinstance(node, ast.Tuple) and not isinstance(node.ctx, ast.Load):
+            return node
+        children = [child for child in ast.iter_child_nodes(node) if isinstance(child, ast.expr)]
+        if not all(self.is_const(child) for child in children):
+            return node
         try:
-            expr, pattern, local = self._reflex[name]
-            local[pattern[base]] = basev
-
-            value = eval(expr, None, local)
-            setattr(self, name, value)
-        except Exception as ex:
-            Log.error(ex)
+            code = compile(ast.fix_missing_locations(ast.Expression(node)), '<pv>', 'eval')
+            value = eval(code, {'__builtins__': {}}, self.values)
+        except Exception:  # 计算出错时保留原表达式，实例中计算时再报错
+            return node
 
-    def add_node(self, node):
-        """添加节点."""
-        self.children.append(node)
-        if node.parent:
-            Log.warning('{node} already has parent'.format(node=node))
-        node.parent = self
+        index = len(self.values)
+        while '{}{}'.format(self.PREFIX, index) in self.values:
+            index += 1
+        name = '{}{}'.format(self.PREFIX, index)
+        self.values[name] = value
+        self.folded += 1
+        return ast.copy_location(ast.Name(id=name, ctx=ast.Load()), node)
 
 
 # 使用配置树的模式可以检查配置的有效性，不生成类结构会导致只能在运行时检查配置的有效性
@@ -361,6 +490,8 @@ class Node:
 class ConfigNode:
     """从配置中解析出的配置节点."""
 
+    NODE_TYPE = {}  # 配置中新建的类，{(类名, __slots__): 类}
+
     def __init__(self, name, ids):
         """初始化."""
         self.name = name  # 类的名称
@@ -372,11 +503,17 @@ class ConfigNode:
         # 行号，注解，状态，解析参数
         # 状态：静态变量(static)，动态变量(dynamic)，未检查变量(uncheck)
         self._attr = {}
+        self._expr = {}  # 动态属性执行前的解析结果和依赖的结构，派生类中重新执行继承的属性时使用
+        # 合并了继承关系的attr, ids, children缓存，_attr, _ids, _children, class_base改变时失效
+        self._cache = {}
+        self._derived = []  # 继承该节点的节点，用于同步清除缓存
+        self._class_base = []
         self.class_base = []  # 继承的父类对应的节点
 
-        # 保存变量触发的逻辑{'info01': {'self.p': {'info02': '__x0'}}}
+        # 保存变量触发的逻辑{'info01': {'self.p': {'info02': {owner: '__x0'}}}}
         # 类中的属性info01改变时，通过self.p定位到响应的类（实例化时，该键值初始化响应类的实例），修改响应类中的变量info02
         # 变量info02对应的表达式中使用的info01变量，对应在表达式中的符号为__x0
+        # owner为定义info02表达式的配置节点，子节点被多个类继承时，只有info02使用owner中定义的类才响应
         self.trigger = {}
         # 接收触发器产生的事件{'info02': (__x0 + __s0, {'__x0': 'self.c0.info1'}, {'__s0': 'infos'})}
         # 计算属性值的表达式expr，变量映射xmap（实例化时，映射值初始化为对应的值），字符串映射smap
@@ -384,48 +521,239 @@ class ConfigNode:
         # self.responder = {}
         self._parent = None
         self._children = []
+        self._instances = None  # 配置树的根节点记录实例化的节点树，重新加载时更新这些实例
+
+    def _node_type(self, compact=False):
+        """配置中新建的类，compact为True时属性保存在__slots__中，名称和属性相同的节点使用同一个类."""
+        slots = None
+        if compact:
+            slots = tuple(sorted(name for name in self.attr if name.isidentifier() and name not in NodeBase.__slots__))
+        return self.new_type(self.name, slots)
+
+    @classmethod
+    def new_type(self, name, slots=None):
+        """名称为name的新建类，slots为空时属性保存在__dict__中."""
+        key = name, slots
+        if key not in self.NODE_TYPE:
+            if slots is not None:
+                self.NODE_TYPE[key] = type(name, (NodeBase,), {'__slots__': slots})
+            else:
+                self.NODE_TYPE[key] = type(name, (Node,), {})
+        return self.NODE_TYPE[key]
+
+    def _template(self):
+        """
+        实例化的模板，同一个配置节点的所有实例共享，属性或触发器改变时重新生成.
 
-    def _create(self, ids, *args, **kwargs):
+        values: 属性的初始值
+        trigger: 合并继承后的触发器，实例直接引用
+        reflex: 需要绑定的动态属性，((属性, 代码对象, smap, ((变量, 路径, 拆分后的路径), ...)), ...)
+        types: 配置中新建的类，{compact: (类, 是否可以直接更新__dict__)}，只在实例化时使用
+
+        除了types之外都是只读的，所有实例共享，修改需要通过ConfigNode重新生成
+        """
+        if 'template' not in self._cache:
+            values = {}
+            reflex = []
+            for name, (line, note, check, attr) in self.attr.items():  # 应该标注来源自哪个类
+                values[name] = attr[0] if check != 'uncheck' else None
+                if check == 'dynamic' and attr[1][1]:  # 全部折叠为常量的属性不会重新计算
+                    expr, xmap, smap = attr[1]
+                    paths = tuple((iname, pname, tuple(pname.split('.'))) for iname, pname in xmap.items())
+                    reflex.append((name, ConfigMethod.compile(expr), MappingProxyType(smap), paths))
+            self._cache['template'] = {
+                'values': MappingProxyType(values),
+                'trigger': ConfigMethod.freeze(self._merge_trigger()),
+                'reflex': tuple(reflex),
+                'types': {},
+            }
+        return self._cache['template']
+
+    def _create(self, ids, *args, compact=False, **kwargs):
+        template = self._template()
         if self.name in globals():
-            cls_type = globals()[self.name]
+            cls_type, fast = globals()[self.name], False
         else:
-            cls_type = type(self.name, (), {})
+            if compact not in template['types']:
+                cls_type = self._node_type(compact)
+                # 新建的非compact类没有自定义的属性描述符，属性名和__slots__不冲突时可以直接更新__dict__
+                fast = not compact and not any(name in NodeBase.__slots__ for name in template['values'])
+                template['types'][compact] = cls_type, fast
+            cls_type, fast = template['types'][compact]
         cls = cls_type(*args, **kwargs)
 
-        dct = cls.__dict__
-        # 类的属性，基类列表
-        dct.update(self.attr)  # 应该标注来源自哪个类
+        # 类的属性，基类列表，实例可能没有__dict__，不触发数据同步
+        if fast:
+            cls.__dict__.update(template['values'])
+        else:
+            for name, value in template['values'].items():
+                object.__setattr__(cls, name, value)
         ids.update({k: self for k in self._idspath})
-        print(self.name, self.trigger)
 
         children = []
         for child in self.children:
-            child_cls = child._create(ids, *args, **kwargs)
+            child_cls = child._create(ids, *args, compact=compact, **kwargs)
             child_cls.parent = cls
             children.append(child_cls)
 
-        dct['_trigger'] = copy.deepcopy(self.trigger)  # 必须最先初始化
-        dct['ids'] = ids
-        dct['parent'] = None
-        dct['children'] = children
+        object.__setattr__(cls, '_trigger', template['trigger'])  # 必须最先初始化
+        object.__setattr__(cls, '_config', self)
+        object.__setattr__(cls, 'ids', ids)
+        object.__setattr__(cls, 'parent', None)
+        object.__setattr__(cls, 'children', children)
 
         # print(self.name, cls_type.__dict__, cls.__dict__)
         return cls
 
-    def create(self, *args, **kwargs):
-        """实例化节点."""
+    def _merge_trigger(self):
+        """合并继承的触发器."""
+        trigger = {}
+        for base in self.class_base + [self]:
+            base_trigger = base._template()['trigger'] if base is not self else self.trigger
+            for name, rmap in base_trigger.items():
+                for rname, nmap in rmap.items():
+                    for tname, omap in nmap.items():
+                        trigger.setdefault(name, {}).setdefault(rname, {}).setdefault(tname, {}).update(omap)
+        return trigger
+
+    def _locate(self, node, plist):
+        """获取实例中变量的值，plist为拆分后的路径，self开头的路径从实例中查找，其他路径使用配置中的值."""
+        if plist[0] != 'self':
+            base_cls = self.ids[plist[0]]
+            for pn in plist[1:-1]:
+                base_cls = base_cls.parent if pn.startswith('p') else base_cls.children[int(pn[1:])]
+            return base_cls._execute(plist[-1]) if len(plist) > 1 else base_cls
+
+        for pn in plist[1:-1]:
+            node = node.parent if pn.startswith('p') else node.children[int(pn[1:])]
+        if len(plist) == 1:
+            return node
+        base_name = plist[-1]
+        try:
+            return getattr(node, base_name)
+        except AttributeError:
+            pass
+        if ConfigMethod.is_path(base_name):
+            return node.parent if base_name.startswith('p') else node.children[int(base_name[1:])]
+        return node._config._execute(base_name)
+
+    def _bind(self, node, recursive=True):
+        """实例化后绑定动态属性，表达式中的变量使用实例中的值初始化."""
+        reflex = {}
+        for name, code, smap, paths in self._template()['reflex']:
+            local = dict(smap)
+            for iname, pname, plist in paths:
+                try:
+                    local[iname] = self._locate(node, plist)
+                except Exception:  # 继承后节点结构改变，路径可能不存在
+                    Log.error('Bind %s.%s failed - %s not found', self.name, name, pname)  # 绑定时频繁调用，延迟格式化
+                    break
+            else:
+                reflex[name] = code, local
+        object.__setattr__(node, '_reflex', reflex or EMPTY)
+
+        if recursive:
+            for child in node.children:
+                child._config._bind(child)
+
+    def create(self, *args, compact=False, **kwargs):
+        """实例化节点，compact为True时配置中新建的类使用__slots__保存属性，减少大量节点时的内存占用."""
         ids = {}  # 使用同一个ids，保证一致，但self需要额外处理
-        cls = self._create(ids, *args, **kwargs)
+        cls = self._create(ids, *args, compact=compact, **kwargs)
+        self._bind(cls)
+        self._track(cls)
         return cls
 
+    def _track(self, node):
+        """在配置树的根节点中记录实例化的节点树，重新加载时更新."""
+        top = self
+        while top._parent is not None:
+            top = top._parent
+        if top._instances is None:
+            top._instances = weakref.WeakSet()
+        top._instances.add(node)
+
+    def _patch(self, node, old):
+        """实例的配置从old换成重新解析后的节点，重新设置改变的静态属性，返回改变的动态属性."""
+        object.__setattr__(node, '_config', self)
+        dynamic = []
+        for name, (line, note, check, attr) in self.attr.items():
+            old_attr = old.attr.get(name)
+            try:
+                if old_attr is not None and old_attr[2:] == (check, attr):
+                    continue
+            except Exception:  # 属性值可能无法比较
+                pass
+            if check == 'dynamic':
+                dynamic.append(name)
+                continue
+            try:
+                setattr(node, name, attr[0] if check != 'uncheck' else None)
+            except AttributeError:  # __slots__节点不能添加新的属性
+                Log.warning('Reload %s.%s failed - node has no slot', self.name, name)
+        return dynamic
+
+    def __getstate__(self):
+        """序列化时不保存缓存和实例."""
+        state = dict(self.__dict__)
+        state['_cache'] = {}
+        state['_instances'] = None
+        return state
+
+    def _invalidate(self, *names):
+        """清除缓存，继承该节点的节点同时清除."""
+        # 子类的缓存由父类的缓存生成，父类没有缓存时子类也不会有缓存
+        names = [name for name in names if name in self._cache]
+        if not names:
+            return
+        for name in names:
+            del self._cache[name]
+        for node in self._derived:
+            node._invalidate(*names)
+
+    def _set_attr(self, name, value):
+        """设置属性，自身的属性优先级最高，可以直接更新缓存."""
+        self._attr[name] = value
+        if 'attr' in self._cache:
+            self._cache['attr'][0][name] = value
+        if 'origin' in self._cache:
+            self._cache['origin'][name] = self
+        self._invalidate('template')
+        for node in self._derived:
+            node._invalidate('attr', 'origin')
+
+    def _set_ids(self, name, value):
+        """设置索引."""
+        self._ids[name] = value
+        if 'ids' in self._cache:
+            self._cache['ids'][0][name] = value
+        for node in self._derived:
+            node._invalidate('ids')
+
+    @property
+    def class_base(self):
+        """继承的父类对应的节点."""
+        return self._class_base
+
+    @class_base.setter
+    def class_base(self, class_base):
+        for base in self._class_base:
+            base._derived.remove(self)
+        self._class_base = class_base
+        for base in class_base:
+            base._derived.append(self)
+        self._invalidate('attr', 'origin', 'ids', 'children', 'template')
+
     @property
     def ids(self):
-        """索引映射."""
-        ids = dict()
-        for base in self.class_base:
-            ids.update(base.ids)
-        ids.update(self._ids)
-        return ids
+        """索引映射，返回的映射只读."""
+        if 'ids' not in self._cache:
+            ids = dict()
+            for base in self.class_base:
+                ids.update(base.ids)
+            ids.update(self._ids)
+            self._cache['ids'] = ids, MappingProxyType(ids)
+        return self._cache['ids'][1]
 
     @property
     def parent(self):
@@ -435,19 +763,23 @@ class ConfigNode:
     @property
     def children(self):
         """子节点."""
-        children = list(self._children)
-        for base in self.class_base:
-            children += base.children
-        return children  # self._children
+        if 'children' not in self._cache:
+            children = list(self._children)
+            for base in self.class_base:
+                children += base.children
+            self._cache['children'] = tuple(children)  # self._children
+        return self._cache['children']
 
     @property
     def attr(self):
-        """获取属性列表."""
-        attr = {}
-        for base in self.class_base:
-            attr.update(base.attr)
-        attr.update(self._attr)
-        return attr
+        """获取属性列表，返回的映射只读."""
+        if 'attr' not in self._cache:
+            attr = {}
+            for base in self.class_base:
+                attr.update(base.attr)
+            attr.update(self._attr)
+            self._cache['attr'] = attr, MappingProxyType(attr)
+        return self._cache['attr'][1]
 
     def _walk(self, deep, isroot=True):
         if isroot:
@@ -472,16 +804,64 @@ class ConfigNode:
                     val = val[0]
                 print(spacesep + key + ': ' + str(val))
 
+    def _child_index(self, child):
+        """子节点在children中的序号，序号表跟随children的缓存，children重新生成后重建."""
+        children = self.children
+        cached = self._cache.get('index')
+        if cached is None or cached[0] is not children:
+            index = {}
+            for n, node in enumerate(children):
+                index.setdefault(id(node), n)
+            cached = self._cache['index'] = children, index
+        return cached[1][id(child)]
+
     def add_node(self, node):
         """添加节点."""
         self._children.append(node)
+        self._invalidate('children')
         if node._parent:
             Log.warning('{node} already has parent'.format(node=node))
         node._parent = self
 
+    def _relative(self, target):
+        """
+        从自身到target的相对路径，如['self', 'p', 'c1']，target不在同一个根类中时返回None.
+
+        继承的子节点属于基类，向上查找时基类等同于继承它的节点，子节点序号使用实例化后的children中的位置
+        """
+        level = {}  # 祖先节点及其基类到自身的层数
+        chain = []
+        node = self
+        while node is not None and node.parent is not None:  # 不包括所有根类共同的根节点
+            chain.append(node)
+            bases = [node]
+            while bases:
+                base = bases.pop()
+                if base not in level:
+                    level[base] = len(chain) - 1
+                    bases.extend(base.class_base)
+            node = node.parent
+
+        down = []
+        node = target
+        while node is not None and node.parent is not None:
+            if node in level:
+                break
+            down.append(node)
+            node = node.parent
+        else:
+            return None
+
+        path = ['self'] + ['p'] * level[node]
+        parent = chain[level[node]]
+        for child in reversed(down):
+            path.append('c{}'.format(parent._child_index(child)))
+            parent = child
+        return path
+
     # 使用缩写语法，p代表parent，c1代表children[1]，缩写语法默认添加self
     # 使用bind绑定时，所有的变量必须可访问
-    def _execute(self, name):
+    def _execute(self, name, fold=False):
         if name not in self.attr:
             ids = self.ids
             if name in ids:
@@ -508,21 +888,31 @@ class ConfigNode:
         if '__import__' in expr:  # literal_eval不能设置locals，因此需要对expr进行判断
             raise Exception
 
+        if xmap:
+            self._expr[name] = (attr,) + self._depends(xmap)
         rmap = {}
+        const = {}  # 值不会改变的变量
         local_info = dict(smap)
         check = 'static' if xmap == {} else 'dynamic'
-        for iname, pname in xmap.items():
+        xmap = dict(xmap)  # 别名和root开头的路径可能替换为相对路径
+        for iname, pname in list(xmap.items()):
             # 定位变量所在的类
             rname = ''  # 逆向索引字符串
             plist = pname.split('.')
             base_cls = self.ids[plist[0]]
 
+            # 别名和root开头的路径在同一棵树中时转换为相对路径，实例化后可以定位并添加触发器
+            if plist[0] != 'self' and len(plist) > 1:
+                path = self._relative(base_cls)
+                if path is not None:
+                    plist = path + plist[1:]
+                    pname = '.'.join(plist)
+                    xmap[iname] = pname
+                    base_cls = self
+
             for pn in plist[1:-1]:
                 if pn.startswith('p'):
-                    for n, c in enumerate(base_cls.parent.children):
-                        if c == base_cls:
-                            break
-                    rname = '.c{}{}'.format(n, rname)
+                    rname = '.c{}{}'.format(base_cls.parent._child_index(base_cls), rname)
                     base_cls = base_cls.parent
                 elif pn.startswith('c'):
                     rname = '.p{}'.format(rname)
@@ -531,32 +921,287 @@ class ConfigNode:
             rname = 'self' + rname
 
             base_name = plist[-1]
-            if len(plist) > 1:  # 类的引用不会被主动改变，只有类的属性改变时才触发
-                rmap.setdefault((base_cls, base_name), [])
-                rmap[(base_cls, base_name)].append((iname, pname, rname, name))
+            local_info[iname] = base_cls._execute(base_name, fold)
 
-            local_info[iname] = base_cls._execute(base_name)
+            # 指向其他根类的别名实例化后不在同一棵树中，使用配置中的值作为常量
+            if plist[0] != 'self':
+                const[iname] = local_info[iname]
+                continue
+            # 类的引用不会被主动改变，只有类的属性改变时才触发
+            if len(plist) == 1:
+                continue
+            # 静态属性作为常量，不添加触发器，fold为False时只有设置了static注解的属性作为常量
+            base_attr = base_cls.attr.get(base_name)
+            if base_attr is not None and base_attr[2] == 'static' and (fold or base_attr[1].get('state') == 'static'):
+                const[iname] = local_info[iname]
+                continue
+            rmap.setdefault((base_cls, base_name), [])
+            rmap[(base_cls, base_name)].append((iname, pname, rname, name))
 
-        value = eval(expr, None, local_info)
-        self._attr[name] = line, note, check, (value, (expr, xmap, smap))
+        value = eval(ConfigMethod.compile(expr), None, local_info)
+        if check == 'dynamic':  # 折叠常量，实例中只计算会变化的部分
+            expr, xmap, smap = ConfigMethod.fold(expr, xmap, smap, const)
+        self._set_attr(name, (line, note, check, (value, (expr, xmap, smap))))
 
         # 动态属性添加触发器，执行成功后添加触发器
         if check == 'dynamic':
             for key, val in rmap.items():
                 base_cls, base_name = key
                 for iname, pname, rname, name in val:
-                    base_cls.trigger.setdefault(base_name, {}).setdefault(rname, {})[name] = iname
+                    base_cls.trigger.setdefault(base_name, {}).setdefault(rname, {}).setdefault(name, {})[self] = iname
+                base_cls._invalidate('template')
         return value
 
-    def execute(self, name):
-        """将变量绑定到相关的值."""
+    def _origins(self):
+        """定义每个属性的配置节点，和attr一样合并继承关系，多个基类中都有时后面的基类优先."""
+        if 'origin' not in self._cache:
+            origin = {}
+            for base in self.class_base:
+                origin.update(base._origins())
+            origin.update(dict.fromkeys(self._attr, self))
+            self._cache['origin'] = origin
+        return self._cache['origin']
+
+    @staticmethod
+    def _depends(xmap):
+        """表达式依赖的结构，返回(是否经过子节点、父节点或者别名的路径, 引用的自身属性)."""
+        structural = False
+        names = set()
+        for pname in xmap.values():
+            plist = pname.split('.')
+            if len(plist) == 1:  # 别名引用的节点不随结构改变，节点自身在派生类中不同
+                structural = structural or plist[0] == 'self'
+            elif plist[0] != 'self' or len(plist) > 2 or ConfigMethod.is_path(plist[1]):
+                structural = True
+            else:
+                names.add(plist[1])
+        return structural, frozenset(names)
+
+    def _same(self, owner):
+        """自身和owner的子节点和位置是否相同，相同时经过子节点和父节点的路径指向相同的节点."""
+        if owner.children != self.children:
+            return False
+        if owner.parent is self.parent:
+            return True
+        # 分块解析时每块的根节点不同，根类的父节点都是根节点
+        return owner.parent is not None and self.parent is not None and owner.parent.parent is None and self.parent.parent is None
+
+    def _inherit(self):
+        """
+        复制需要按自身的结构重新执行的继承的动态属性，返回复制的属性，之后和自身的属性一起执行.
+
+        继承的属性在基类中按基类的子节点、父节点和属性计算，派生类中子节点前面添加了自身的子节点，
+        引用的属性也可能被覆盖，实例化时的路径指向不同的值，这样的属性复制到派生类中重新执行
+        """
+        inherited = {}  # 没有移动的继承的动态属性，{属性: (基类, 引用的自身属性)}
+        moved = []
+        same = {}
+        for name, owner in self._origins().items():
+            if owner is self or name not in owner._expr:
+                continue
+            attr, structural, refs = owner._expr[name]
+            if structural:
+                if owner not in same:
+                    same[owner] = self._same(owner)
+                if not same[owner]:
+                    moved.append(name)
+                    continue
+            if refs:
+                inherited[name] = refs
+
+        names = set(self._attr)
+        names.update(moved)
+        while True:  # 引用了重新定义或者需要重新执行的属性的属性同样需要重新执行
+            found = [name for name, refs in inherited.items() if name not in names and not refs.isdisjoint(names)]
+            if not found:
+                break
+            names.update(found)
+            moved.extend(found)
+
+        origins = self._origins()
+        for name in moved:
+            line, note, check, attr = self.attr[name]
+            self._set_attr(name, (line, note, 'uncheck', origins[name]._expr[name][0]))
+        return moved
+
+    def execute(self, name, fold=False):
+        """将变量绑定到相关的值，fold为True时所有静态属性都作为常量折叠."""
         try:
-            self._execute(name)
+            self._execute(name, fold)
             return True
         except Exception:
             return False
 
 
+class ConfigSource:
+    """
+    逐行读取配置.
+
+    source可以是文件路径、文件对象或者行的迭代器，numbered为True时source为(行号, 行)的序列
+    字节文件只记录每行的字节偏移，可以定位的文本文件每隔CHECKPOINT行记录一次位置，出错时重新读取对应的行
+    不能定位的文本文件和行的迭代器无法重新读取，解析时需要的行（根类声明和属性）全部保存在内存中
+    文本文件需要使用newline=''打开，否则\n\r会被当作两个换行符
+    读取的同时按根类分块，计算每块内容的摘要，用于增量重新加载
+    """
+
+    CHECKPOINT = 64  # 文本文件记录位置的间隔行数，TextIOWrapper.tell的开销较大，不能每行都记录
+
+    def __init__(self, source, numbered=False):
+        """初始化."""
+        self.source = source
+        self.numbered = numbered
+        self.blocks = []  # 根类的分块，[(根类的声明, 内容摘要, 起始行, 结束行)]，第一个根类之前为声明为空的块
+        self._offsets = None  # 字节文件中每行的偏移
+        self._marks = None  # 文本文件中记录的位置，[(行号, 位置, 上一行是否以\n结尾)]
+        self._lines = {}  # 无法重新读取时保存的行
+
+    @staticmethod
+    def split(raw):
+        """统一换行符，\r\n、\n\r、\r都作为换行符."""
+        if raw.endswith('\n'):
+            raw = raw[:-1]
+        if raw.startswith('\r'):  # 上一行以\n\r结尾
+            raw = raw[1:]
+        if raw.endswith('\r'):
+            raw = raw[:-1]
+        return raw.split('\r') if '\r' in raw else [raw]
+
+    @staticmethod
+    def seekable(fp):
+        """文件对象是否可以记录并回到读取的位置."""
+        try:
+            if fp.seekable():
+                fp.tell()  # 使用next()遍历过的文本文件不能tell
+                return True
+        except (OSError, ValueError):
+            pass
+        return False
+
+    def _read_binary(self, fp):
+        self._offsets = array('q')
+        offset = fp.tell()
+        for raw in fp:
+            if raw == b'\r' and self._offsets:  # 文件以\n\r结尾
+                break
+            line = raw.decode('utf-8')
+            for part in self.split(line):
+                self._offsets.append(offset)
+                yield part
+            offset += len(raw)
+
+    def _read_text(self, raws, tell=None, line_number=0, newline=False):
+        """
+        拆分文本的行，line_number为已经读取的行数，newline为上一行是否以\n结尾.
+
+        newline=''打开的文本文件中\n\r的\r单独成行，这样的行属于上一个换行符
+        tell不为None时每隔CHECKPOINT个原始行记录一次位置
+        """
+        raws = iter(raws)
+        count = 0
+        while True:
+            if tell is not None and count % self.CHECKPOINT == 0:
+                self._marks.append((line_number + 1, tell(), newline))
+            raw = next(raws, None)
+            if raw is None:
+                return
+            count += 1
+            if newline and raw == '\r':
+                newline = False
+                continue
+            newline = raw.endswith('\n')
+            for part in self.split(raw):
+                line_number += 1
+                yield part
+
+    def _read(self):
+        source = self.source
+        if isinstance(source, str):  # 文件路径
+            with open(source, 'rb') as fp:
+                yield from self._read_binary(fp)
+        elif isinstance(source, io.TextIOBase):
+            if self.seekable(source):  # 使用readline读取，遍历文件时不能tell
+                self._marks = []
+                yield from self._read_text(iter(source.readline, ''), source.tell)
+            else:
+                yield from self._read_text(source)
+        elif hasattr(source, 'read'):
+            yield from self._read_binary(source)
+        else:
+            yield from self._read_text(source)
+
+    def __iter__(self):
+        """逐行返回(行号, 行)."""
+        lines = self.source if self.numbered else enumerate(self._read(), 1)
+        header, sha, start = None, hashlib.sha1(), 1
+        line_number = 0
+        for line_number, line in lines:
+            if line and line[0] not in ' \t#':  # 没有缩进的行都是根类的声明
+                self.blocks.append((header, sha.digest(), start, line_number))
+                header, sha, start = line.rstrip(), hashlib.sha1(), line_number
+            sha.update(line.encode('utf-8'))
+            sha.update(b'\n')
+            yield line_number, line
+        self.blocks.append((header, sha.digest(), start, line_number + 1))
+
+    def iter_blocks(self):
+        """按根类分块返回[(行号, 行)]，只保存当前块的行."""
+        block = []
+        for line_number, line in self:
+            if line and line[0] not in ' \t#' and block:
+                yield block
+                block = []
+            block.append((line_number, line))
+        if block:
+            yield block
+
+    def keep(self, line_number, line):
+        """保存出错时需要返回的行，可以重新读取时只保存偏移."""
+        if self._offsets is None and self._marks is None:
+            self._lines[line_number] = line
+
+    def _line_text(self, line_number):
+        """从记录的位置向后读取文本文件中的行，读取后回到原来的位置."""
+        start, cookie, newline = self._marks[bisect.bisect_left(self._marks, (line_number + 1,)) - 1]
+        fp = self.source
+        position = fp.tell()
+        try:
+            fp.seek(cookie)
+            for number, part in enumerate(self._read_text(iter(fp.readline, ''), newline=newline), start):
+                if number == line_number:
+                    return part
+            return ''
+        finally:
+            fp.seek(position)
+
+    def line(self, line_number):
+        """获取出错的行."""
+        if self._marks is not None:
+            try:
+                return self._line_text(line_number)
+            except Exception:  # 文件已经关闭或者无法重新读取
+                return ''
+        if self._offsets is None:
+            return self._lines.get(line_number, '')
+        try:
+            index = line_number - 1
+            offset = self._offsets[index]
+            part = 0  # 同一个字节行中用\\r分割的第几行
+            while index - part > 0 and self._offsets[index - part - 1] == offset:
+                part += 1
+            if isinstance(self.source, str):
+                with open(self.source, 'rb') as fp:
+                    fp.seek(offset)
+                    raw = fp.readline()
+            else:
+                position = self.source.tell()
+                self.source.seek(offset)
+                raw = self.source.readline()
+                self.source.seek(position)
+            return self.split(raw.decode('utf-8'))[part]
+        except Exception:  # 文件已经改变或者无法重新读取
+            return ''
+
+
 class Config:
     """
     配置解析.
@@ -570,28 +1215,42 @@ class Config:
     self: 当前类
     """
 
+    PARSER_VERSION = 11  # 解析器版本，解析逻辑或节点结构改变时需要增加，使旧的缓存失效
+    CACHE_DIR = 'config'  # 默认的缓存目录，位于用户缓存目录下
+    CACHE_SUFFIX = '.pvc'
+
     def __init__(self, **kwargs):
         """
         设置初始参数.
 
         unsafe: 是否允许配置是不安全的（属性中引用了作用域外的变量），默认为False，开启unsafe选项同样会忽略属性中的语法错误和表达式的安全性检查
         checkbase: 是否检查全局类是否继承自Node类，不检查会重新生成该类的定义并自动继承Node类，但会修改globals()的全局变量，可能导致线程的不安全，同时自动继承的方法不确定是否存在隐患
+        cache: 是否使用编译缓存，默认为True，配置内容和解析环境不变时直接读取解析后的节点树
+        cache_dir: 缓存目录，默认为用户缓存目录（$XDG_CACHE_HOME/pyvoxel或~/.cache/pyvoxel）下的config，从字符串加载的配置只有设置了该目录才会缓存
+        fold: 是否把所有静态属性作为常量折叠到引用它的表达式中，默认为False，只折叠设置了static注解的属性，折叠后修改实例中的该属性不会触发更新
         """
         self.unsafe = kwargs.get('unsafe', False)
         self.checkbase = kwargs.get('checkbase', True)
-
-    def _load(self, lines, sconfig):
-        config = {
-            'node': {}  # 配置文件中新建的类
-        }
+        self.cache = kwargs.get('cache', True)
+        self.cache_dir = kwargs.get('cache_dir', None)
+        self.fold = kwargs.get('fold', False)
+        self._loaded = {}  # 已加载的配置，用于增量重新加载，{路径: (根节点, 解析数据)}
+
+    def _load(self, source, sconfig, config=None):
+        """解析配置，source为ConfigSource，config不为空时在已解析的根类基础上继续解析，第二遍解析出错时返回的行为空."""
+        if config is None:
+            config = {
+                'node': {},  # 配置文件中新建的类
+                'nest_class': {},  # 类中包含所有的其他类
+                'nest_inherit': {},  # 类的继承关系
+            }
 
         root = ConfigNode('root', {})  # 根节点
 
-        line_map = {}  # 行数对应的具体内容
         process_data = []  # 预处理后的数据
-        nest_class = {}  # 类中包含所有的其他类
+        nest_class = config['nest_class']
         nest_key = ()  # 当前的根类
-        nest_inherit = {}  # 类的继承关系
+        nest_inherit = config['nest_inherit']
 
         cursor_line = 0  # 当前类所在的行
 
@@ -600,9 +1259,8 @@ class Config:
 
         attr_space = -1  # 属性对应的缩进
         last_space = -1
-        for line_number, line in enumerate(lines):
-            line_real = line.strip('\r').strip('\n')  # 原始行，用于出错时的返回
-            line_number += 1  # 行号
+        for line_number, line in source:
+            line_real = line  # 原始行，用于出错时的返回
 
             # 计算开头空格数
             space = 0
@@ -648,7 +1306,7 @@ class Config:
 
                 # 统计类的属性，按行号索引
                 cite_cursor.setdefault(cursor_line, {})
-                cite_cursor[cursor_line][name] = (line_number, line_real, cursor_line, note, val)
+                cite_cursor[cursor_line][name] = (line_number, None, cursor_line, note, val)  # 不保存原始行，出错时从source读取
                 # 属性分为动态属性和静态属性，动态属性在该属性在引用的其他属性变化时动态变化
                 # operate_type = 'attr'
                 # process_data[line_number] = (operate_type, line_number, line_real, space, key, (is_expr, val))
@@ -762,7 +1420,7 @@ class Config:
                 cursor_line = line_number
                 attr_space = space + 1
 
-            line_map[line_number] = line_real
+            source.keep(line_number, line_real)
 
         nest_line = {}  # 节点和行数的对应关系，{12: node1, 13: node2}
         nest_root = {}  # 根节点对应的行数，{T-t: 12, S-s: 13}
@@ -770,7 +1428,7 @@ class Config:
         cursor_space = -1
         for line in process_data:
             line_number, operate_type, space, nest_key, class_name, class_alias, data = line
-            line_real = line_map[line_number]
+            line_real = None  # 出错时再读取原始行
             if operate_type in ('baseclass', 'aliasclass', 'newclass'):
                 class_real_name = ConfigMethod.real_name(class_name, class_alias)
                 nest_root[class_real_name] = line_number
@@ -857,7 +1515,7 @@ class Config:
                 rootnode = node
                 while rootnode.parent.parent:
                     rootnode = rootnode.parent
-                node._ids['root'] = nest_root[rootnode.name]
+                node._set_ids('root', nest_root[rootnode.name])
             except Exception:
                 Log.exception()
                 return False, (line_number, line_real, 'Get root class failed')
@@ -871,26 +1529,30 @@ class Config:
             for ids_key, ids_line in node._ids.items():
                 try:
                     pnode = nest_line.get(ids_line)
-                    node._ids[ids_key] = pnode
+                    node._set_ids(ids_key, pnode)
                     if ids_key != 'self' and node == pnode:
                         node._idspath.add(ids_key)
                 except Exception:
-                    line_real = line_map[ids_line]
-                    return False, (ids_line, line_real, 'Node ids analyse failed')
+                    return False, (ids_line, None, 'Node ids analyse failed')
             # for attr_key, attr_val in node.attr.items():
             #     line_number, attr_line, attr_note, attr_check, attr = attr_val
             #     node._attr[attr_key] = line_number, nest_line.get(attr_line), attr_note, attr_check, attr
 
         # 通过索引序列解析属性
+        node_line = {node: line_number for line_number, node in nest_line.items()}
         for node, deep in root.walk(isroot=False):
+            # 继承的属性在派生类中指向不同的值时复制到派生类中重新执行，出错时返回派生类所在的行
+            inherited = set(node._inherit())
             for name in node._attr.keys():
                 line_number, attr_note, attr_check, attr = node._attr[name]
-                line_real = line_map[line_number]
+                line_real = None
 
                 # 以safe注解为准，未设置则使用默认safe配置
                 safe = attr_note.get('safe', 'unsafe' if self.unsafe else 'safe')
                 # 继承后属性未被覆盖则使用继承前的属性进行计算
-                if not node.execute(name) and safe == 'safe':
+                if not node.execute(name, self.fold) and safe == 'safe':
+                    if name in inherited:
+                        return False, (node_line[node], None, 'Inherited attr {} is unsafe'.format(name))
                     return False, (line_number, line_real, 'Attr is unsafe')
 
                 line_number, attr_note, attr_check, attr = node._attr[name]
@@ -939,32 +1601,443 @@ class Config:
 
             node.create()
 
-    def load(self, data):
-        """从文件或字符串中加载配置."""
-        sconfig = {
+    def _cache_key(self, chunks, sconfig):
+        """计算缓存的键值，配置内容、解析器版本、解析选项以及可用的类都会影响解析结果，chunks为配置内容的字节块."""
+        sha = hashlib.sha1()
+        sha.update(str(self.PARSER_VERSION).encode('utf-8'))
+        sha.update(str((self.unsafe, self.checkbase, self.fold)).encode('utf-8'))
+        for name in sorted(sconfig['plugins']):  # 插件名称对应的模块改变时缓存失效
+            sha.update(str((name, Manager.plugin_source(name))).encode('utf-8'))
+        for name in sorted(k for k in sconfig['globals'] if ConfigMethod.legal_class(k)):
+            sha.update(str((name, self._fingerprint(sconfig['globals'][name]))).encode('utf-8'))
+        for chunk in chunks:
+            sha.update(chunk)
+        return sha.hexdigest()
+
+    @staticmethod
+    def _fingerprint(value):
+        """类的来源，包括继承链上每个类的模块、限定名以及模块文件的修改时间和大小，类的代码改变或者名称绑定到其他类时改变."""
+        if not isinstance(value, type):
+            return type(value).__name__
+        result = []
+        for base in value.__mro__:
+            path = getattr(sys.modules.get(base.__module__), '__file__', None)
+            try:
+                stat = os.stat(path)
+                mark = stat.st_mtime_ns, stat.st_size
+            except (TypeError, OSError):  # 内建的类或者没有文件的模块
+                mark = None
+            result.append((base.__module__, base.__qualname__, mark))
+        return result
+
+    def _cache_path(self, path, key):
+        """缓存文件的路径，不需要缓存时返回空，文件名包含配置文件绝对路径的摘要，不同目录下的同名配置不冲突."""
+        if not self.cache:
+            return ''
+        cache_dir = self.cache_dir
+        if cache_dir is None:
+            if not path:  # 字符串配置没有对应的文件
+                return ''
+            cache_dir = os.path.join(Manager.cache_dir(), self.CACHE_DIR)
+        name = ''
+        if path:
+            digest = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+            name = '{}-{}.'.format(os.path.splitext(os.path.basename(path))[0], digest)
+        return os.path.join(cache_dir, name + key + self.CACHE_SUFFIX)
+
+    def _load_cache(self, cache_path):
+        """读取缓存的节点树."""
+        if not cache_path or not os.path.isfile(cache_path):
+            return None
+        try:
+            with open(cache_path, 'rb') as fp:
+                version, info = pickle.load(fp)
+            if version != self.PARSER_VERSION:
+                return None
+            Log.debug('Load config cache %s', cache_path)
+            return info
+        except Exception as ex:
+            Log.debug('Config cache %s load failed - %s', cache_path, ex)
+            return None
+
+    def _save_cache(self, cache_path, info):
+        """保存解析后的节点树，属性值无法序列化时不缓存."""
+        if not cache_path:
+            return False
+        temp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(temp_path, 'wb') as fp:
+                pickle.dump((self.PARSER_VERSION, info), fp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cache_path)  # 先写临时文件，防止读取到写了一半的缓存
+            self._clean_cache(cache_path)
+            return True
+        except Exception as ex:
+            Log.debug('Config cache %s save failed - %s', cache_path, ex)  # 缓存目录不可写时不缓存也不提示
+            if os.path.isfile(temp_path):
+                os.remove(temp_path)
+            return False
+
+    def _clean_cache(self, cache_path):
+        """删除同一个配置文件的旧缓存."""
+        cache_dir, cache_name = os.path.split(cache_path)
+        split_name = cache_name.split('.')
+        if len(split_name) < 3:  # 字符串配置的缓存没有对应的文件名
+            return
+        prefix = '.'.join(split_name[:-2]) + '.'
+        for name in os.listdir(cache_dir):
+            if name == cache_name or not name.endswith(self.CACHE_SUFFIX):
+                continue
+            if name.startswith(prefix) and name.count('.') == cache_name.count('.'):
+                os.remove(os.path.join(cache_dir, name))
+
+    def _sconfig(self):
+        """解析时可以使用的外部类."""
+        return {
             'globals': globals(),
             'plugins': Manager.plugins,  # 已有的插件类
         }
 
+    def _read(self, data):
+        """读取配置，返回配置文件路径（字符串配置为空）和内容."""
+        path = ''
+        if '\n' not in data and '\r' not in data:  # 文件路径
+            path = data
+            with open(data, 'r', encoding='utf-8', newline='') as fp:
+                data = fp.read()
+        return path, data
+
+    @staticmethod
+    def _read_chunks(path, size=1 << 20):
+        """分块读取文件，用于计算缓存的键值."""
+        with open(path, 'rb') as fp:
+            for chunk in iter(lambda: fp.read(size), b''):
+                yield chunk
+
+    @staticmethod
+    def _split_lines(data):
+        """按行分割配置，换行符的处理和ConfigSource相同，最后的换行符之后没有新的一行."""
+        raws = data.split('\n')
+        if raws[-1] in ('', '\r'):  # 以\n\r结尾时最后剩下\r
+            raws.pop()
+        return [line for raw in raws for line in ConfigSource.split(raw)]
+
+    def _error(self, source, info):
+        """输出解析错误，第二遍解析时的错误从source中重新读取原始行."""
+        line_number, line_real, message = info
+        if line_real is None:
+            line_real = source.line(line_number)
+        Log.error('{} {} {}'.format(line_number, line_real, message))
+
+    def load(self, data):
+        """
+        从文件或字符串中加载配置.
+
+        data也可以是文件对象或者行的迭代器，逐行读取解析，不保存整个配置的内容，只能读取一次，因此不使用缓存
+        """
+        sconfig = self._sconfig()
+
         try:
-            if '\n' not in data or '\r' not in data:  # 字符串
-                with open(data, 'r', encoding='utf-8') as fp:
-                    data = fp.read()
-            data = data.replace('\r\n', '\n').replace('\n\r', '\n').replace('\r', '\n')  # 分割后再替换
-            lines = data.split('\n')
-            is_success, info = self._load(lines, sconfig)
-            if not is_success:
-                line_number, line_real, message = info
-                Log.error('{} {} {}'.format(line_number, line_real, message))
-                return None
+            path = ''
+            cache_path = ''
+            if isinstance(data, str):
+                if '\n' not in data and '\r' not in data:  # 文件路径
+                    path = data
+                    source = ConfigSource(path)
+                    chunks = self._read_chunks(path)
+                else:
+                    source = ConfigSource(io.StringIO(data, newline=''))
+                    chunks = [data.encode('utf-8')]
+                cache_path = self._cache_path(path, self._cache_key(chunks, sconfig))
+            else:
+                source = ConfigSource(data)
+
+            info = self._load_cache(cache_path)
+            if info is None:
+                is_success, info = self._load(source, sconfig)
+                if not is_success:
+                    self._error(source, info)
+                    return None
+                info[1]['blocks'] = source.blocks
+                self._save_cache(cache_path, info)
             root, config = info
         except Exception:
             Log.exception()
             return None
 
+        self._loaded[path] = root, config
         self.create_class(root, sconfig, config)
         return root
 
+    def validate(self, data, workers=1):
+        """
+        检查配置，返回所有错误的列表[(行号, 原始行, 错误信息)]，配置正确时返回空列表.
+
+        按根类分块解析，某个根类出错时跳过该根类继续解析下一个根类，一次解析就可以得到所有根类中的错误，
+        每个根类只返回第一个错误，依赖出错根类的根类可能产生额外的错误
+        workers大于1时，按根类之间的引用把配置分成互不依赖的部分，在进程池中并行检查
+        """
+        sconfig = self._sconfig()
+        try:
+            if isinstance(data, str) and '\n' not in data and '\r' not in data:  # 文件路径
+                source = ConfigSource(data)
+            elif isinstance(data, str):
+                source = ConfigSource(io.StringIO(data, newline=''))
+            else:
+                source = ConfigSource(data)
+
+            if workers <= 1:
+                return self._validate_blocks(source.iter_blocks(), sconfig)
+            partitions = self._partition(list(source.iter_blocks()))
+            if len(partitions) <= 1:
+                return self._validate_blocks([block for partition in partitions for block in partition], sconfig)
+        except Exception as ex:  # 读取配置失败
+            return [(0, '', 'Read failed - {}'.format(ex))]
+
+        # 子进程中没有已加载的插件和注册的全局类，只传递检查时需要的信息
+        options = {'unsafe': self.unsafe, 'checkbase': self.checkbase, 'fold': self.fold}
+        globals_info = {}
+        for name, value in sconfig['globals'].items():
+            if isinstance(value, type):  # 只需要知道是否继承自Node类
+                value = Node if ConfigMethod.check_parent_class(value) else object
+            else:
+                value = None
+            globals_info[name] = value
+        worker_sconfig = {'globals': globals_info, 'plugins': set(sconfig['plugins'])}
+
+        # 按行数把分区分配到任务中，大的分区优先分配
+        tasks = [[] for _ in range(min(len(partitions), workers * 4))]
+        sizes = [0] * len(tasks)
+        for partition in sorted(partitions, key=lambda partition: -sum(len(block) for block in partition)):
+            index = sizes.index(min(sizes))
+            tasks[index].append(partition)
+            sizes[index] += sum(len(block) for block in partition)
+
+        errors = []
+        try:
+            from concurrent.futures import ProcessPoolExecutor  # 只有并行检查时使用，减少导入时间
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for result in executor.map(_validate_partitions, [options] * len(tasks), [worker_sconfig] * len(tasks), tasks):
+                    errors.extend(result)
+        except Exception as ex:  # 进程池不可用时在当前进程中检查
+            Log.warning('Parallel validate failed - %s', ex)
+            errors = []
+            for partition in partitions:
+                errors.extend(self._validate_blocks(partition, sconfig))
+        errors.sort(key=lambda error: error[0])
+        return errors
+
+    def _validate_blocks(self, blocks, sconfig):
+        """依次检查根类的分块，返回错误的列表."""
+        config = {
+            'node': {},
+            'nest_class': {},
+            'nest_inherit': {},
+        }
+        errors = []
+        try:
+            for block in blocks:
+                block_source = ConfigSource(block, numbered=True)
+                try:
+                    is_success, info = self._load(block_source, sconfig, config)
+                except Exception as ex:
+                    is_success, info = False, (block[0][0], block[0][1], 'Parse failed - {}'.format(ex))
+                if not is_success:
+                    line_number, line_real, message = info
+                    if line_real is None:
+                        line_real = block_source.line(line_number)
+                    errors.append((line_number, line_real, message))
+        except Exception as ex:  # 读取配置失败
+            errors.append((0, '', 'Read failed - {}'.format(ex)))
+        return errors
+
+    @staticmethod
+    def _partition(blocks):
+        """
+        按根类之间的引用把分块分成互不依赖的部分，返回[[分块]]，每部分中的分块保持原来的顺序.
+
+        根类的类名或别名出现在其他分块中时认为两个分块相互依赖，属性中同名的变量也会被当作引用，分区只会偏大
+        """
+        parent = list(range(len(blocks)))
+
+        def find(index):
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        # 先收集所有根类的名称再合并，在定义之前使用的根类（顺序检查时报错）同样与定义它的分块合并
+        used = []  # 每个分块中出现的名称
+        defined = {}  # 根类的类名和别名对应的分块，{名称: [分块序号]}
+        for index, block in enumerate(blocks):
+            names = set()
+            for line_number, line in block:
+                names.update(re.findall(r'[A-Za-z_]\w*', line))
+            used.append(names)
+
+            header = re.match(r'<\s*([A-Za-z_]\w*)[^>]*?(?:->\s*([A-Za-z_]\w*))?\s*>', block[0][1])
+            if header:
+                for name in header.groups():
+                    if name is not None:
+                        defined.setdefault(name, []).append(index)
+
+        for index, names in enumerate(used):  # 定义同一个名称的分块也出现了该名称，会合并在一起
+            for name in names:
+                for other in defined.get(name, ()):
+                    parent[find(index)] = find(other)
+
+        partitions = {}
+        for index, block in enumerate(blocks):
+            partitions.setdefault(find(index), []).append(block)
+        return list(partitions.values())
+
+    def _dependents(self, config, changed):
+        """改变的根类以及继承或使用了这些根类的根类."""
+        result = set(changed)
+        for key, uses in config['nest_class'].items():  # 根类必须在继承和使用之前定义，按顺序遍历一次即可
+            if key not in result and (uses | config['nest_inherit'].get(key, set())) & result:
+                result.add(key)
+        return result
+
+    def _match_nodes(self, old, new, mapping):
+        """按位置对应新旧配置节点，结构不同的子树不对应."""
+        if old.name != new.name or len(old._children) != len(new._children):
+            Log.warning('Reload %s changed structure, instances need to be recreated', new.name)
+            return
+        mapping[old] = new
+        for old_child, new_child in zip(old._children, new._children):
+            self._match_nodes(old_child, new_child, mapping)
+
+    def _patch_instances(self, root, mapping):
+        """更新已经实例化的节点，属性变化在批量修改结束时统一触发和传播."""
+        patched = []
+        with Propagation.batch():
+            for instance in list(root._instances or ()):
+                nodes = []
+                stack = [instance]
+                while stack:
+                    node = stack.pop()
+                    nodes.append(node)
+                    stack.extend(node.children)
+
+                touched = False
+                for node in nodes:
+                    new = mapping.get(node._config)
+                    if new is None:
+                        continue
+                    if len(node.children) != len(new.children):
+                        Log.warning('Reload %s changed structure, instance need to be recreated', new.name)
+                        continue
+                    patched.append((node, new, new._patch(node, node._config)))
+                    touched = True
+
+                if touched:  # 重新解析的属性可能在未改变的节点上添加了触发器
+                    for node in nodes:
+                        object.__setattr__(node, '_trigger', node._config._template()['trigger'])
+
+            for node, new, dynamic in patched:
+                new._bind(node, recursive=False)
+            for node, new, dynamic in patched:
+                for name in dynamic:
+                    if name in node._reflex:
+                        expr, local = node._reflex[name]
+                        try:
+                            setattr(node, name, eval(expr, None, local))
+                        except Exception as ex:
+                            Log.error(ex)
+        return len(patched)
+
+    def reload(self, data):
+        """
+        增量重新加载配置，返回更新后的根节点.
+
+        配置按根类分块，只重新解析内容改变的根类以及继承或使用了这些根类的根类，替换配置树中对应的节点，
+        并更新已经实例化的节点。根类的声明有增删或修改时重新加载整个配置
+        """
+        try:
+            path, data = self._read(data)
+            if path not in self._loaded:
+                return self.load(path or data)
+            root, config = self._loaded[path]
+            blocks = config['blocks']
+
+            lines = self._split_lines(data)
+            source = ConfigSource(lines)
+            for line in source:  # 只计算分块
+                pass
+            new_blocks = source.blocks
+            if [block[0] for block in blocks] != [block[0] for block in new_blocks]:
+                Log.debug('Reload %s with root classes changed', path or 'config')
+                del self._loaded[path]
+                return self.load(path or data)
+
+            keys = list(config['nest_class'])  # 根类的顺序和分块的顺序相同
+            changed = set()
+            for index, (block, new_block) in enumerate(zip(blocks, new_blocks)):
+                if block[1] == new_block[1]:
+                    continue
+                if block[0] is None:  # 第一个根类之前只有注释和空行
+                    continue
+                changed.add(keys[index - 1])
+            if not changed:
+                config['blocks'] = new_blocks
+                return root
+
+            reparse = self._dependents(config, changed)
+            names = {ConfigMethod.real_name(*key) for key in reparse}
+            partial = {
+                'node': {name: node for name, node in config['node'].items() if name not in names},
+                'nest_class': {key: uses for key, uses in config['nest_class'].items() if key not in reparse},
+                'nest_inherit': {key: bases for key, bases in config['nest_inherit'].items() if key not in reparse},
+            }
+
+            indexes = [index for index, key in enumerate(keys) if key in reparse]
+            numbered = []
+            for index in indexes:
+                header, digest, start, end = new_blocks[index + 1]
+                numbered.extend((line_number, lines[line_number - 1]) for line_number in range(start, end))
+
+            sconfig = self._sconfig()
+            source = ConfigSource(numbered, numbered=True)
+            is_success, info = self._load(source, sconfig, partial)
+            if not is_success:  # 保留上次成功解析的内容
+                self._error(source, info)
+                return None
+            partial_root, partial = info
+        except Exception:
+            Log.exception()
+            return None
+
+        mapping = {}
+        for index, node in zip(indexes, partial_root._children):
+            old = root._children[index]
+            for old_node, deep in old.walk():  # 旧节点不再随基类的缓存一起失效
+                for base in old_node._class_base:
+                    base._derived.remove(old_node)
+            self._match_nodes(old, node, mapping)
+            root._children[index] = node
+            node._parent = root
+        root._invalidate('children')
+
+        config['node'] = partial['node']
+        config['nest_class'] = {key: partial['nest_class'][key] for key in keys}
+        config['nest_inherit'] = partial['nest_inherit']
+        config['blocks'] = new_blocks
+
+        self.create_class(partial_root, sconfig, {'node': {ConfigMethod.real_name(*key): partial['node'][ConfigMethod.real_name(*key)] for key in reparse}})
+        count = self._patch_instances(root, mapping)
+        Log.debug('Reload %s: %d root classes reparsed, %d instances patched', path or 'config', len(indexes), count)
+        return root
+
+
+def _validate_partitions(options, sconfig, partitions):
+    """在子进程中检查互不依赖的分区."""
+    config = Config(cache=False, **options)
+    errors = []
+    for partition in partitions:
+        errors.extend(config._validate_blocks(partition, sconfig))
+    return errors
+
 
 if __name__ == '__main__':
     class TestWidget(Node):
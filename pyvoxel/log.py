@@ -1,10 +1,27 @@
 # -*- coding: utf-8 -*-
 """日志."""
+import atexit
 import logging
+import logging.handlers
+import queue
 import traceback
 from pyvoxel.pattern.singleton import Singleton
 
 
+class AsyncHandler(logging.handlers.QueueHandler):
+    """把日志记录放入队列，时间等格式化和输出在后台线程中进行."""
+
+    def prepare(self, record):
+        """在调用线程中合并消息和参数，参数在记录后可能被修改，异常信息转换为文本."""
+        # 异步时其他handler都移到了后台线程，日志也不向上传递，可以直接修改记录
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None  # 不保留栈帧的引用
+        return record
+
+
 class LogBase(logging.Logger, Singleton):
     """自定义日志格式."""
 
@@ -13,6 +30,7 @@ class LogBase(logging.Logger, Singleton):
         self.name = name
         self.level = level
         self.formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(module)s -> %(funcName)s (%(lineno)d) : %(message)s', '%Y-%m-%d %H:%M:%S')
+        self.listener = None  # 异步日志的后台线程
 
         super(LogBase, self).__init__(name=self.name, level=self.level)
         self.__setSteamHandler__()
@@ -23,9 +41,45 @@ class LogBase(logging.Logger, Singleton):
         stream_handler.setFormatter(self.formatter)
         self.addHandler(stream_handler)
 
+    def setLevel(self, level):
+        """设置日志级别，日志没有注册到logging的manager中，需要自己清除isEnabledFor的缓存."""
+        super(LogBase, self).setLevel(level)
+        self._cache.clear()
+
+    @property
+    def is_async(self):
+        """是否使用异步日志."""
+        return self.listener is not None
+
+    def start_async(self):
+        """使用异步日志，调用线程只把记录放入队列，由后台线程写入原先的handler."""
+        if self.listener is not None:
+            return
+        handlers = list(self.handlers)
+        log_queue = queue.SimpleQueue()
+        self.listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        for handler in handlers:
+            self.removeHandler(handler)
+        self.addHandler(AsyncHandler(log_queue))
+        self.listener.start()
+        atexit.register(self.stop_async)
+
+    def stop_async(self):
+        """停止异步日志，等待队列中的日志写完后恢复同步的handler."""
+        if self.listener is None:
+            return
+        listener, self.listener = self.listener, None
+        atexit.unregister(self.stop_async)
+        for handler in list(self.handlers):
+            self.removeHandler(handler)
+        listener.stop()
+        for handler in listener.handlers:
+            self.addHandler(handler)
+
     def exception(self):
         """出现异常时将异常信息记录到日志."""
-        self.critical('\n' + traceback.format_exc())
+        if self.isEnabledFor(logging.CRITICAL):
+            self.critical('\n' + traceback.format_exc())
 
 
 Log = LogBase(name='voxel', level=logging.DEBUG)
@@ -37,3 +91,6 @@ if __name__ == '__main__':
         Log.debug('Debug')
     log_test()
     Log.error('Error')
+    Log.start_async()
+    Log.debug('Async %s', 'debug')
+    Log.stop_async()
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 """插件管理模块."""
+import hashlib
 import importlib
 import os
+import pickle
+import threading
+import time
 
 from pyvoxel.pattern.singleton import Singleton
 from pyvoxel.log import Log
@@ -10,16 +14,34 @@ from pyvoxel.log import Log
 class ManagerBase(Singleton):
     """插件管理."""
 
+    INDEX_VERSION = 2  # 插件索引格式修改后需要增加
+    INDEX_DIR = None  # 插件索引的目录，为空时使用用户的缓存目录，不在安装目录下写文件
+    INDEX_SUFFIX = '.idx'
+
     _instance = {}
     _plugin_dir = 'plugins'  # 用户的插件目录
 
     _base_plugins = set()  # 默认插件列表
     _plugins = set()  # 自定义插件列表
+    _modules = {}  # 插件的模块路径，{(name, isbase): module}
+    _lazy = False  # 延迟加载，使用插件时才导入
+    _load_time = {}  # 每个插件的导入耗时，{name: seconds}
+    _lock = threading.RLock()  # 并行导入时保护插件列表
 
     def __init__(self):
         """初始化时扫描插件目录."""
         self.auto_scan()
 
+    @property
+    def lazy(self):
+        """是否延迟加载插件."""
+        return self._lazy
+
+    @property
+    def load_time(self):
+        """每个插件的导入耗时，单位为秒."""
+        return dict(self._load_time)
+
     @property
     def plugins(self):
         """所有的插件."""
@@ -42,24 +64,36 @@ class ManagerBase(Singleton):
         # 获取默认插件
         from pyvoxel import plugins
         base_plugin_dir = os.path.dirname(plugins.__file__)
-        base_plugins = self.scan_plugin(base_plugin_dir)
-        for plugin in base_plugins:
+        base_modules = self.scan_index(base_plugin_dir, plugins.__name__)
+        for plugin, module in base_modules.items():
             if plugin.lower() in plugins_loaded:
                 continue
             self._base_plugins.add(plugin)
+            self._modules[(plugin, True)] = module
 
         # 用户插件
-        plugins = self.scan_plugin(self._plugin_dir)
-        for plugin in plugins:
+        modules = self.scan_index(self._plugin_dir, self._plugin_dir.replace(os.sep, '.'))
+        for plugin, module in modules.items():
             if plugin.lower() in plugins_loaded:
                 continue
             self._plugins.add(plugin)
-
-    def auto_load(self):
-        """自动加载所有插件，先加载默认插件，再加载用户插件，有名称相同的则覆盖."""
-        # 被覆盖的插件不重复加载
-        for name in self.plugins_unload:
-            self.load_plugin(name)
+            self._modules[(plugin, False)] = module
+
+    def auto_load(self, lazy=False, workers=1):
+        """自动加载所有插件，先加载默认插件，再加载用户插件，有名称相同的则覆盖，延迟加载时只在使用插件时导入."""
+        self._lazy = lazy
+        if lazy:
+            return
+
+        # 被覆盖的插件不重复加载，同名的插件在同一个任务中加载，保证用户插件优先
+        names = sorted(self.plugins_unload)
+        if workers > 1 and len(names) > 1:
+            from concurrent.futures import ThreadPoolExecutor  # 只有并行加载时使用，减少导入时间
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(self.load_plugin, names))
+        else:
+            for name in names:
+                self.load_plugin(name)
 
     def scan_plugin(self, plugin_dir):
         """扫描目录下的所有插件."""
@@ -68,20 +102,86 @@ class ManagerBase(Singleton):
             return set()
         return {name for name in os.listdir(plugin_dir) if not name.startswith('__')}
 
+    @staticmethod
+    def cache_dir():
+        """用户的缓存目录，$XDG_CACHE_HOME/pyvoxel或~/.cache/pyvoxel，插件索引和配置缓存都保存在这里，不在安装目录下写文件."""
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(cache_home, 'pyvoxel')
+
+    def index_path(self, plugin_dir):
+        """插件目录对应的索引文件，保存在用户的缓存目录下，按插件目录的绝对路径区分."""
+        index_dir = self.INDEX_DIR
+        if index_dir is None:
+            index_dir = self.cache_dir()
+        key = hashlib.sha1(os.path.abspath(plugin_dir).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(index_dir, 'plugins-' + key + self.INDEX_SUFFIX)
+
+    def scan_index(self, plugin_dir, package):
+        """扫描目录下的插件及模块路径，目录修改时间不变时直接使用保存的索引."""
+        if not os.path.isdir(plugin_dir):
+            Log.warning('{plugin_dir} not exist'.format(plugin_dir=plugin_dir))
+            return {}
+
+        index_path = self.index_path(plugin_dir)
+        mtime = os.stat(plugin_dir).st_mtime_ns
+        modules = self._load_index(index_path, package, mtime)
+        if modules is not None:
+            return modules
+
+        modules = {}
+        for name in self.scan_plugin(plugin_dir):
+            name_lower = name.lower()
+            if not os.path.isdir(os.path.join(plugin_dir, name_lower)):
+                continue
+            modules[name] = '{package}.{name}.{name}'.format(package=package, name=name_lower)
+        self._save_index(index_path, package, mtime, modules)
+        return modules
+
+    def _load_index(self, index_path, package, mtime):
+        """读取插件索引，插件目录有修改时返回空."""
+        if not os.path.isfile(index_path):
+            return None
+        try:
+            with open(index_path, 'rb') as fp:
+                version, index_package, index_mtime, modules = pickle.load(fp)
+            if version != self.INDEX_VERSION or index_package != package or index_mtime != mtime:
+                return None
+            return modules
+        except Exception as ex:
+            Log.debug('Plugin index %s load failed - %s', index_path, ex)
+            return None
+
+    def _save_index(self, index_path, package, mtime, modules):
+        """保存插件索引，索引只是缓存，目录不可写时不保存也不提示."""
+        temp_path = '{}.{}.tmp'.format(index_path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            with open(temp_path, 'wb') as fp:
+                pickle.dump((self.INDEX_VERSION, package, mtime, modules), fp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, index_path)
+            return True
+        except Exception as ex:
+            Log.debug('Plugin index %s save failed - %s', index_path, ex)
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
+
     def _load_plugin(self, name, isbase=False):
         """加载插件，插件文件名和目录需要小写，加载插件时名称忽略大小写，最好使用插件主类的名称."""
         name_lower = name.lower()
-        if not os.path.isdir(os.path.join(self._plugin_dir, name_lower)):
+        module = self._modules.get((name, isbase))
+        if module is None:
             Log.warning('Plugin <{name}> not exist'.format(name=name))
             return False
 
         try:
-            Log.debug('Load plugin <{name}>'.format(name=name))
+            Log.debug('Load plugin <%s>', name)  # 日志级别关闭时不格式化
 
-            if isbase:
-                plugin = importlib.import_module('pyvoxel.{plugin_dir}.{name}.{name}'.format(plugin_dir=self._plugin_dir, name=name_lower))  # 导入默认模块
-            else:
-                plugin = importlib.import_module('{plugin_dir}.{name}.{name}'.format(plugin_dir=self._plugin_dir, name=name_lower))  # 导入模块
+            begin = time.perf_counter()
+            plugin = importlib.import_module(module)  # 导入模块，不同插件可以并行导入
+            load_time = time.perf_counter() - begin
             for class_name in dir(plugin):  # 传入的可能是小写字母，与对应类名称不同
                 if class_name.startswith('__') and class_name.endswith('__'):
                     continue
@@ -90,15 +190,17 @@ class ManagerBase(Singleton):
             else:
                 class_name = name
             instance = getattr(plugin, class_name)  # 获取模块中的类
-            if class_name in self._instance:
-                del self._instance[class_name]
-
-            if name in self._base_plugins:  # 有重复插件需要同时删除
-                self._base_plugins.remove(name)
-            if name in self._plugins:
-                self._plugins.remove(name)
-            self._instance[class_name] = instance
-            Log.debug('Plugin <{name} - {path}> loaded'.format(name=name, path=instance.__module__.split('.', 1)[0]))
+            with self._lock:
+                if class_name in self._instance:
+                    del self._instance[class_name]
+
+                if name in self._base_plugins:  # 有重复插件需要同时删除
+                    self._base_plugins.remove(name)
+                if name in self._plugins:
+                    self._plugins.remove(name)
+                self._instance[class_name] = instance
+                self._load_time[name] = load_time
+            Log.debug('Plugin <%s - %s> loaded in %.1fms', name, instance.__module__.split('.', 1)[0], load_time * 1000)
             return True
         except Exception as ex:
             Log.error('Plugin <{name}> load failed - {ex}'.format(name=name, ex=ex))
@@ -113,8 +215,29 @@ class ManagerBase(Singleton):
             return self._load_plugin(name, isbase=True)
         return False
 
+    def plugin_source(self, name):
+        """插件的来源，已加载的插件为类的模块和限定名，未加载的插件为索引中的模块路径."""
+        instance = self._instance.get(name)
+        if instance is not None:
+            return '{}.{}'.format(instance.__module__, instance.__qualname__)
+        return self._modules.get((name, False)), self._modules.get((name, True))
+
+    def _find_plugin(self, name):
+        """查找未加载的插件名称，忽略大小写."""
+        if name in self.plugins_unload:
+            return name
+        name_lower = name.lower()
+        for plugin in self.plugins_unload:
+            if plugin.lower() == name_lower:
+                return plugin
+        return None
+
     def __call__(self, name):
-        """实例化插件."""
+        """实例化插件，延迟加载时第一次使用才导入."""
+        if name not in self._instance and self._lazy:
+            plugin = self._find_plugin(name)
+            if plugin is not None:
+                self.load_plugin(plugin)
         if name not in self._instance:
             Log.warning('Plugin <{name}> not exist'.format(name=name))
             return None
@@ -1,55 +1,264 @@
 # -*- coding: utf-8 -*-
+"""节点."""
+import logging
+from contextlib import contextmanager
+from types import MappingProxyType
+
+from pyvoxel.pattern.singleton import Singleton
 from pyvoxel.log import Log
+from pyvoxel.profiler import Profiler
+
+
+EMPTY = MappingProxyType({})  # 没有绑定属性的节点共享的只读映射，不用为每个实例新建字典
 
 
 # 类中attr属性改变时触发on_attr事件，同时同步改变关联的值
-class Node(object):
-    def __new__(cls):  # 不用在子类中调用super初始化
-        cls._trigger = {}
-        cls._reflex = {}
-        cls.parent = None
-        cls.children = []
-        print('node new')
-        return super().__new__(cls)
+class NodeBase:
+    """
+    节点类的基类.
+
+    节点数据保存在__slots__中，派生类同样声明__slots__时实例没有__dict__，适合大量节点的场景
+    """
+
+    __slots__ = ('_trigger', '_reflex', '_config', 'ids', 'parent', 'children', '__weakref__')
+
+    def __new__(cls, *args, **kwargs):  # 不用在子类中调用super初始化
+        """初始化触发器等数据，数据保存在实例中."""
+        cls._init(cls)
+        node = super().__new__(cls)
+        object.__setattr__(node, '_trigger', {})
+        object.__setattr__(node, '_reflex', EMPTY)
+        object.__setattr__(node, 'parent', None)
+        object.__setattr__(node, 'children', [])
+        return node
+
+    def _init(cls):
+        if not hasattr(cls, '_confignode'):
+            return
+
+        confignode = cls._confignode
+        # confignode.create(cls)
+
+        # print(confignode.name, confignode.trigger, confignode.children)
+        # for child in confignode.children:
+        #     print(child.class_base[0].name, child.class_base[0].class_base)
+
+        #     cls.children.append(child_node())
 
     def __setattr__(self, name, value):
-        ovalue = self.__dict__.get(name, None)
-        self.__dict__[name] = value
+        """改变变量时触发数据同步."""
+        ovalue = getattr(self, name, None)
+        object.__setattr__(self, name, value)
 
         try:
+            if Propagation.batching:  # 批量修改时延迟到结束后处理
+                Propagation.defer(self, name, ovalue)
+                return
             self._on_func(name, ovalue, value)
+            if name in self._trigger:
+                Propagation.propagate(self, name)
         except Exception as ex:
             Log.error(ex)
 
-    # 调用on_函数
+    def batch(self):
+        """
+        批量修改属性，作用于整个场景.
+
+        with node.batch():
+            node.x = 1
+            node.y = 2
+        """
+        return Propagation.batch()
+
+    #  调用on_函数
     def _on_func(self, name, ovalue, value):
-        on_name = 'on_' + name
-        if on_name in self.__dict__:
-            on_func = self.__dict__[on_name]
+        on_func = getattr(self, 'on_' + name, None)
+        if on_func is not None:
             on_func(ovalue, value)
 
-        if name in self._trigger:
-            for node, nname in self._trigger[name]:
-                node._update_value(nname, (self, name), value)
+    #  通过相对路径定位节点，self.p.c0
+    def _locate(self, rname):
+        node = self
+        for pn in rname.split('.')[1:]:
+            if node is None:
+                return None
+            if pn == 'p':
+                node = node.parent
+            else:
+                index = int(pn[1:])
+                if index >= len(node.children):
+                    return None
+                node = node.children[index]
+        return node
 
-    # 更新关联类的值
-    def _update_value(self, name, base, basev):
+    #  重新计算关联的值，计算失败时返回False
+    def _update_value(self, name):
         try:
-            expr, pattern, local = self._reflex[name]
-            local[pattern[base]] = basev
+            expr, local = self._reflex[name]
+            if isinstance(expr, str):  # 首次使用时编译，之后直接使用代码对象，相同的表达式共享编译缓存
+                from pyvoxel.config import ConfigMethod  # config依赖node，在使用时导入
+                expr = ConfigMethod.compile(expr)
+                self._reflex[name] = expr, local
 
             value = eval(expr, None, local)
-            setattr(self, name, value)
         except Exception as ex:
             Log.error(ex)
+            return False
+
+        ovalue = getattr(self, name, None)
+        object.__setattr__(self, name, value)
+        try:
+            self._on_func(name, ovalue, value)
+        except Exception as ex:
+            Log.error(ex)
+        return True
 
     def add_node(self, node):
+        """添加节点."""
         self.children.append(node)
         if node.parent:
             Log.warning('{node} already has parent'.format(node=node))
         node.parent = self
 
 
+class Node(NodeBase):
+    """节点类，属性保存在__dict__中，可以任意添加属性."""
+
+    pass
+
+
+class PropagationBase(Singleton):
+    """
+    属性变化的传播.
+
+    属性改变时，先沿触发器收集所有受影响的属性，再按依赖关系的拓扑顺序重新计算
+    每个属性在一次变化中只计算一次，计算时依赖的属性都已经是最终的值，不会出现中间状态
+    """
+
+    def __init__(self):
+        """初始化批量修改的状态."""
+        self._depth = 0  # batch的嵌套层数
+        self._pending = {}  # 批量修改中改变的属性，{(节点, 属性): 修改前的值}
+        self.bulk = None  # 开启批量计算时由Bulk设置，节点模块不导入bulk，不使用时不需要导入numpy
+
+    @property
+    def batching(self):
+        """是否处于批量修改中."""
+        return self._depth > 0
+
+    @contextmanager
+    def batch(self):
+        """批量修改属性，on_函数和关联属性的计算延迟到最外层结束时，每个属性只处理一次."""
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self.flush()
+
+    def defer(self, node, name, ovalue):
+        """记录批量修改中改变的属性，多次修改保留第一次修改前的值."""
+        self._pending.setdefault((node, name), ovalue)
+
+    def flush(self):
+        """处理批量修改中改变的属性."""
+        pending, self._pending = self._pending, {}
+        for (node, name), ovalue in pending.items():
+            try:
+                node._on_func(name, ovalue, getattr(node, name, None))
+            except Exception as ex:
+                Log.error(ex)
+        self.run([key for key in pending if key[1] in key[0]._trigger])
+
+    def propagate(self, node, name):
+        """节点的属性改变后同步关联的属性."""
+        self.run([(node, name)])
+
+    def _edges(self, node, name):
+        """属性直接影响的属性，[((节点, 属性), 表达式中的变量)]."""
+        edges = []
+        for rname, nmap in node._trigger.get(name, {}).items():
+            target = node._locate(rname)
+            if target is None:
+                continue
+            for tname, omap in nmap.items():
+                if tname not in target._reflex:
+                    continue
+                # 触发器在继承的子节点之间共享，只响应目标实际使用的表达式，自身定义的表达式优先级最高
+                config = target._config
+                if config in omap:
+                    edges.append(((target, tname), omap[config]))
+                    continue
+                attr = config.attr.get(tname)
+                for owner, iname in omap.items():
+                    if owner._attr.get(tname) is attr:
+                        edges.append(((target, tname), iname))
+        return edges
+
+    def run(self, changes):
+        """changes为已经改变的(节点, 属性)列表，按拓扑顺序重新计算受影响的属性."""
+        # 收集受影响的属性，构建依赖图
+        graph = {}
+        stack = list(changes)
+        while stack:
+            key = stack.pop()
+            if key in graph:
+                continue
+            graph[key] = self._edges(*key)
+            for tkey, iname in graph[key]:
+                if tkey not in graph:
+                    stack.append(tkey)
+
+        # 直接修改的属性以修改的值为准，不重新计算
+        indegree = {key: 0 for key in graph}
+        for key in changes:
+            indegree.pop(key, None)
+        for edges in graph.values():
+            for tkey, iname in edges:
+                if tkey in indegree:
+                    indegree[tkey] += 1
+
+        profile = Profiler.enabled  # 只在传播开始时检查一次，关闭时没有额外开销
+        bulk = None if profile else self.bulk  # 统计时需要逐个计算
+        depth = {key: 0 for key in changes} if profile else None  # 传播的层数
+        # 按层计算，同一层的属性互不依赖，可以批量计算
+        queue = [key for key in dict.fromkeys(changes) if key in graph]
+        while queue:
+            ready = [key for key in queue if key in indegree]
+            for key in ready:
+                del indegree[key]
+            if bulk is not None and len(ready) >= bulk.threshold:
+                ready = bulk.update(ready)
+            for node, name in ready:
+                if profile:
+                    Profiler.update(node, name)
+                else:
+                    node._update_value(name)
+
+            layer, queue = queue, []
+            for key in layer:
+                value = getattr(key[0], key[1], None)
+                for tkey, iname in graph[key]:
+                    target, tname = tkey
+                    target._reflex[tname][1][iname] = value
+                    if profile:
+                        depth[tkey] = max(depth.get(tkey, 0), depth[key] + 1)
+                    if tkey in indegree:
+                        indegree[tkey] -= 1
+                        if indegree[tkey] == 0:
+                            queue.append(tkey)
+
+        if profile:
+            Profiler.record_run(changes, len(graph) - len(changes), max(depth.values(), default=0))
+
+        if indegree and Log.isEnabledFor(logging.WARNING):  # 循环依赖的属性无法计算
+            Log.warning('Binding cycle in {}'.format(', '.join('{}.{}'.format(node.__class__.__name__, name) for node, name in indegree)))
+
+
+Propagation = PropagationBase()
+
+
 if __name__ == '__main__':
     t1 = Node()
     t2 = Node()
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""体素地形的分块存储."""
+import numpy
+
+
+AIR = 0  # 空气，全部为空气的块不保存
+MATERIAL_DTYPE = numpy.uint16  # 材质展开为数组时的类型
+
+
+class Chunk:
+    """
+    固定大小的体素块，使用调色板压缩.
+
+    palette为块中使用的材质，indices为每个体素在调色板中的序号，材质不超过256种时使用uint8
+    所有体素相同时只保存调色板，indices为None
+    修改体素时调色板中可能留下不再使用的材质，调色板满时或者批量修改后压缩
+    """
+
+    __slots__ = ('size', 'palette', 'indices', '_lookup')
+
+    def __init__(self, size, value=AIR):
+        """新建所有体素都为value的块."""
+        self.size = size
+        self.palette = [value]
+        self.indices = None
+        self._lookup = {value: 0}
+
+    @classmethod
+    def from_array(cls, values):
+        """从材质数组新建块."""
+        chunk = cls(values.shape[0])
+        chunk._assign(values)
+        return chunk
+
+    def _assign(self, values):
+        """使用材质数组重新生成调色板和序号."""
+        palette, inverse = numpy.unique(values, return_inverse=True)
+        self.palette = palette.tolist()
+        self._lookup = {value: index for index, value in enumerate(self.palette)}
+        if len(self.palette) == 1:
+            self.indices = None
+        else:
+            dtype = numpy.uint8 if len(self.palette) <= 256 else numpy.uint16
+            self.indices = inverse.reshape(values.shape).astype(dtype)
+
+    @property
+    def uniform(self):
+        """所有体素是否相同."""
+        return self.indices is None
+
+    @property
+    def value(self):
+        """所有体素相同时的材质，否则为None."""
+        return self.palette[0] if self.indices is None else None
+
+    @property
+    def nbytes(self):
+        """序号数组占用的字节数."""
+        return 0 if self.indices is None else self.indices.nbytes
+
+    def only(self, value):
+        """所有体素是否都是value，调色板中可能留有不再使用的材质，因此检查序号数组."""
+        if self.indices is None:
+            return self.palette[0] == value
+        index = self._lookup.get(value)
+        return index is not None and not numpy.any(self.indices != index)
+
+    def _index(self, value):
+        """材质在调色板中的序号，不存在时添加，调色板满时先压缩，仍然放不下时扩大序号的类型."""
+        index = self._lookup.get(value)
+        if index is not None:
+            return index
+        if self.indices is not None and len(self.palette) > numpy.iinfo(self.indices.dtype).max:
+            self.compact()
+            if self.indices is None:  # 压缩后所有体素相同
+                return self._index(value)
+            if len(self.palette) > numpy.iinfo(self.indices.dtype).max:
+                self.indices = self.indices.astype(numpy.uint16)
+        index = len(self.palette)
+        self.palette.append(value)
+        self._lookup[value] = index
+        return index
+
+    def _expand(self):
+        """所有体素相同时展开为序号数组."""
+        if self.indices is None:
+            self.indices = numpy.zeros((self.size,) * 3, dtype=numpy.uint8)
+
+    def get(self, x, y, z):
+        """块内坐标的材质."""
+        if self.indices is None:
+            return self.palette[0]
+        return self.palette[self.indices[x, y, z]]
+
+    def set(self, x, y, z, value):
+        """设置块内坐标的材质."""
+        if self.indices is None:
+            if value == self.palette[0]:
+                return
+            self._expand()
+        self.indices[x, y, z] = self._index(value)
+
+    def fill(self, region, value):
+        """region为块内坐标的切片，区域内的体素设置为value."""
+        if self.indices is None and value == self.palette[0]:
+            return
+        if all(part.start == 0 and part.stop == self.size for part in region):  # 覆盖整个块
+            self.palette = [value]
+            self.indices = None
+            self._lookup = {value: 0}
+            return
+        index = self._index(value)
+        self._expand()
+        self.indices[region] = index
+
+    def write(self, region, values):
+        """region为块内坐标的切片，使用values数组设置区域内的体素."""
+        if all(part.start == 0 and part.stop == self.size for part in region):
+            self._assign(values)
+            return
+        merged = self.to_array()  # 与原有体素合并后重新生成调色板
+        merged[region] = values
+        self._assign(merged)
+
+    def to_array(self, region=None):
+        """展开为材质数组，region为块内坐标的切片，为空时展开整个块."""
+        if region is None:
+            region = (slice(0, self.size),) * 3
+        if self.indices is None:
+            shape = tuple(part.stop - part.start for part in region)
+            return numpy.full(shape, self.palette[0], dtype=MATERIAL_DTYPE)
+        return numpy.asarray(self.palette, dtype=MATERIAL_DTYPE)[self.indices[region]]
+
+    def compact(self):
+        """删除调色板中不再使用的材质，只剩一种材质时不再保存序号数组."""
+        if self.indices is None:
+            return
+        used, inverse = numpy.unique(self.indices, return_inverse=True)
+        if len(used) == len(self.palette):
+            return
+        palette = [self.palette[index] for index in used.tolist()]
+        if len(palette) == 1:
+            self.indices = None
+        else:
+            dtype = numpy.uint8 if len(palette) <= 256 else numpy.uint16
+            self.indices = inverse.reshape(self.indices.shape).astype(dtype)
+        self.palette = palette
+        self._lookup = {value: index for index, value in enumerate(palette)}
+
+
+class ChunkStore:
+    """
+    按块保存的体素世界.
+
+    世界坐标按块的大小分块，只保存不全是空气的块，所有体素相同的块只保存一个材质，
+    内存占用由地表等材质变化的区域决定，与世界的体积无关
+    区域使用半开区间[start, stop)
+    """
+
+    def __init__(self, size=16):
+        """size为块的边长，必须是2的幂."""
+        if size <= 0 or size & (size - 1):
+            raise ValueError('Chunk size must be a power of 2')
+        self.size = size
+        self.shift = size.bit_length() - 1
+        self.mask = size - 1
+        self.chunks = {}  # {(cx, cy, cz): Chunk}
+        self.dirty = set()  # 修改后需要重新生成网格的块，包括边界相邻的块
+        self.changed = set()  # 修改过的块，用来更新LOD
+
+    def __len__(self):
+        """保存的块数."""
+        return len(self.chunks)
+
+    @property
+    def nbytes(self):
+        """所有块的序号数组占用的字节数."""
+        return sum(chunk.nbytes for chunk in self.chunks.values())
+
+    def chunk_key(self, x, y, z):
+        """世界坐标所在的块."""
+        return x >> self.shift, y >> self.shift, z >> self.shift
+
+    def get(self, x, y, z):
+        """世界坐标的材质."""
+        chunk = self.chunks.get((x >> self.shift, y >> self.shift, z >> self.shift))
+        if chunk is None:
+            return AIR
+        return chunk.get(x & self.mask, y & self.mask, z & self.mask)
+
+    def set(self, x, y, z, value):
+        """设置世界坐标的材质."""
+        key = x >> self.shift, y >> self.shift, z >> self.shift
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            if value == AIR:
+                return
+            chunk = self.chunks[key] = Chunk(self.size)
+        local = x & self.mask, y & self.mask, z & self.mask
+        chunk.set(*local, value)
+        if value == AIR and chunk.only(AIR):  # 挖空的块删除，和fill、write一样不保存全部为空气的块
+            del self.chunks[key]
+        self.dirty.add(key)
+        self.changed.add(key)
+        if not all(0 < part < self.mask for part in local):  # 在块的边界上
+            self._mark(key, local, local)
+
+    def _mark(self, key, low, high):
+        """标记修改的块，修改的区域[low, high]在块的边界上时同时标记该方向上相邻的块."""
+        self.dirty.add(key)
+        self.changed.add(key)
+        for axis in range(3):
+            for touch, offset in ((low[axis] == 0, -1), (high[axis] == self.mask, 1)):
+                if not touch:
+                    continue
+                near = list(key)
+                near[axis] += offset
+                near = tuple(near)
+                if near in self.chunks:  # 不存在的块没有网格
+                    self.dirty.add(near)
+
+    def _regions(self, start, stop):
+        """区域覆盖的块，返回[(块, 块内的切片, 区域内的切片)]."""
+        first = [value >> self.shift for value in start]
+        last = [(value - 1) >> self.shift for value in stop]
+        result = []
+        for cx in range(first[0], last[0] + 1):
+            for cy in range(first[1], last[1] + 1):
+                for cz in range(first[2], last[2] + 1):
+                    key = cx, cy, cz
+                    local = []
+                    world = []
+                    for axis, value in enumerate(key):
+                        base = value << self.shift
+                        low = max(start[axis], base)
+                        high = min(stop[axis], base + self.size)
+                        local.append(slice(low - base, high - base))
+                        world.append(slice(low - start[axis], high - start[axis]))
+                    result.append((key, tuple(local), tuple(world)))
+        return result
+
+    def _store(self, key, chunk):
+        """保存块，全部为空气的块删除."""
+        if chunk.uniform and chunk.value == AIR:
+            self.chunks.pop(key, None)
+        else:
+            self.chunks[key] = chunk
+
+    def fill(self, start, stop, value):
+        """区域内的体素设置为value."""
+        if any(low >= high for low, high in zip(start, stop)):
+            return
+        for key, local, world in self._regions(start, stop):
+            chunk = self.chunks.get(key)
+            if chunk is None:
+                if value == AIR:
+                    continue
+                chunk = Chunk(self.size)
+            chunk.fill(local, value)
+            chunk.compact()
+            self._store(key, chunk)
+            self._mark(key, [part.start for part in local], [part.stop - 1 for part in local])
+
+    def write(self, start, values):
+        """使用材质数组设置从start开始的区域."""
+        values = numpy.asarray(values)
+        stop = tuple(low + length for low, length in zip(start, values.shape))
+        if any(low >= high for low, high in zip(start, stop)):
+            return
+        for key, local, world in self._regions(start, stop):
+            chunk = self.chunks.get(key)
+            if chunk is None:
+                chunk = Chunk(self.size)
+            chunk.write(local, values[world])
+            self._store(key, chunk)
+            self._mark(key, [part.start for part in local], [part.stop - 1 for part in local])
+
+    def read(self, start, stop):
+        """区域内的材质数组."""
+        shape = tuple(max(high - low, 0) for low, high in zip(start, stop))
+        result = numpy.full(shape, AIR, dtype=MATERIAL_DTYPE)
+        if 0 in shape:
+            return result
+        for key, local, world in self._regions(start, stop):
+            chunk = self.chunks.get(key)
+            if chunk is not None:
+                result[world] = chunk.to_array(local)
+        return result
+
+    def origin(self, key):
+        """块的最小世界坐标."""
+        return tuple(value << self.shift for value in key)
+
+    def padded(self, key):
+        """块以及四周一层相邻体素的材质数组，生成网格时用来判断边界上的面是否可见."""
+        start = tuple(value - 1 for value in self.origin(key))
+        return self.read(start, tuple(value + self.size + 2 for value in start))
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""体素地形的LOD，按八叉树逐级降低块的精度."""
+import numpy
+
+from pyvoxel.plugins.terrain.chunk import AIR, MATERIAL_DTYPE, Chunk
+from pyvoxel.plugins.terrain.mesh import build
+
+
+def downsample(values, factor):
+    """
+    每factor^3个体素合并为一个，返回边长缩小factor倍的材质数组.
+
+    一半以上的体素不是空气时使用其中最多的材质，否则为空气，避免地表在远处被侵蚀
+    """
+    count = factor ** 3
+    shape = tuple(length // factor for length in values.shape)
+    blocks = values.reshape(shape[0], factor, shape[1], factor, shape[2], factor)
+    blocks = blocks.transpose(0, 2, 4, 1, 3, 5).reshape(shape + (count,))
+    materials = numpy.unique(values)
+    materials = materials[materials != AIR]
+    if not len(materials):
+        return numpy.full(shape, AIR, dtype=MATERIAL_DTYPE)
+    counts = (blocks[..., None] == materials).sum(axis=-2, dtype=numpy.int32)  # 每种材质的数量
+    solid = counts.sum(axis=-1) * 2 >= count
+    return numpy.where(solid, materials[counts.argmax(axis=-1)], AIR).astype(MATERIAL_DTYPE)
+
+
+class LodTree:
+    """
+    块存储上的八叉树.
+
+    第level层的节点覆盖2^level个块的边长，降低精度后与块的大小相同，使用调色板压缩保存
+    第0层就是块存储，每层由下一层相邻的8个节点合并后缩小2倍，依次得到2、4、8倍的精度
+    选择节点时离相机越远使用越高的层，网格的顶点数和内存大约按8倍减少
+    """
+
+    LEVELS = 3  # 最高的层，精度为块的1/8
+    RADIUS = 64  # 第0层的块在2倍的RADIUS内使用，每高一层距离加倍
+
+    def __init__(self, store, levels=LEVELS, radius=RADIUS):
+        """store为块存储，levels为最高的层，radius为使用第0层的距离."""
+        self.store = store
+        self.levels = levels
+        self.radius = radius
+        self.nodes = [store.chunks] + [{} for _ in range(levels)]  # 每层的节点，{key: Chunk}
+        self.meshes = {}  # 第1层以上节点的网格，{(level, key): Mesh}
+        store.changed.update(store.chunks)
+
+    @property
+    def nbytes(self):
+        """第1层以上节点的序号数组占用的字节数."""
+        return sum(chunk.nbytes for nodes in self.nodes[1:] for chunk in nodes.values())
+
+    def _children(self, level, key):
+        """合并下一层的8个节点，返回边长为块2倍的材质数组，没有子节点时返回None."""
+        size = self.store.size
+        values = None
+        nodes = self.nodes[level - 1]
+        for dx in (0, 1):
+            for dy in (0, 1):
+                for dz in (0, 1):
+                    child = nodes.get((key[0] * 2 + dx, key[1] * 2 + dy, key[2] * 2 + dz))
+                    if child is None:
+                        continue
+                    if values is None:
+                        values = numpy.full((size * 2,) * 3, AIR, dtype=MATERIAL_DTYPE)
+                    values[dx * size:(dx + 1) * size, dy * size:(dy + 1) * size, dz * size:(dz + 1) * size] = child.to_array()
+        return values
+
+    def refresh(self):
+        """根据块存储中修改过的块逐层更新节点，返回[(level, key)]更新过的节点."""
+        changed = self.store.changed
+        self.store.changed = set()
+        updated = []
+        for level in range(1, self.levels + 1):
+            changed = {(key[0] >> 1, key[1] >> 1, key[2] >> 1) for key in changed}
+            nodes = self.nodes[level]
+            for key in changed:
+                values = self._children(level, key)
+                if values is None:  # 子节点都已经删除
+                    nodes.pop(key, None)
+                else:
+                    nodes[key] = Chunk.from_array(downsample(values, 2))
+                updated.append((level, key))
+                self._invalidate(level, key)
+        return updated
+
+    def _invalidate(self, level, key):
+        """删除节点以及相邻节点的网格."""
+        self.meshes.pop((level, key), None)
+        for axis in range(3):
+            for offset in (-1, 1):
+                near = list(key)
+                near[axis] += offset
+                self.meshes.pop((level, tuple(near)), None)
+
+    def origin(self, level, key):
+        """节点的最小世界坐标."""
+        return tuple(value << (self.store.shift + level) for value in key)
+
+    def padded(self, level, key):
+        """节点以及四周相邻节点的一层体素，只用来判断面是否可见，不需要棱和角上的体素."""
+        if level == 0:
+            return self.store.padded(key)
+        size = self.store.size
+        nodes = self.nodes[level]
+        result = numpy.full((size + 2,) * 3, AIR, dtype=MATERIAL_DTYPE)
+        node = nodes.get(key)
+        if node is not None:
+            result[1:-1, 1:-1, 1:-1] = node.to_array()
+        for axis in range(3):
+            for offset, near_layer, layer in ((-1, size - 1, 0), (1, 0, size + 1)):
+                near = list(key)
+                near[axis] += offset
+                node = nodes.get(tuple(near))
+                if node is None:
+                    continue
+                region = [slice(0, size)] * 3
+                region[axis] = slice(near_layer, near_layer + 1)
+                target = [slice(1, -1)] * 3
+                target[axis] = slice(layer, layer + 1)
+                result[tuple(target)] = node.to_array(tuple(region))
+        return result
+
+    def mesh(self, level, key, greedy=True):
+        """节点的网格，第1层以上的网格保存到节点修改为止."""
+        if level == 0:
+            return build(self.store.padded(key), self.store.origin(key), greedy)
+        mesh = self.meshes.get((level, key))
+        if mesh is None:
+            mesh = build(self.padded(level, key), self.origin(level, key), greedy, 1 << level)
+            if greedy:
+                self.meshes[(level, key)] = mesh
+        return mesh
+
+    def select(self, camera):
+        """
+        按到相机的距离选择每个区域使用的节点，返回[(level, key)].
+
+        从最高层开始，节点到相机的距离小于radius * 2^level时使用下一层的8个节点
+        """
+        camera = numpy.asarray(camera, dtype=numpy.float64)
+        result = []
+        level = self.levels
+        keys = list(self.nodes[level])
+        while keys:
+            extent = self.store.size << level
+            low = numpy.array(keys, dtype=numpy.float64) * extent
+            distance = numpy.sqrt(((numpy.maximum(low - camera, 0) + numpy.maximum(camera - low - extent, 0)) ** 2).sum(axis=1))
+            refine = (distance < self.radius * (1 << level)) if level else numpy.zeros(len(keys), dtype=bool)
+            result.extend((level, key) for key, split in zip(keys, refine.tolist()) if not split)
+            if level == 0:
+                break
+            level -= 1
+            nodes = self.nodes[level]
+            keys = [child for key, split in zip(keys, refine.tolist()) if split
+                    for child in ((key[0] * 2 + dx, key[1] * 2 + dy, key[2] * 2 + dz)
+                                  for dx in (0, 1) for dy in (0, 1) for dz in (0, 1)) if child in nodes]
+        return result
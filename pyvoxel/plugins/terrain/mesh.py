@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""把体素块转换为顶点和索引数组，相邻的相同材质的面合并为一个矩形."""
+import numpy
+
+from pyvoxel.plugins.terrain.chunk import AIR, MATERIAL_DTYPE
+
+
+QUAD_FRONT = numpy.array([0, 1, 2, 0, 2, 3], dtype=numpy.uint32)  # 逆时针为正面
+QUAD_BACK = numpy.array([0, 2, 1, 0, 3, 2], dtype=numpy.uint32)
+QUAD_U = numpy.array([0, 1, 1, 0])  # 矩形四个顶点在两个方向上的偏移
+QUAD_V = numpy.array([0, 0, 1, 1])
+
+
+class Mesh:
+    """
+    块的网格.
+
+    vertices为顶点坐标，normals为顶点法线，materials为顶点的材质，每个矩形4个顶点
+    indices为三角形的顶点序号，每个矩形2个三角形
+    """
+
+    __slots__ = ('vertices', 'normals', 'materials', 'indices')
+
+    def __init__(self, vertices, normals, materials, indices):
+        """新建网格."""
+        self.vertices = vertices
+        self.normals = normals
+        self.materials = materials
+        self.indices = indices
+
+    @classmethod
+    def empty(cls):
+        """没有面的网格."""
+        return cls(numpy.zeros((0, 3), dtype=numpy.float32), numpy.zeros((0, 3), dtype=numpy.float32),
+                   numpy.zeros(0, dtype=MATERIAL_DTYPE), numpy.zeros(0, dtype=numpy.uint32))
+
+    def __len__(self):
+        """顶点数."""
+        return len(self.vertices)
+
+    @property
+    def triangles(self):
+        """三角形数."""
+        return len(self.indices) // 3
+
+    @property
+    def nbytes(self):
+        """所有数组占用的字节数."""
+        return self.vertices.nbytes + self.normals.nbytes + self.materials.nbytes + self.indices.nbytes
+
+
+def pad(values, border=AIR):
+    """单独的块四周补一层体素，周围没有相邻的块时使用."""
+    return numpy.pad(values, 1, constant_values=border)
+
+
+def faces(padded, axis, positive):
+    """
+    块在一个方向上可见的面.
+
+    padded为四周多一层相邻体素的材质数组，体素不是空气并且该方向上相邻的是空气时可见
+    返回的数组按(axis, axis + 1, axis + 2)的顺序排列坐标，值为面的材质，不可见时为AIR
+    """
+    core = padded[1:-1, 1:-1, 1:-1]
+    near = [slice(1, -1)] * 3
+    near[axis] = slice(2, None) if positive else slice(0, -2)
+    visible = numpy.where((core != AIR) & (padded[tuple(near)] == AIR), core, AIR)
+    return visible.transpose((axis, (axis + 1) % 3, (axis + 2) % 3))
+
+
+def merge(mask):
+    """
+    合并每层中材质相同的面，返回(层, 行, 列, 高, 宽, 材质)的数组.
+
+    先把每行中连续的相同材质合并为线段，再把相邻行中位置、长度和材质都相同的线段合并为矩形
+    """
+    run_start = mask != AIR
+    run_start[:, :, 1:] &= mask[:, :, 1:] != mask[:, :, :-1]
+    run_end = mask != AIR
+    run_end[:, :, :-1] &= mask[:, :, :-1] != mask[:, :, 1:]
+    layer, row, column = numpy.nonzero(run_start)
+    width = numpy.nonzero(run_end)[2] - column + 1
+    material = mask[layer, row, column]
+
+    order = numpy.lexsort((row, material, width, column, layer))
+    layer, row, column, width, material = layer[order], row[order], column[order], width[order], material[order]
+    start = numpy.ones(len(layer), dtype=bool)
+    start[1:] = ((layer[1:] != layer[:-1]) | (column[1:] != column[:-1]) | (width[1:] != width[:-1])
+                 | (material[1:] != material[:-1]) | (row[1:] != row[:-1] + 1))
+    first = numpy.flatnonzero(start)
+    height = numpy.diff(numpy.append(first, len(layer)))
+    return layer[first], row[first], column[first], height, width[first], material[first]
+
+
+def split(mask):
+    """每个面单独作为一个矩形，返回格式与merge相同."""
+    layer, row, column = numpy.nonzero(mask)
+    ones = numpy.ones(len(layer), dtype=numpy.int64)
+    return layer, row, column, ones, ones, mask[layer, row, column]
+
+
+def build(padded, origin=(0, 0, 0), greedy=True, scale=1):
+    """
+    生成块的网格.
+
+    padded为四周多一层相邻体素的材质数组，相邻块的体素只用来判断边界上的面是否可见
+    origin为块的世界坐标，greedy为False时不合并，每个可见的面生成一个矩形
+    scale为每个体素的边长，LOD中降低精度的块使用
+    """
+    parts = []
+    count = 0
+    for axis in range(3):
+        u, v = (axis + 1) % 3, (axis + 2) % 3
+        for positive in (True, False):
+            layer, row, column, height, width, material = (merge if greedy else split)(faces(padded, axis, positive))
+            quads = len(layer)
+            if not quads:
+                continue
+            vertices = numpy.empty((quads, 4, 3), dtype=numpy.float32)
+            vertices[:, :, axis] = ((layer + positive) * scale + origin[axis])[:, None]
+            vertices[:, :, u] = (row[:, None] + height[:, None] * QUAD_U) * scale + origin[u]
+            vertices[:, :, v] = (column[:, None] + width[:, None] * QUAD_V) * scale + origin[v]
+            normal = numpy.zeros(3, dtype=numpy.float32)
+            normal[axis] = 1 if positive else -1
+            indices = (numpy.arange(count, count + quads * 4, 4, dtype=numpy.uint32)[:, None]
+                       + (QUAD_FRONT if positive else QUAD_BACK))
+            parts.append((vertices.reshape(-1, 3), numpy.broadcast_to(normal, (quads * 4, 3)),
+                          numpy.repeat(material.astype(MATERIAL_DTYPE), 4), indices.reshape(-1)))
+            count += quads * 4
+    if not parts:
+        return Mesh.empty()
+    vertices, normals, materials, indices = zip(*parts)
+    return Mesh(numpy.concatenate(vertices), numpy.concatenate(normals),
+                numpy.concatenate(materials), numpy.concatenate(indices))
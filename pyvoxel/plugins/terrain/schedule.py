@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""修改体素后按距离相机由近到远重新生成网格，每帧限制耗时."""
+import time
+
+import numpy
+
+from pyvoxel.plugins.terrain.mesh import build
+
+
+class MeshScheduler:
+    """
+    块的网格调度.
+
+    修改体素时块存储标记需要重新生成网格的块，每帧调用update，按块中心到相机的距离从近到远处理，
+    超过每帧的耗时后剩余的块留到下一帧，每帧至少处理一个块
+    设置workers时块提交到后台的工作池，update取出已经完成的网格，工作池满时剩余的块留到下一帧
+    """
+
+    BUDGET = 0.004  # 每帧重新生成网格的耗时，单位为秒
+
+    def __init__(self, store, budget=BUDGET, greedy=True, workers=None):
+        """store为块存储，budget为每帧的耗时，greedy为是否合并相同材质的面，workers为MeshWorkers."""
+        self.store = store
+        self.budget = budget
+        self.greedy = greedy
+        self.workers = workers
+        self.meshes = {}  # {(cx, cy, cz): Mesh}
+
+    @property
+    def pending(self):
+        """等待重新生成网格的块数."""
+        return len(self.store.dirty)
+
+    def order(self, camera):
+        """等待重新生成网格的块，按到相机的距离从近到远排列."""
+        if not self.store.dirty:
+            return []
+        keys = list(self.store.dirty)
+        center = (numpy.array(keys, dtype=numpy.float64) + 0.5) * self.store.size
+        distance = ((center - numpy.asarray(camera, dtype=numpy.float64)) ** 2).sum(axis=1)
+        return [keys[index] for index in numpy.argsort(distance, kind='stable').tolist()]
+
+    def remesh(self, key):
+        """重新生成块的网格，块已经删除时同时删除网格."""
+        self.store.dirty.discard(key)
+        if self.workers is not None:  # 丢弃已经提交的旧结果
+            self.workers.cancel(key)
+        if key not in self.store.chunks:
+            self.meshes.pop(key, None)
+            return None
+        mesh = self.meshes[key] = build(self.store.padded(key), self.store.origin(key), self.greedy)
+        return mesh
+
+    def update(self, camera, budget=None):
+        """处理等待的块直到超过耗时，camera为相机的世界坐标，返回网格有变化的块."""
+        if budget is None:
+            budget = self.budget
+        if self.workers is not None:
+            return self._update_workers(camera, budget)
+        begin = time.perf_counter()
+        updated = []
+        for key in self.order(camera):
+            self.remesh(key)
+            updated.append(key)
+            if time.perf_counter() - begin >= budget:
+                break
+        return updated
+
+    def _collect(self, wait=False):
+        """取出工作池完成的网格."""
+        updated = []
+        for key, mesh in self.workers.drain(wait):
+            if key in self.store.chunks:
+                self.meshes[key] = mesh
+                updated.append(key)
+        return updated
+
+    def _update_workers(self, camera, budget):
+        """取出完成的网格，再按距离提交等待的块直到工作池满或者超过耗时."""
+        begin = time.perf_counter()
+        updated = self._collect()
+        if not self.workers.idle:
+            return updated
+        for key in self.order(camera):
+            if key not in self.store.chunks:
+                self.remesh(key)
+                updated.append(key)
+                continue
+            if not self.workers.submit(key, self.store.padded(key), self.store.origin(key), self.greedy):
+                break
+            self.store.dirty.discard(key)
+            if not self.workers.idle or time.perf_counter() - begin >= budget:
+                break
+        return updated
+
+    def flush(self):
+        """处理所有等待的块，使用工作池时等待所有提交的块完成."""
+        if self.workers is not None:
+            updated = []
+            while self.store.dirty or self.workers.busy:
+                updated.extend(self._update_workers((0, 0, 0), float('inf')))
+                updated.extend(self._collect(wait=True))
+            return updated
+        updated = list(self.store.dirty)
+        for key in updated:
+            self.remesh(key)
+        return updated
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""体素地形插件."""
+from pyvoxel.plugin import Plugin
+from pyvoxel.plugins.terrain.chunk import AIR, ChunkStore
+from pyvoxel.plugins.terrain.lod import LodTree
+from pyvoxel.plugins.terrain.mesh import build
+from pyvoxel.plugins.terrain.schedule import MeshScheduler
+
+
+class Terrain(Plugin):
+    """体素地形，按固定大小的块保存体素，坐标为整数的世界坐标."""
+
+    CHUNK_SIZE = 16  # 块的边长，必须是2的幂
+
+    def __init__(self, size=CHUNK_SIZE):
+        """size为块的边长."""
+        self.store = ChunkStore(size)
+        self.scheduler = MeshScheduler(self.store)
+        self.lod = LodTree(self.store)
+
+    def reload(self):
+        """重新加载插件，清空所有块."""
+        self.store = ChunkStore(self.store.size)
+        self.scheduler = MeshScheduler(self.store, self.scheduler.budget, self.scheduler.greedy, self.scheduler.workers)
+        self.lod = LodTree(self.store, self.lod.levels, self.lod.radius)
+
+    def start(self, workers=0, processes=True):
+        """启动后台生成网格的工作池，workers为0时使用cpu数，processes为False时使用线程池."""
+        from pyvoxel.plugins.terrain.worker import MeshWorkers  # 不使用工作池时不导入
+        self.stop()
+        self.scheduler.workers = MeshWorkers(self.store.size, workers, processes)
+
+    def stop(self):
+        """停止工作池，之后在主线程中生成网格."""
+        workers = self.scheduler.workers
+        if workers is None:
+            return
+        self.scheduler.flush()
+        self.scheduler.workers = None
+        workers.close()
+
+    @property
+    def chunks(self):
+        """所有保存的块，{(cx, cy, cz): Chunk}."""
+        return self.store.chunks
+
+    def get(self, x, y, z):
+        """世界坐标的材质，没有体素时为AIR."""
+        return self.store.get(x, y, z)
+
+    def set(self, x, y, z, value):
+        """设置世界坐标的材质."""
+        self.store.set(x, y, z, value)
+
+    def fill(self, start, stop, value):
+        """区域[start, stop)内的体素设置为value."""
+        self.store.fill(start, stop, value)
+
+    def clear(self, start, stop):
+        """清空区域[start, stop)内的体素."""
+        self.store.fill(start, stop, AIR)
+
+    def write(self, start, values):
+        """使用材质数组设置从start开始的区域."""
+        self.store.write(start, values)
+
+    def read(self, start, stop):
+        """区域[start, stop)内的材质数组."""
+        return self.store.read(start, stop)
+
+    def mesh(self, key, greedy=True):
+        """生成块的网格，key为块坐标，greedy为False时每个可见的面单独生成矩形."""
+        return build(self.store.padded(key), self.store.origin(key), greedy)
+
+    @property
+    def meshes(self):
+        """已经生成的块的网格，{(cx, cy, cz): Mesh}."""
+        return self.scheduler.meshes
+
+    def update(self, camera, budget=None):
+        """每帧调用，按距离相机由近到远重新生成修改过的块的网格，返回网格有变化的块."""
+        return self.scheduler.update(camera, budget)
+
+    def select(self, camera):
+        """更新LOD并按到相机的距离选择每个区域使用的节点，返回[(level, key)]，第0层的网格在meshes中."""
+        self.lod.refresh()
+        return self.lod.select(camera)
+
+    def stats(self):
+        """块的统计信息."""
+        chunks = self.store.chunks.values()
+        uniform = sum(1 for chunk in chunks if chunk.uniform)
+        return {
+            'chunks': len(self.store),
+            'uniform': uniform,
+            'palette': len(self.store) - uniform,
+            'nbytes': self.store.nbytes,
+            'dirty': self.scheduler.pending,
+            'lod': [len(nodes) for nodes in self.lod.nodes[1:]],
+            'lod_nbytes': self.lod.nbytes,
+        }
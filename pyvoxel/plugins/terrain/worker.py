@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""在后台的进程池或线程池中生成块的网格."""
+import mmap
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy
+
+from pyvoxel.log import Log
+from pyvoxel.plugins.terrain.chunk import MATERIAL_DTYPE
+from pyvoxel.plugins.terrain.mesh import build
+
+
+_attached = {}  # 工作进程中已经打开的共享内存，{name: (SharedMemory或mmap, ndarray)}
+
+
+def _open(name):
+    """
+    打开已有的共享内存，不在resource_tracker中登记，共享内存只由创建的进程删除.
+
+    python3.13以前打开时也会登记，工作进程使用单独的resource_tracker时退出时报告泄漏并删除共享内存，
+    与创建的进程共用时取消登记又会删除创建的进程的登记，因此在POSIX上直接映射，windows上没有resource_tracker
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # python3.13以前没有track参数
+        pass
+    if os.name == 'nt':
+        return shared_memory.SharedMemory(name=name)
+    import _posixshmem
+    fd = _posixshmem.shm_open('/' + name, os.O_RDWR, mode=0o600)
+    try:
+        return mmap.mmap(fd, os.fstat(fd).st_size)
+    finally:
+        os.close(fd)
+
+
+def _attach(name, slots, shape):
+    """打开共享内存并转换为(槽位, 块)形状的数组，每个进程只打开一次."""
+    attached = _attached.get(name)
+    if attached is None:
+        memory = _open(name)
+        buffer = getattr(memory, 'buf', memory)  # 直接映射时mmap就是缓冲区
+        attached = _attached[name] = memory, numpy.ndarray((slots,) + shape, dtype=MATERIAL_DTYPE, buffer=buffer)
+    return attached[1]
+
+
+def _mesh_slot(name, slots, shape, slot, origin, greedy):
+    """工作进程中使用共享内存中的块生成网格，参数只有槽位等少量数据，块的数组不需要序列化."""
+    return build(_attach(name, slots, shape)[slot], origin, greedy)
+
+
+class MeshWorkers:
+    """
+    生成网格的工作池.
+
+    块的材质数组复制到共享内存的槽位中，任务只传递槽位的序号，工作进程直接读取共享内存
+    完成的网格放入完成队列，主循环调用drain取出，每个块只保留最后一次提交的结果
+    """
+
+    def __init__(self, size, workers=0, processes=True, slots=0):
+        """size为块的边长，workers为工作进程数，为0时使用cpu数，processes为False时使用线程池."""
+        self.workers = workers or os.cpu_count() or 1
+        self.slots = slots or self.workers * 2  # 每个工作进程处理一个块的同时准备下一个块
+        self.shape = (size + 2,) * 3  # 四周多一层相邻的体素
+        nbytes = self.slots * int(numpy.prod(self.shape)) * numpy.dtype(MATERIAL_DTYPE).itemsize
+        self._memory = shared_memory.SharedMemory(create=True, size=nbytes)
+        self._buffer = numpy.ndarray((self.slots,) + self.shape, dtype=MATERIAL_DTYPE, buffer=self._memory.buf)
+        self._free = list(range(self.slots))
+        self._ticket = {}  # 每个块最后一次提交的序号，{key: ticket}
+        self._count = 0
+        self._done = queue.SimpleQueue()  # 完成队列，(key, ticket, slot, future)
+        self.processes = processes
+        executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        self._executor = executor(max_workers=self.workers)
+
+    @property
+    def idle(self):
+        """空闲的槽位数，为0时不能继续提交."""
+        return len(self._free)
+
+    @property
+    def busy(self):
+        """正在处理的块数."""
+        return self.slots - len(self._free)
+
+    def submit(self, key, padded, origin, greedy=True):
+        """提交块，padded为四周多一层相邻体素的材质数组，没有空闲的槽位时返回False."""
+        if not self._free:
+            return False
+        slot = self._free.pop()
+        self._buffer[slot] = padded
+        self._count += 1
+        ticket = self._ticket[key] = self._count
+        if self.processes:
+            future = self._executor.submit(_mesh_slot, self._memory.name, self.slots, self.shape, slot, tuple(origin), greedy)
+        else:  # 线程直接读取槽位
+            future = self._executor.submit(build, self._buffer[slot], tuple(origin), greedy)
+        future.add_done_callback(lambda future: self._done.put((key, ticket, slot, future)))
+        return True
+
+    def cancel(self, key):
+        """丢弃块已经提交但还没有取出的结果."""
+        self._ticket.pop(key, None)
+
+    def drain(self, wait=False):
+        """
+        取出完成的网格，返回[(key, mesh)].
+
+        槽位在取出时才释放，wait为True时等待所有提交的块完成
+        """
+        result = []
+        while True:
+            try:
+                key, ticket, slot, future = self._done.get(block=wait and self.busy > 0)
+            except queue.Empty:
+                break
+            self._free.append(slot)
+            if self._ticket.get(key) != ticket:  # 块在完成前又提交了或者已经删除
+                continue
+            del self._ticket[key]
+            try:
+                result.append((key, future.result()))
+            except Exception as ex:
+                Log.error('Mesh chunk {} failed - {}'.format(key, ex))
+        return result
+
+    def close(self):
+        """停止工作池并释放共享内存."""
+        self._executor.shutdown(wait=True)
+        self._buffer = None
+        self._memory.close()
+        self._memory.unlink()
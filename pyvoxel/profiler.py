@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""属性绑定的性能分析."""
+import time
+from contextlib import contextmanager
+
+from pyvoxel.pattern.singleton import Singleton
+from pyvoxel.log import Log
+
+
+class ProfilerBase(Singleton):
+    """
+    统计属性传播中每个绑定属性的计算次数和耗时.
+
+    关闭时属性传播只在每次传播开始时检查一次enabled，几乎没有额外开销
+
+    with Profiler.profile():
+        node.x = 1
+    print(Profiler.report())
+    """
+
+    def __init__(self):
+        """初始化统计数据."""
+        self.enabled = False
+        self.storm = 1000  # 一次传播影响的属性数超过该值时记录日志
+        self.reset()
+
+    def reset(self):
+        """清除统计数据."""
+        self._stats = {}  # {(类名, 属性): [计算次数, 失败次数, 累计耗时, 最大耗时]}
+        self._runs = 0  # 传播的次数
+        self._affected = 0  # 所有传播影响的属性总数
+        self._max_affected = 0
+        self._max_depth = 0  # 传播的最大层数
+
+    def enable(self):
+        """开始统计."""
+        self.enabled = True
+
+    def disable(self):
+        """停止统计，保留已有的数据."""
+        self.enabled = False
+
+    @contextmanager
+    def profile(self):
+        """在with中统计."""
+        enabled = self.enabled
+        self.enabled = True
+        try:
+            yield self
+        finally:
+            self.enabled = enabled
+
+    def update(self, node, name):
+        """计算绑定的属性并统计耗时，计算失败时计入失败次数."""
+        begin = time.perf_counter()
+        is_success = node._update_value(name)
+        elapsed = time.perf_counter() - begin
+
+        key = node.__class__.__name__, name
+        stat = self._stats.get(key)
+        if stat is None:
+            stat = self._stats[key] = [0, 0, 0.0, 0.0]
+        stat[0] += 1
+        if not is_success:
+            stat[1] += 1
+        stat[2] += elapsed
+        if elapsed > stat[3]:
+            stat[3] = elapsed
+        return is_success
+
+    def record_run(self, changes, affected, depth):
+        """记录一次传播影响的属性数和传播的层数，影响过多时记录日志."""
+        self._runs += 1
+        self._affected += affected
+        self._max_affected = max(self._max_affected, affected)
+        self._max_depth = max(self._max_depth, depth)
+        if affected > self.storm:
+            Log.warning('Propagation storm: %d attributes, depth %d, from %s', affected, depth,
+                        ', '.join('{}.{}'.format(node.__class__.__name__, name) for node, name in changes[:5]))
+
+    @property
+    def summary(self):
+        """传播的汇总数据."""
+        return {
+            'runs': self._runs,
+            'affected': self._affected,
+            'max_affected': self._max_affected,
+            'max_depth': self._max_depth,
+            'evaluations': sum(stat[0] for stat in self._stats.values()),
+            'errors': sum(stat[1] for stat in self._stats.values()),
+            'time': sum(stat[2] for stat in self._stats.values()),
+        }
+
+    def report(self, sort='time', limit=None):
+        """每个(类, 属性)的统计，按sort（time, count, errors, max, mean）降序排列."""
+        rows = []
+        for (class_name, name), (count, errors, total, longest) in self._stats.items():
+            rows.append({
+                'class': class_name,
+                'attr': name,
+                'count': count,
+                'errors': errors,
+                'time': total,
+                'max': longest,
+                'mean': total / count,
+            })
+        rows.sort(key=lambda row: row[sort], reverse=True)
+        return rows[:limit] if limit is not None else rows
+
+    def format_report(self, sort='time', limit=20):
+        """格式化的统计表."""
+        lines = ['{:<24} {:<16} {:>8} {:>6} {:>10} {:>10} {:>10}'.format('class', 'attr', 'count', 'errors', 'time', 'mean', 'max')]
+        for row in self.report(sort, limit):
+            lines.append('{:<24} {:<16} {:>8} {:>6} {:>8.2f}ms {:>8.2f}us {:>8.2f}us'.format(
+                row['class'], row['attr'], row['count'], row['errors'], row['time'] * 1e3, row['mean'] * 1e6, row['max'] * 1e6))
+        return '\n'.join(lines)
+
+
+Profiler = ProfilerBase()
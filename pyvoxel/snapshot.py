@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+"""实例化节点树的二进制快照."""
+import gc
+import importlib
+import importlib.util
+import io
+import marshal
+import mmap
+import pickle
+import struct
+import sys
+from array import array
+
+from pyvoxel.pattern.singleton import Singleton
+from pyvoxel.node import EMPTY, NodeBase
+from pyvoxel.config import ConfigMethod, ConfigNode
+from pyvoxel.log import Log
+
+
+# 快照文件的结构:
+#   文件头: 标识, 格式版本, 字节序, python字节码版本, 节点数, 各段的(偏移, 长度)
+#   列段: 每个节点一项，可以直接映射为数组，类型, 父节点, 子节点起始位置, 子节点数, 配置, 索引, 触发器, 属性偏移, 属性长度
+#   子节点段: 所有节点的子节点序号
+#   类型段: 节点类型的描述
+#   代码段: 绑定表达式的代码对象
+#   共享段: 配置节点, 索引和触发器，同一个对象只保存一次
+#   属性段: 每个节点的属性和绑定表达式的局部变量，节点和配置节点保存为序号，属性偏移相对于该段的开头
+MAGIC = b'PVSN'
+VERSION = 1
+HEADER = struct.Struct('<4sHB4sI')
+SECTION = struct.Struct('<QQ')
+COLUMNS = (
+    ('type', 'i'),
+    ('parent', 'i'),
+    ('child_start', 'I'),
+    ('child_count', 'I'),
+    ('config', 'i'),
+    ('ids', 'i'),
+    ('trigger', 'i'),
+    ('values_offset', 'Q'),
+    ('values_length', 'I'),
+)
+SECTIONS = [name for name, typecode in COLUMNS] + ['children', 'types', 'codes', 'shared', 'values']
+BASE_SLOTS = frozenset(NodeBase.__slots__)
+
+
+class SnapshotPickler(pickle.Pickler):
+    """节点和配置节点保存为序号."""
+
+    def __init__(self, fp, nodes, configs):
+        """nodes为{id(节点): 序号}，configs为配置节点的SharedTable."""
+        super().__init__(fp, pickle.HIGHEST_PROTOCOL)
+        self.nodes = nodes
+        self.configs = configs
+
+    def persistent_id(self, obj):
+        """节点不在快照中时无法保存."""
+        if isinstance(obj, NodeBase):
+            if id(obj) not in self.nodes:
+                raise pickle.PicklingError('{} is not in the snapshot'.format(obj))
+            return 'node', self.nodes[id(obj)]
+        if isinstance(obj, ConfigNode):
+            return 'config', self.configs.add(obj)
+        return None
+
+
+class SnapshotUnpickler(pickle.Unpickler):
+    """把序号还原为节点和配置节点."""
+
+    def __init__(self, fp, nodes, configs):
+        """nodes和configs为已经还原的节点和配置节点."""
+        super().__init__(fp)
+        self.nodes = nodes
+        self.configs = configs
+
+    def persistent_load(self, pid):
+        """还原节点和配置节点."""
+        kind, index = pid
+        if kind == 'node':
+            return self.nodes[index]
+        return self.configs[index]
+
+
+class SharedTable:
+    """同一个对象只保存一次的表."""
+
+    def __init__(self):
+        """初始化."""
+        self.items = []
+        self.index = {}
+
+    def add(self, obj):
+        """返回对象的序号，None为-1."""
+        if obj is None:
+            return -1
+        key = id(obj)
+        if key not in self.index:
+            self.index[key] = len(self.items)
+            self.items.append(obj)
+        return self.index[key]
+
+
+class SnapshotReader:
+    """
+    只读访问快照文件.
+
+    文件映射到内存中，节点表和子节点表直接作为数组读取，不复制数据，多个进程打开同一个文件时共享内存页
+    属性只在访问时反序列化，values返回的属性中节点和配置节点为('node', 序号)和('config', 序号)
+    children和values返回复制的数据，columns中的数组直接引用映射的内存，关闭前需要释放从中得到的切片
+
+    with SnapshotReader(path) as reader:
+        root = reader.restore()
+    """
+
+    def __init__(self, path):
+        """映射文件并检查文件头."""
+        self._fp = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._fp.close()
+            raise
+        self._views = []
+        try:
+            magic, version, byteorder, pyc, count = HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError('Unsupported snapshot format')
+            if byteorder != (sys.byteorder == 'little') or pyc != importlib.util.MAGIC_NUMBER:
+                raise ValueError('Snapshot is created on an incompatible platform')
+            self.count = count
+            self._sections = {}
+            for n, name in enumerate(SECTIONS):
+                self._sections[name] = SECTION.unpack_from(self._mmap, HEADER.size + n * SECTION.size)
+            self.columns = {name: self._view(name, typecode) for name, typecode in COLUMNS}
+            self.children_index = self._view('children', 'I')
+        except Exception:
+            self.close()
+            raise
+        self._types = None
+        self._codes = None
+        self._shared = None
+
+    def _view(self, name, typecode):
+        """段对应的只读数组."""
+        offset, length = self._sections[name]
+        view = memoryview(self._mmap)[offset:offset + length].cast(typecode)
+        self._views.append(view)
+        return view
+
+    def _bytes(self, name):
+        """段的内容."""
+        offset, length = self._sections[name]
+        return self._mmap[offset:offset + length]
+
+    def close(self):
+        """释放数组后关闭文件，外部仍然引用columns中的数组切片时，映射在这些切片释放后由垃圾回收关闭."""
+        for view in self._views:
+            view.release()
+        self._views = []
+        try:
+            self._mmap.close()
+        except BufferError:
+            Log.warning('Snapshot mapping is still referenced, close it later')
+        self._fp.close()
+
+    def __enter__(self):
+        """with中使用."""
+        return self
+
+    def __exit__(self, *args):
+        """退出时关闭."""
+        self.close()
+
+    def __len__(self):
+        """节点数."""
+        return self.count
+
+    @property
+    def types(self):
+        """节点类型的表."""
+        if self._types is None:
+            self._types = [Snapshot.load_type(info) for info in pickle.loads(self._bytes('types'))]
+        return self._types
+
+    @property
+    def codes(self):
+        """代码对象的表."""
+        if self._codes is None:
+            self._codes = marshal.loads(self._bytes('codes'))
+        return self._codes
+
+    @property
+    def shared(self):
+        """(配置节点, 索引, 触发器)的表，触发器和实例化时一样是只读的."""
+        if self._shared is None:
+            configs, ids_list, triggers = pickle.loads(self._bytes('shared'))
+            self._shared = configs, ids_list, [ConfigMethod.freeze(trigger) for trigger in triggers]
+        return self._shared
+
+    def parent(self, index):
+        """父节点的序号，根节点为-1."""
+        return self.columns['parent'][index]
+
+    def children(self, index):
+        """子节点的序号列表，返回复制的列表，关闭后仍然可以使用."""
+        start = self.columns['child_start'][index]
+        return self.children_index[start:start + self.columns['child_count'][index]].tolist()
+
+    def node_type(self, index):
+        """节点的类型."""
+        return self.types[self.columns['type'][index]]
+
+    def values(self, index, nodes=None, configs=None):
+        """节点的(属性, 绑定表达式)，nodes和configs为空时节点和配置节点使用序号表示."""
+        offset = self._sections['values'][0] + self.columns['values_offset'][index]  # 属性的偏移相对于属性段
+        data = io.BytesIO(self._mmap[offset:offset + self.columns['values_length'][index]])
+        if nodes is None:
+            unpickler = pickle.Unpickler(data)
+            unpickler.persistent_load = lambda pid: pid
+        else:
+            unpickler = SnapshotUnpickler(data, nodes, configs)
+        return unpickler.load()
+
+    def restore(self):
+        """还原整个节点树，返回根节点."""
+        enabled = gc.isenabled()
+        gc.disable()  # 还原时只新建对象，垃圾回收的遍历没有意义，大量节点时会占用大部分时间
+        try:
+            return self._restore()
+        finally:
+            if enabled:
+                gc.enable()
+
+    def _restore(self):
+        configs, ids_list, triggers = self.shared
+        types = self.types
+        codes = self.codes
+        columns = self.columns
+        nodes = [types[index].__new__(types[index]) for index in columns['type']]
+
+        for index, node in enumerate(nodes):
+            attrs, reflex = self.values(index, nodes, configs)
+            for name, value in attrs.items():
+                object.__setattr__(node, name, value)
+            parent = columns['parent'][index]
+            config = columns['config'][index]
+            object.__setattr__(node, '_trigger', triggers[columns['trigger'][index]])
+            object.__setattr__(node, '_reflex', {name: (codes[code], local) for name, code, local in reflex} or EMPTY)
+            if config >= 0:  # 不是由配置实例化的节点没有配置和索引
+                object.__setattr__(node, '_config', configs[config])
+            if columns['ids'][index] >= 0:
+                object.__setattr__(node, 'ids', ids_list[columns['ids'][index]])
+            object.__setattr__(node, 'parent', nodes[parent] if parent >= 0 else None)
+            object.__setattr__(node, 'children', [nodes[child] for child in self.children(index)])
+
+        root = nodes[0] if nodes else None
+        if root is not None and getattr(root, '_config', None) is not None:
+            root._config._track(root)
+        return root
+
+
+class SnapshotBase(Singleton):
+    """
+    保存和还原实例化后的节点树，包括节点类型、属性、树结构以及触发器和绑定的表达式.
+
+    Snapshot.save(node, 'scene.pvs')
+    node = Snapshot.load('scene.pvs')
+    """
+
+    @staticmethod
+    def save_type(cls):
+        """节点类型的描述，配置中新建的类保存名称和__slots__，其他类保存模块和名称."""
+        for key, value in ConfigNode.NODE_TYPE.items():
+            if value is cls:
+                return ('node',) + key
+        return 'class', cls.__module__, cls.__qualname__
+
+    @staticmethod
+    def load_type(info):
+        """还原节点类型."""
+        if info[0] == 'node':
+            return ConfigNode.new_type(info[1], info[2])
+        obj = importlib.import_module(info[1])
+        for name in info[2].split('.'):
+            obj = getattr(obj, name)
+        return obj
+
+    @staticmethod
+    def node_values(node):
+        """节点自身的属性，包括__dict__和派生类__slots__中的属性."""
+        attrs = dict(getattr(node, '__dict__', {}))
+        for cls in type(node).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name in BASE_SLOTS or name in attrs:
+                    continue
+                try:
+                    attrs[name] = object.__getattribute__(node, name)
+                except AttributeError:  # 未赋值的__slots__属性
+                    pass
+        return attrs
+
+    def save(self, node, path):
+        """保存以node为根节点的节点树，成功时返回True."""
+        try:
+            nodes = [node]
+            for current in nodes:  # 按层遍历，根节点的序号为0
+                nodes.extend(current.children)
+            index = {id(current): n for n, current in enumerate(nodes)}
+
+            types = SharedTable()
+            configs = SharedTable()
+            ids_list = SharedTable()
+            triggers = SharedTable()
+            codes = SharedTable()
+            columns = {name: array(typecode) for name, typecode in COLUMNS}
+            children = array('I')
+            values = io.BytesIO()
+            for current in nodes:
+                data = io.BytesIO()
+                reflex = [(name, codes.add(code), local) for name, (code, local) in current._reflex.items()]
+                SnapshotPickler(data, index, configs).dump((self.node_values(current), reflex))
+                data = data.getvalue()
+
+                columns['type'].append(types.add(type(current)))
+                columns['parent'].append(index[id(current.parent)] if current is not node else -1)
+                columns['child_start'].append(len(children))
+                columns['child_count'].append(len(current.children))
+                columns['config'].append(configs.add(getattr(current, '_config', None)))
+                columns['ids'].append(ids_list.add(getattr(current, 'ids', None)))
+                columns['trigger'].append(triggers.add(current._trigger))
+                columns['values_offset'].append(values.tell())
+                columns['values_length'].append(len(data))
+                children.extend(index[id(child)] for child in current.children)
+                values.write(data)
+
+            sections = [columns[name].tobytes() for name, typecode in COLUMNS]
+            sections.append(children.tobytes())
+            sections.append(pickle.dumps([self.save_type(cls) for cls in types.items], pickle.HIGHEST_PROTOCOL))
+            sections.append(marshal.dumps(codes.items))
+            triggers = [ConfigMethod.thaw(trigger) for trigger in triggers.items]  # 只读映射不能序列化
+            sections.append(pickle.dumps((configs.items, ids_list.items, triggers), pickle.HIGHEST_PROTOCOL))
+
+            offset = HEADER.size + len(SECTIONS) * SECTION.size
+            table = []
+            body = []
+            for section in sections:
+                offset += -offset % 8  # 数组按8字节对齐
+                table.append((offset, len(section)))
+                body.append(section)
+                offset += len(section)
+            table.append((offset + -offset % 8, values.tell()))
+
+            with open(path, 'wb') as fp:
+                fp.write(HEADER.pack(MAGIC, VERSION, sys.byteorder == 'little', importlib.util.MAGIC_NUMBER, len(nodes)))
+                for start, length in table:
+                    fp.write(SECTION.pack(start, length))
+                for (start, length), section in zip(table, body + [values.getvalue()]):
+                    fp.write(b'\0' * (start - fp.tell()))
+                    fp.write(section)
+            return True
+        except Exception:
+            Log.exception()
+            return False
+
+    def load(self, path):
+        """还原节点树，失败时返回None."""
+        try:
+            with SnapshotReader(path) as reader:
+                return reader.restore()
+        except Exception:
+            Log.exception()
+            return None
+
+    def open(self, path):
+        """只读打开快照文件，使用后需要关闭."""
+        return SnapshotReader(path)
+
+
+Snapshot = SnapshotBase()
@@ -31,16 +31,24 @@ setup(
     classifiers=[
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
-        'Programming Language :: Python :: 3'
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
+        'Programming Language :: Python :: 3.12'
     ],
     packages = find_packages(),
-    python_requires = '>=3.5',
+    python_requires = '>=3.9',
     setup_requires = [
         'panda3d'
     ],
     install_requires = [
         #'panda3d>=1.10.4.1'
     ],
+    extras_require = {
+        'bulk': ['numpy'],
+        'terrain': ['numpy']
+    },
     cmdclass = {
         'clean': Clean,
     },
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""原先基于正则替换的表达式解析，作为对比解析结果和耗时的参照."""
+import re
+from ast import literal_eval
+
+
+def analyse_legacy(expr, localkeys=()):
+    """原先基于正则替换的解析，用于对比结果和耗时."""
+    try:
+        literal_eval(expr)
+        return expr, {}, {}
+    except Exception:
+        pass
+
+    #  表达式中的字符串不参与匹配，解析表达式中的字符串
+    cursor = None  # 字符串起始标识
+    sinfo = []  # 字符串起始位置
+    backslash = False  # 反斜杠
+    size = len(expr)  # 字符串长度
+    n = 0
+    while n < size:
+        if cursor is None:
+            if expr[n: n + 3] in ("'''", '"""'):
+                cursor = expr[n: n + 3]
+                begin = n
+                n += 3
+                continue
+            if expr[n] in ("'", '"'):  # 进入字符串
+                cursor = expr[n]
+                begin = n
+        elif backslash:  # 转义字符
+            backslash = False
+        elif expr[n] == '\\':  # 反斜杠
+            backslash = True
+        elif cursor in ("'''", '"""') and expr[n: n + 3] == cursor:
+            cursor = None
+            n += 3
+            sinfo.append((begin, n))
+            continue
+        elif cursor in ("'", '"') and expr[n] == cursor:
+            cursor = None
+            n += 1
+            sinfo.append((begin, n))
+            continue
+        n += 1
+
+    #  替换字符串
+    smap = {}
+    offset = 0
+    for i, (begin, end) in enumerate(sinfo):
+        sname = '__s{i}'.format(i=i)
+        sval = expr[begin + offset:end + offset]
+        expr = expr.replace(sval, sname, 1)
+        try:
+            smap[sname] = literal_eval(sval)  # 获取真实的字符串，这里出错说明前面的解析有问题
+        except Exception:
+            pass
+        offset -= len(sval) - len(sname)
+
+    #  默认都有self, root两个变量
+    localkeys = tuple(set(localkeys) | set(('self', 'root')))
+
+    #  self可省略，匹配selfa, selfb, a.self
+    ptn = '(?:^|[^a-z0-9_.])(?=(?!((?:{localkeys})\\b))[a-z_]+[a-z0-9_]*)'.format(localkeys='|'.join(localkeys | smap.keys()))
+    bypass = 'self.'
+    offset = 0
+    for i, p in enumerate(re.finditer(ptn, expr, flags=re.I)):
+        index = p.span()[1] + offset
+        expr = expr[:index] + bypass + expr[index:]
+        offset += len(bypass)
+
+    #  parent缩写为p，children[x]缩写为cx
+    while True:
+        size = len(expr)
+        expr = re.sub('[.]parent[.]', '.p.', expr, flags=re.I)
+        expr = re.sub('[.]children\\[([0-9]+)\\][.]', lambda m: '.c{}.'.format(m.group(1)), expr, flags=re.I)
+        if len(expr) == size:
+            break
+
+    #  cx.p.可以省略，p.cx.不可省略
+    expr = re.sub('[.]c[0-9]+[.]p[.]', '.', expr, flags=re.I)
+
+    # 匹配self.p.c0.name, self, 不匹配a.self, selfa
+    ptn = '(?:{localkeys}).((?:p|c[0-9]+).)*[a-z_]+[a-z0-9_]*|(?:^|(?<=[^.]))\\b(?:{localkeys})\\b'.format(localkeys='|'.join(localkeys))
+    pattern = {}
+
+    #  查找所有变量
+    offset = 0
+    for i, p in enumerate(re.finditer(ptn, expr, flags=re.I)):
+        iname = '__x{i}'.format(i=i)
+        pname = p.group()
+
+        if pname in pattern:  # 相同的变量使用相同的名称
+            iname = pattern[pname]
+        else:
+            pattern[pname] = iname
+
+        #  不能直接用replace，会有名称部分包含的情况
+        sindex = p.span()[0] + offset
+        eindex = p.span()[1] + offset
+        expr = expr[:sindex] + iname + expr[eindex:]
+        offset -= len(pname) - len(iname)
+
+    xmap = {v: k for k, v in pattern.items()}
+    return expr, xmap, smap
+
+
+CORPUS = [
+    ('1 + 2', ()),
+    ("'abc'", ()),
+    ("info1 + 'abc'", ()),
+    ('[self, root, tw3]', ('tw3',)),
+    ('c0.c0', ()),
+    ('name[c0.c0.name][0]', ()),
+    ('TestPlugin01', ()),
+    ('info6', ()),
+    ("""{'g\\'h"\\""i{}{}'.format(self.c0.name, \'\'\'xc\'\'\'): tw3.name, c0.c0.name: [c0.p.c0.name + info + info1]}""", ('tw3',)),
+    ('p.testa + p.testb * p.testb - c0.testc', ()),
+    ('p.p.testd + p.p.p.testa + self.test', ()),
+    ('parent.parent.x + children[0].children[12].y', ()),
+    ('self.parent.children[3].p.c1.z', ()),
+    ('c0.p.c1.p.c2.p.x', ()),
+    ('c0.p.name + c1.p.c2.value', ()),
+    ('root.c0.width * 2 + root.height', ()),
+    ('tw1.name + tw2.c0.name', ('tw1', 'tw2')),
+    ('max(c0.z, c1.z) + min(a, b)', ()),
+    ('(c0.c0.width + c1.width) / 2 + p.margin * (p.p.scale - 1)', ()),
+    ('[c0.x + c1.x, c0.y + c1.y]', ()),
+    ("{'a': p.a, 'b': [p.b, c0.b]}", ()),
+    ('x.y.z + p.a.b.c', ()),
+    ('selfa + rootb + self_c', ()),
+    ("'p.x' + p.x + \"c0.y\" + c0.y", ()),
+    ('a ** 2 + b // 3 - c % 4', ()),
+    ('info[0:2] + info[-1]', ()),
+    ('children[0].name + children[1].parent.name', ()),
+    ('p.c0.p.c0.x', ()),
+    ('_private + __dunder', ()),
+    ('value1 + value2 * 1e-3 - 0x1f', ()),
+    ('{p.key: c0.value}', ()),
+]
+
+
+def generate(size):
+    """生成较长的表达式."""
+    part = "p.value{n} * c{n}.scale + 'text{n}' + parent.children[{n}].name"
+    return ' + '.join(part.format(n=n) for n in range(size))
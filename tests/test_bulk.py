@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""bulk模块的测试."""
+import contextlib
+import io
+
+import pytest
+
+from pyvoxel.bulk import Bulk
+from pyvoxel.config import Config
+from pyvoxel.node import Propagation
+
+pytest.importorskip('numpy')
+
+
+def generate(count):
+    """生成count个子节点的配置，子节点的变量包括bool、int和float."""
+    lines = ['<Row(Node) -> row>:', '    x: 3', '    k: 0.5', '    flag: False']
+    for n in range(count):
+        lines.append('    Node:')
+        lines.append('        i: {}'.format(n - count // 2))
+        lines.append('        f: {}'.format(n * 0.25))
+        lines.append('        on: {}'.format(n % 2 == 0))
+        lines.append('        both: on + p.flag')
+        lines.append('        scaled: p.x * i')
+        lines.append('        sign: p.x * i * 4 > 0')
+        lines.append('        ratio: f * p.k / (i * i + 1) + p.x % 7')
+        lines.append('        mixed: (i + p.x) // 3 - f ** 2')
+    return '\n'.join(lines) + '\n'
+
+
+NAMES = ('both', 'scaled', 'sign', 'ratio', 'mixed')
+
+
+def run(enabled, changes):
+    """依次修改父节点的属性，返回每次修改后所有子节点的属性值."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        row = Config(cache=False).load(generate(100)).children[0].create()
+    result = []
+    threshold = Bulk.threshold
+    Bulk.enabled, Bulk.threshold = enabled, 10
+    try:
+        for name, value in changes:
+            setattr(row, name, value)
+            result.append([[getattr(child, attr) for attr in NAMES] for child in row.children])
+    finally:
+        Bulk.enabled, Bulk.threshold = False, threshold
+    return result
+
+
+@pytest.mark.parametrize('changes', [
+    [('flag', True), ('flag', False)],
+    [('x', 5), ('k', 1.5), ('x', -7)],
+    [('x', 2 ** 62), ('x', 2 ** 61 + 1)],
+    [('x', 2.5), ('k', 3)],
+])
+def test_bulk_matches_scalar(changes):
+    """批量计算与逐个计算的结果和类型相同."""
+    bulk = run(True, changes)
+    scalar = run(False, changes)
+    assert bulk == scalar
+    assert [[list(map(type, values)) for values in step] for step in bulk] == [[list(map(type, values)) for values in step] for step in scalar]
+
+
+def test_bulk_exact_values():
+    """bool相加得到整数，int64会溢出的结果保持Python整数的值."""
+    both, scaled = run(True, [('flag', True), ('x', 2 ** 62)])
+    assert both[0][0] == 2 and type(both[0][0]) is int
+    assert scaled[0][1] == 2 ** 62 * -50
+
+
+def test_bulk_enable():
+    """开启后属性传播使用Bulk计算，关闭后恢复逐个计算."""
+    threshold = Bulk.threshold
+    try:
+        assert Bulk.available and Bulk.enable(8)
+        assert Bulk.enabled and Propagation.bulk is Bulk and Bulk.threshold == 8
+    finally:
+        Bulk.disable()
+        Bulk.threshold = threshold
+    assert not Bulk.enabled and Propagation.bulk is None
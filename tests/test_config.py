@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+"""config模块的测试."""
+import contextlib
+import io
+import os
+import re
+
+import pytest
+
+import pyvoxel.config
+from pyvoxel.config import Config, ConfigMethod, ConfigNode, Node
+from analyse_legacy import CORPUS, analyse_legacy, generate
+
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pyvoxel', 'config', 'testconfig.pv')
+
+
+EDGE = [
+    ('', ()),
+    ('p', ()),
+    ('c0', ()),
+    ('self', ()),
+    ('root', ()),
+    ('p.p.p', ()),
+    ('parent', ()),
+    ('children[0]', ()),
+    ('children[0].x', ()),
+    ('a.parent.b', ()),
+    ('x  +   y', ()),
+    ('f(x)(y)', ()),
+    ("''", ()),
+    ("'''multi''' + x", ()),
+    ('"a\\"b" + y', ()),
+    ('c10.p.c2.x', ()),
+    ('p.c0.p.c1.p', ()),
+]
+
+
+def sample_exprs():
+    """示例配置中所有属性的表达式，别名作为引用的变量."""
+    with open(SAMPLE, encoding='utf-8') as fp:
+        text = fp.read()
+    aliases = tuple(sorted(set(re.findall(r'->\s*(\w+)', text)) | set(re.findall(r'\((tw\d+)\)', text))))
+    exprs = []
+    for line in text.splitlines():
+        match = re.match(r'^\s+\w+(?:\([^)]*\))?\s*:\s*(\S.*)$', line)
+        if match and not line.lstrip().startswith('#'):
+            exprs.append((match.group(1), aliases))
+    return exprs
+
+
+@pytest.mark.parametrize('expr, localkeys', CORPUS + EDGE + sample_exprs() + [(generate(n), ()) for n in (1, 5, 20, 100)])
+def test_analyse_legacy(expr, localkeys):
+    """单次扫描的词法解析与原先多次正则替换的解析结果一致."""
+    assert ConfigMethod.analyse(expr, localkeys) == analyse_legacy(expr, localkeys)
+
+
+def test_sample_exprs():
+    """示例配置中的表达式都参与了对比."""
+    assert len(sample_exprs()) >= 15
+
+
+def test_analyse_keyword():
+    """关键字和True/False/None不作为self的属性，这是与原先解析有意不同的地方."""
+    expr, xmap, smap = ConfigMethod.analyse('a if b is not None else c')
+    assert expr == '__x0 if __x1 is not None else __x2'
+    assert xmap == {'__x0': 'self.a', '__x1': 'self.b', '__x2': 'self.c'}
+
+
+def test_analyse_cache():
+    """解析缓存按表达式中用到的别名区分，返回的映射可以修改而不影响缓存."""
+    assert ConfigMethod.analyse('a.x + 1', ('a',))[1] == {'__x0': 'a.x'}
+    assert ConfigMethod.analyse('a.x + 1', ('b',))[1] == {'__x0': 'self.a'}
+    assert ConfigMethod.analyse('a.x + 1', ('a', 'b'))[1] == {'__x0': 'a.x'}
+    expr, xmap, smap = ConfigMethod.analyse("a + 'x'")
+    xmap.clear()
+    smap.clear()
+    assert ConfigMethod.analyse("a + 'x'") == ('__x0 + __s0', {'__x0': 'self.a'}, {'__s0': 'x'})
+    assert ConfigMethod.analyse('"""x') == ('"""x', {}, {})
+    assert ConfigMethod.analyse('f(a') == ('f(a', {}, {})
+
+
+def test_flattened_views():
+    """合并继承关系的attr、ids、children只生成一次，基类改变时派生类的缓存同步失效."""
+    base, middle, derived = ConfigNode('S', {}), ConfigNode('M', {}), ConfigNode('T', {})
+    middle.class_base = [base]
+    derived.class_base = [middle]
+    base._set_attr('a', 1)
+    derived._set_attr('b', 2)
+    attr, ids, children = derived.attr, derived.ids, derived.children
+    assert dict(attr) == {'a': 1, 'b': 2}
+    assert derived.attr is attr and derived.ids is ids and derived.children is children
+    with pytest.raises(TypeError):
+        attr['c'] = 3
+
+    base._set_attr('a', 10)
+    base._set_ids('n', base)
+    assert derived.attr['a'] == 10 and derived.ids['n'] is base
+    middle._set_attr('a', 5)  # 离派生类更近的基类优先
+    assert derived.attr['a'] == 5
+    child = ConfigNode('Node', {})
+    base.add_node(child)
+    assert derived.children == (child,)
+    assert derived._child_index(child) == 0
+
+    other = ConfigNode('O', {})
+    other._set_attr('o', 0)
+    derived.class_base = [other]
+    assert dict(derived.attr) == {'o': 0, 'b': 2} and derived.children == ()
+    middle._set_attr('m', 1)
+    assert 'm' not in derived.attr and derived not in middle._derived
+
+
+ROOT_BINDING = '''<Scene(Node)>:
+    a: 1
+    Node -> mid:
+        b: 2
+        Node:
+            y: root.a + 5
+            z: mid.b * 10 + root.a
+            w: root.c0.b + 1
+'''
+
+
+def load(text):
+    """加载配置字符串，返回最后一个根类."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return Config(cache=False).load(text).children[-1]
+
+
+def test_root_binding():
+    """root和别名开头的绑定在引用的属性改变后重新计算."""
+    scene = load(ROOT_BINDING).create()
+    leaf = scene.children[0].children[0]
+    assert (leaf.y, leaf.z, leaf.w) == (6, 21, 3)
+    scene.a = 10
+    assert (leaf.y, leaf.z) == (15, 30)
+    scene.children[0].b = 7
+    assert (leaf.z, leaf.w) == (80, 8)
+
+
+def test_template_read_only():
+    """实例共享的模板是只读的，需要通过配置节点修改."""
+    scene = load(ROOT_BINDING)
+    node = scene.create()
+    template = scene._template()
+    with pytest.raises(TypeError):
+        template['values']['a'] = 2
+    with pytest.raises(TypeError):
+        node.children[0]._trigger['b'] = {}
+    with pytest.raises(TypeError):
+        node.children[0]._trigger['b']['self.c0']['z'] = {}
+    assert node.children[0]._trigger is scene.children[0]._template()['trigger']
+
+
+RELOAD = '''<Base(Node)>:
+    a: 1
+    b: a * 2
+    Node:
+        c: p.b + 1
+<Scene(Base)>:
+    d: 5
+<Other(Node)>:
+    e: 7
+'''
+
+
+def test_reload_patch_instances():
+    """重新加载只解析改变的根类和继承它的根类，已经实例化的节点更新属性和绑定."""
+    config = Config(cache=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        root = config.load(RELOAD)
+    old_other = root.children[2]
+    base, scene, other = (node.create() for node in root.children)
+    other.e = 100
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert config.reload(RELOAD.replace('b: a * 2', 'b: a * 3').replace('d: 5', 'd: 6')) is root
+    assert (base.b, base.children[0].c, scene.b, scene.d) == (3, 4, 3, 6)
+    assert root.children[2] is old_other and other.e == 100  # 没有改变的根类不重新解析
+    assert base._config is root.children[0] and scene.children[0]._config is root.children[1].children[0]
+    base.a = 2
+    scene.a = 3
+    assert (base.b, base.children[0].c, scene.b, scene.children[0].c) == (6, 7, 9, 10)
+
+
+FORWARD = '''<Scene(Node)>:
+    a: 1
+<Baz(Foo)>:
+    b: 2
+<Foo(Scene)>:
+    c: 3
+<Other(Node)>:
+    d: 4
+'''
+
+
+ERRORS = '''<First(Node)>:
+    a: 1
+    b: a +* 2
+    c: a */ 3
+<Second(Node)>:
+    d: 4
+<Third(Node)>:
+    e: 1
+    Missing:
+        f: 2
+<Fourth(Unknown)>:
+    g: 1
+<Fifth(Node)>:
+    h: undefined_name + 1
+'''
+
+
+def test_validate_collect_errors():
+    """一次检查返回所有根类中的错误，每个根类只返回第一个错误，正确的根类不影响后面的检查."""
+    expected = [
+        (3, '    b: a +* 2', 'Attr is unsafe'),
+        (9, '    Missing:', 'Base class not exist'),
+        (11, '<Fourth(Unknown)>:', 'Base class not exist'),
+        (14, '    h: undefined_name + 1', 'Attr is unsafe'),
+    ]
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert Config(cache=False).validate(ERRORS) == expected
+        assert Config(cache=False).validate(ERRORS.splitlines()) == expected
+        assert Config(cache=False).validate(ERRORS, workers=2) == expected
+        assert Config(cache=False).validate('<Second(Node)>:\n    d: 4\n') == []
+
+
+def test_validate_forward_reference():
+    """在定义之前使用的根类与定义它的根类分在同一部分，并行检查与顺序检查的错误相同."""
+    assert [len(partition) for partition in Config._partition([[(1, line)] for line in FORWARD.splitlines() if line.startswith('<')])] == [3, 1]
+    with contextlib.redirect_stdout(io.StringIO()):
+        serial = Config(cache=False).validate(FORWARD)
+        parallel = Config(cache=False).validate(FORWARD, workers=2)
+    assert serial
+    assert parallel == serial
+
+
+def test_cache_in_user_dir(tmp_path, monkeypatch):
+    """配置缓存保存在用户的缓存目录下，不在配置文件所在的目录中写文件."""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    path = tmp_path / 'conf' / 'scene.pv'
+    path.parent.mkdir()
+    path.write_text('<Scene(Node)>:\n    a: 1\n')
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = Config().load(str(path))
+        second = Config().load(str(path))
+    assert os.listdir(str(path.parent)) == ['scene.pv']
+    cached = os.listdir(str(tmp_path / 'cache' / 'pyvoxel' / 'config'))
+    assert len(cached) == 1 and cached[0].startswith('scene-')
+    assert first.children[0].attr['a'][3][0] == second.children[0].attr['a'][3][0] == 1
+
+
+def test_cache_key_class_source(monkeypatch):
+    """名称相同的全局类绑定到其他类时缓存的键值改变."""
+    class Widget(Node):
+        pass
+
+    class Other(Node):
+        pass
+
+    config = Config()
+    monkeypatch.setattr(pyvoxel.config, 'Widget', Widget, raising=False)
+    key = config._cache_key([b'<Widget>:\n'], config._sconfig())
+    assert config._cache_key([b'<Widget>:\n'], config._sconfig()) == key
+    monkeypatch.setattr(pyvoxel.config, 'Widget', Other)
+    assert config._cache_key([b'<Widget>:\n'], config._sconfig()) != key
+
+
+def test_code_cache_bounded(monkeypatch):
+    """编译和折叠缓存超过上限时淘汰最久未使用的条目."""
+    monkeypatch.setattr(ConfigMethod, 'CACHE_SIZE', 2)
+    monkeypatch.setattr(ConfigMethod, 'CODE_CACHE', ConfigMethod.CODE_CACHE.__class__())
+    monkeypatch.setattr(ConfigMethod, 'UNFOLDABLE', ConfigMethod.UNFOLDABLE.__class__())
+    first = ConfigMethod.compile('1 + 1')
+    ConfigMethod.compile('2 + 2')
+    assert ConfigMethod.compile('1 + 1') is first
+    ConfigMethod.compile('3 + 3')
+    assert list(ConfigMethod.CODE_CACHE) == ['1 + 1', '3 + 3']
+    for expr in ('__x0 + 1', '__x0 + 2', '__x0 + 3'):
+        ConfigMethod.fold(expr, {'__x0': 'a'}, {}, {})
+    assert len(ConfigMethod.UNFOLDABLE) == 2
+
+
+ENDINGS = '<Scene(Node)>:\n    a: 1\n\n    # comment\n    b: a + 1\n    Node:\n        c: p.b * 2\n'
+
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n', '\r', '\n\r'])
+def test_source_line_endings(tmp_path, newline):
+    """各种换行符的配置从字符串、路径、字节文件、文本文件和行列表中读取的结果相同."""
+    text = ENDINGS.replace('\n', newline)
+    path = tmp_path / 'scene.pv'
+    path.write_bytes(text.encode('utf-8'))
+    with open(str(path), 'rb') as binary, open(str(path), encoding='utf-8', newline='') as textfp:
+        for source in (str(path), binary, textfp, text.split(newline)[:-1]):
+            assert [line for number, line in pyvoxel.config.ConfigSource(source)] == ENDINGS.splitlines()
+        binary.seek(0)
+        textfp.seek(0)
+        for source in (text, str(path), binary, textfp, text.split(newline)):
+            scene = load(source).create()
+            assert (scene.a, scene.b, scene.children[0].c) == (1, 2, 4)
+
+
+def test_source_error_line(tmp_path, monkeypatch):
+    """错误从记录的位置重新读取原始行，行号与换行符和读取方式无关，可以定位的文本文件不保存行."""
+    errors = []
+    monkeypatch.setattr(pyvoxel.config.Log, 'error', errors.append)
+    lines = ['<Scene(Node)>:', '    a: 1'] + ['    # comment {}'.format(i) for i in range(150)] + ['    b: a +* 2', '    c: 3']
+    for newline in ('\n', '\r\n', '\r', '\n\r'):
+        text = newline.join(lines) + newline
+        path = tmp_path / 'scene.pv'
+        path.write_bytes(text.encode('utf-8'))
+        with open(str(path), encoding='utf-8', newline='') as fp:
+            source = pyvoxel.config.ConfigSource(fp)
+            assert len(list(source)) == len(lines) and not source._lines
+            assert source.line(153) == '    b: a +* 2' and source.line(2) == '    a: 1'
+            fp.seek(0)
+            del errors[:]
+            with contextlib.redirect_stdout(io.StringIO()):
+                Config(cache=False).load(fp)
+            assert errors == ['153     b: a +* 2 Attr is unsafe']
+        for data in (text, str(path), iter(text.split(newline))):
+            del errors[:]
+            with contextlib.redirect_stdout(io.StringIO()):
+                Config(cache=False).load(data)
+            assert errors == ['153     b: a +* 2 Attr is unsafe']
+
+
+def test_fold_constants():
+    """只由常量组成的运算折叠为新的常量，函数调用、列表和不是常量的变量保留在表达式中."""
+    xmap = {'__x0': 'self.a', '__x1': 'self.b'}
+    assert ConfigMethod.fold('__x0 * 2 + __x1', xmap, {}, {'__x0': 3}) == ('__c1 + __x1', {'__x1': 'self.b'}, {'__c1': 6})
+    assert ConfigMethod.fold('__s0 * 2 + __x1', {'__x1': 'self.b'}, {'__s0': 'ab'}, {}) == ('__c1 + __x1', {'__x1': 'self.b'}, {'__c1': 'abab'})
+    assert ConfigMethod.fold('len(__x0) + [__x0][0] + (__x0 - 1) + __x1', xmap, {}, {'__x0': 3}) == \
+        ('len(__x0) + [__x0][0] + __c1 + __x1', {'__x1': 'self.b'}, {'__x0': 3, '__c1': 2})
+    assert ConfigMethod.fold('(__x0, 1)[0] if __x0 > 1 else __x1', xmap, {}, {'__x0': 3}) == \
+        ('__c3 if __c1 else __x1', {'__x1': 'self.b'}, {'__c1': True, '__c3': 3})
+    # 计算出错的运算不折叠，保留到实例中计算时再报错
+    assert ConfigMethod.fold('__x0 / 0 + __x1', xmap, {}, {'__x0': 3}) == ('__x0 / 0 + __x1', {'__x1': 'self.b'}, {'__x0': 3})
+    assert ConfigMethod.fold('__x0 + __x1', xmap, {}, {}) == ('__x0 + __x1', xmap, {})
+
+
+FOLD = '''<Scene(Node)>:
+    a: 3
+    k(static): 4
+    b: 1
+    c: a * 2 + b
+    d: k * k + b
+'''
+
+
+def test_fold_static_attrs(monkeypatch):
+    """默认只折叠static注解的属性，fold为True时折叠所有静态属性，折叠后修改实例中的常量不触发更新."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        scene = Config(cache=False).load(FOLD).children[0]
+        folded = Config(cache=False, fold=True).load(FOLD).children[0]
+    assert scene.attr['c'][3] == (7, ('__x0 * 2 + __x1', {'__x0': 'self.a', '__x1': 'self.b'}, {}))
+    assert scene.attr['d'][3] == (17, ('__c1 + __x2', {'__x2': 'self.b'}, {'__c1': 16}))
+    assert folded.attr['c'][3][1][1] == folded.attr['d'][3][1][1] == {}
+    node = scene.create()
+    node.a, node.k, node.b = 10, 1, 2
+    assert (node.c, node.d) == (22, 18)
+    node = folded.create()
+    node.a, node.k, node.b = 10, 1, 2
+    assert (node.c, node.d) == (7, 17)
+
+    errors = []
+    monkeypatch.setattr(pyvoxel.config.Log, 'error', errors.append)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert Config(cache=False).load(FOLD + '    e: a / 0 + b\n') is None
+    assert errors == ['7     e: a / 0 + b Attr is unsafe']
+
+
+INHERIT = '''<Base(Node)>:
+    a: 1
+    c: b + 1
+    b: a * 2
+    first: c0.v * 10
+    Node:
+        v: 1
+<Scene(Base)>:
+    a: 5
+    Node:
+        v: 7
+<Plain(Base)>:
+    d: 1
+<Override(Base)>:
+    a: 3
+'''
+
+
+def test_inherit_reexecute(monkeypatch):
+    """继承的属性引用的子节点或属性在派生类中改变时，按派生类的结构重新执行，解析时和实例中的值一致."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        base, scene, plain, override = Config(cache=False).load(INHERIT).children
+    assert {name: attr[3][0] for name, attr in scene.attr.items()} == {'a': 5, 'c': 11, 'b': 10, 'first': 70}
+    assert sorted(scene._attr) == ['a', 'b', 'c', 'first'] and sorted(plain._attr) == ['d']  # 结构相同的派生类直接继承
+    node = scene.create()
+    assert (node.b, node.c, node.first) == (10, 11, 70)
+    node.children[0].v = 3
+    node.a = 1
+    assert (node.b, node.c, node.first) == (2, 3, 30)
+    node = plain.create()
+    node.children[0].v = 4
+    node.a = 2
+    assert (node.b, node.c, node.first) == (4, 5, 40)
+    assert sorted(override._attr) == ['a', 'b', 'c']  # 引用了覆盖的属性的属性重新执行
+    node = override.create()
+    assert (node.b, node.c, node.first) == (6, 7, 10)
+    node.a = 4
+    assert (node.b, node.c) == (8, 9)
+
+    errors = []
+    monkeypatch.setattr(pyvoxel.config.Log, 'error', errors.append)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert Config(cache=False).load(INHERIT + '<Bad(Base)>:\n    Node:\n        w: 1\n') is None
+    assert errors == ['16 <Bad(Base)>: Inherited attr first is unsafe']
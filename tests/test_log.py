@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""log模块的测试."""
+import logging
+
+from pyvoxel.log import Log
+
+
+class ListHandler(logging.Handler):
+    """记录格式化后的日志."""
+
+    def __init__(self):
+        """初始化."""
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        """保存格式化后的日志."""
+        self.lines.append(self.format(record))
+
+
+def test_async_format_on_call():
+    """异步日志在调用时合并参数，之后修改参数不影响输出，异常信息保留为文本."""
+    handler = ListHandler()
+    Log.addHandler(handler)
+    Log.start_async()
+    try:
+        values = [1]
+        Log.error('values %s', values)
+        values.append(2)
+        try:
+            raise ValueError('bad')
+        except ValueError:
+            Log.error('failed %d', 3, exc_info=True)
+    finally:
+        Log.stop_async()
+        Log.removeHandler(handler)
+    assert handler.lines[0] == 'values [1]'
+    assert handler.lines[1].startswith('failed 3\nTraceback') and 'ValueError: bad' in handler.lines[1]
+    assert not Log.is_async
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""manager模块的测试."""
+import os
+
+from pyvoxel.log import Log
+from pyvoxel.manager import Manager
+
+
+def make_plugins(path, *names):
+    """在path下生成插件目录."""
+    for name in names:
+        os.makedirs(os.path.join(path, name))
+    return path
+
+
+def test_index_in_cache_dir(tmp_path, monkeypatch):
+    """插件索引保存在用户的缓存目录下，不在插件目录中写文件."""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    plugin_dir = make_plugins(str(tmp_path / 'plugins'), 'foo', 'bar')
+    modules = Manager.scan_index(plugin_dir, 'plugins')
+    assert modules == {'foo': 'plugins.foo.foo', 'bar': 'plugins.bar.bar'}
+    assert sorted(os.listdir(plugin_dir)) == ['bar', 'foo']
+    index_path = Manager.index_path(plugin_dir)
+    assert os.path.dirname(index_path) == str(tmp_path / 'cache' / 'pyvoxel')
+    assert Manager._load_index(index_path, 'plugins', os.stat(plugin_dir).st_mtime_ns) == modules
+
+
+def test_index_not_writable(tmp_path, monkeypatch):
+    """缓存目录不可写时仍然扫描插件，不输出警告."""
+    warnings = []
+    monkeypatch.setattr(Log, 'warning', lambda *args: warnings.append(args))
+    blocked = tmp_path / 'blocked'
+    blocked.write_text('')  # 缓存目录的位置是文件，无法新建目录
+    monkeypatch.setenv('XDG_CACHE_HOME', str(blocked))
+    plugin_dir = make_plugins(str(tmp_path / 'plugins'), 'foo')
+    assert Manager.scan_index(plugin_dir, 'plugins') == {'foo': 'plugins.foo.foo'}
+    assert warnings == []
+    assert sorted(os.listdir(str(tmp_path))) == ['blocked', 'plugins']
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""node模块的测试."""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+
+from pyvoxel.config import Config, ConfigMethod
+from pyvoxel.node import Node
+
+
+def test_update_value_compile_cache():
+    """字符串表达式首次计算时使用共享的编译缓存."""
+    nodes = [Node(), Node()]
+    for node in nodes:
+        object.__setattr__(node, '_reflex', {'y': ('__x0 * 2 + 1', {'__x0': 3})})
+        assert node._update_value('y')
+        assert node.y == 7
+    code = ConfigMethod.CODE_CACHE['__x0 * 2 + 1']
+    assert all(node._reflex['y'][0] is code for node in nodes)
+
+
+SHARED_CHILD = '''<S(Node)>:
+    k: 10
+    y: k * 2
+    Node:
+        b: 1
+<T(S)>:
+    y: c0.b + 100
+<U(T)>:
+    k: 3
+<V(S)>:
+    y: c0.b * 3
+'''
+
+
+def test_trigger_shared_child():
+    """继承的子节点共享触发器，属性改变时只重新计算实例实际使用的表达式."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        root = Config(cache=False).load(SHARED_CHILD)
+    s, t, u, v = (config.create() for config in root.children)
+    for node in (s, t, u, v):
+        node.children[0].b = 50
+    assert (s.y, t.y, u.y, v.y) == (20, 150, 150, 150)
+    for node in (s, t, u, v):
+        node.k = 1
+    assert (s.y, t.y, u.y, v.y) == (2, 150, 150, 150)
+
+
+BATCH = '''<Scene(Node)>:
+    a: 1
+    b: 2
+    c: a + b
+    d: c * 10
+'''
+
+
+def test_batch_coalesce():
+    """批量修改中同一属性的多次修改只处理一次，on_函数得到第一次修改前的值，按首次修改的顺序处理."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        scene = Config(cache=False).load(BATCH).children[0].create()
+    calls = []
+    for name in 'abcd':
+        object.__setattr__(scene, 'on_' + name, lambda ovalue, value, name=name: calls.append((name, ovalue, value)))
+
+    with scene.batch():
+        scene.b = 5
+        scene.a = 3
+        with scene.batch():  # 嵌套的批量修改在最外层结束时处理
+            scene.b = 7
+        scene.a = 4
+        assert calls == [] and scene.c == 3
+    assert calls == [('b', 2, 7), ('a', 1, 4), ('c', 3, 11), ('d', 30, 110)]
+    assert (scene.c, scene.d) == (11, 110)
+
+    del calls[:]
+    scene.a = 0
+    assert calls == [('a', 4, 0), ('c', 11, 7), ('d', 110, 70)]
+
+
+def test_import_without_bulk():
+    """导入配置模块时不导入bulk和numpy，只有开启批量计算时才需要."""
+    code = 'import sys, pyvoxel.config; print("numpy" in sys.modules, "pyvoxel.bulk" in sys.modules)'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True).stdout
+    assert output.split() == ['False', 'False']
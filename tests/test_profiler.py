@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""profiler模块的测试."""
+import contextlib
+import io
+
+from pyvoxel.config import Config
+from pyvoxel.profiler import Profiler
+
+
+CHAIN = '''<Chain(Node)>:
+    a: 1
+    b: a * 2
+    c: b + 1
+    d: 10 // (a - 3)
+'''
+
+
+def test_profiler_report():
+    """统计每个绑定属性的计算和失败次数，以及传播次数、影响的属性数和层数."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        node = Config(cache=False).load(CHAIN).children[0].create()
+    Profiler.reset()
+    node.a = 2
+    assert Profiler.summary['runs'] == 0  # 关闭时不统计
+    with Profiler.profile():
+        node.a = 5
+        node.a = 3
+    node.a = 4
+    assert not Profiler.enabled and (node.b, node.c, node.d) == (8, 9, 10)
+
+    summary = Profiler.summary
+    assert (summary['runs'], summary['affected'], summary['max_affected'], summary['max_depth']) == (2, 6, 3, 2)
+    assert (summary['evaluations'], summary['errors']) == (6, 1)
+    rows = {row['attr']: row for row in Profiler.report()}
+    assert set(rows) == {'b', 'c', 'd'} and all(row['class'] == 'Chain' for row in rows.values())
+    assert [(rows[name]['count'], rows[name]['errors']) for name in 'bcd'] == [(2, 0), (2, 0), (2, 1)]
+    assert rows['d']['mean'] == rows['d']['time'] / 2 and rows['d']['max'] <= rows['d']['time']
+    assert [row['attr'] for row in Profiler.report('errors', limit=1)] == ['d']
+
+    lines = Profiler.format_report('count').splitlines()
+    assert lines[0].split() == ['class', 'attr', 'count', 'errors', 'time', 'mean', 'max']
+    assert sorted(tuple(line.split()[:4]) for line in lines[1:]) == [('Chain', 'b', '2', '0'), ('Chain', 'c', '2', '0'), ('Chain', 'd', '2', '1')]
+    Profiler.reset()
+    assert Profiler.summary['runs'] == 0 and Profiler.report() == []
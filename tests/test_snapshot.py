@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""snapshot模块的测试."""
+import contextlib
+import io
+
+import pytest
+
+from pyvoxel.config import Config
+from pyvoxel.log import Log
+from pyvoxel.snapshot import Snapshot
+
+
+TEXT = '''<Row(Node) -> row>:
+    x: 0
+    spacing: 2
+    Node:
+        index: 1
+        x: p.x + index * p.spacing
+    Node:
+        index: 2
+        x: p.x + index * p.spacing
+'''
+
+
+def save(tmp_path):
+    """保存示例节点树，返回快照路径."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        row = Config(cache=False).load(TEXT).children[0].create()
+    path = str(tmp_path / 'row.pvs')
+    assert Snapshot.save(row, path)
+    return path
+
+
+def test_reader_close_with_children(tmp_path):
+    """children返回复制的列表，持有结果时可以关闭，关闭后仍然可以使用."""
+    reader = Snapshot.open(save(tmp_path))
+    kids = reader.children(0)
+    values = reader.values(1)
+    reader.close()
+    assert kids == [1, 2]
+    assert values[0]['index'] == 1
+
+
+def test_reader_exit_with_column_slice(tmp_path, monkeypatch):
+    """外部引用columns中的切片时，退出with不抛出异常."""
+    warnings = []
+    monkeypatch.setattr(Log, 'warning', lambda *args: warnings.append(args))
+    with Snapshot.open(save(tmp_path)) as reader:
+        parents = reader.columns['parent'][:3]
+    assert parents.tolist() == [-1, 0, 0]
+    assert len(warnings) == 1
+
+
+def test_restore_bindings(tmp_path):
+    """还原的节点共享只读的触发器，修改属性后绑定的属性重新计算."""
+    row = Snapshot.load(save(tmp_path))
+    assert [child.x for child in row.children] == [2, 4]
+    row.x = 10
+    assert [child.x for child in row.children] == [12, 14]
+    with pytest.raises(TypeError):
+        row._trigger['x'] = {}
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""地形插件的测试."""
+import pytest
+
+pytest.importorskip('numpy')
+
+import numpy  # noqa: E402
+
+from pyvoxel.plugins.terrain.chunk import AIR, MATERIAL_DTYPE, ChunkStore  # noqa: E402
+from pyvoxel.plugins.terrain.lod import LodTree, downsample  # noqa: E402
+from pyvoxel.plugins.terrain.terrain import Terrain  # noqa: E402
+
+
+def test_set_air_drops_chunk():
+    """逐个体素挖空的块被删除，修改的块和相邻的块标记为需要重新生成网格."""
+    store = ChunkStore(4)
+    store.fill((0, 0, 0), (8, 4, 4), 1)
+    assert len(store) == 2
+    store.dirty.clear()
+    for x in range(4):
+        for y in range(4):
+            for z in range(4):
+                store.set(x, y, z, AIR)
+    assert list(store.chunks) == [(1, 0, 0)]
+    assert store.dirty == {(0, 0, 0), (1, 0, 0)}
+    assert store.get(0, 0, 0) == AIR and store.get(4, 0, 0) == 1
+
+
+def test_set_air_keeps_mixed_chunk():
+    """还有其他材质的块保留，调色板中残留的材质不影响判断."""
+    store = ChunkStore(4)
+    store.set(1, 1, 1, 2)
+    store.set(2, 2, 2, 3)
+    store.set(1, 1, 1, AIR)
+    assert len(store) == 1
+    store.set(2, 2, 2, AIR)
+    assert len(store) == 0
+
+
+def mesh_key(mesh):
+    """网格中的矩形，[(材质, 法线, 四个顶点)]排序后的列表，和生成的顺序无关."""
+    quads = mesh.vertices.reshape(-1, 4, 3).tolist()
+    return sorted((material, tuple(normal), tuple(map(tuple, quad)))
+                  for material, normal, quad in zip(mesh.materials[::4].tolist(), mesh.normals[::4].tolist(), quads))
+
+
+def test_mesh_greedy():
+    """相邻的相同材质的面合并为一个矩形，块之间相接的面不可见，不合并时每个面一个矩形."""
+    terrain = Terrain(4)
+    terrain.fill((0, 0, 0), (2, 2, 2), 1)
+    mesh = terrain.mesh((0, 0, 0))
+    assert (len(mesh), mesh.triangles) == (24, 12)
+    assert mesh.vertices.min(axis=0).tolist() == [0, 0, 0] and mesh.vertices.max(axis=0).tolist() == [2, 2, 2]
+    assert sorted(map(tuple, mesh.normals[::4].tolist())) == sorted(
+        tuple(sign if n == axis else 0 for n in range(3)) for axis in range(3) for sign in (-1, 1))
+    assert len(terrain.mesh((0, 0, 0), greedy=False)) == 24 * 4
+
+    terrain.set(1, 1, 1, 2)  # 不同的材质不合并，被其他体素挡住的面不可见
+    assert len(terrain.mesh((0, 0, 0))) > 24 and 2 in terrain.mesh((0, 0, 0)).materials
+
+    terrain = Terrain(4)
+    terrain.fill((0, 0, 0), (8, 4, 4), 1)  # 两个块相接的面不可见
+    left, right = terrain.mesh((0, 0, 0)), terrain.mesh((1, 0, 0))
+    assert (len(left), len(right)) == (5 * 4, 5 * 4)
+    assert right.vertices[:, 0].min() == 4 and right.vertices[:, 0].max() == 8
+    assert len(terrain.mesh((2, 0, 0))) == 0
+
+
+def test_scheduler_order_and_budget():
+    """修改后的块按到相机的距离从近到远处理，超过每帧的耗时时至少处理一个块，删除的块同时删除网格."""
+    terrain = Terrain(4)
+    terrain.fill((0, 0, 0), (16, 4, 4), 1)
+    assert terrain.stats()['dirty'] == 4
+    assert terrain.update((100, 0, 0), budget=0) == [(3, 0, 0)]
+    assert terrain.update((100, 0, 0), budget=float('inf')) == [(2, 0, 0), (1, 0, 0), (0, 0, 0)]
+    assert sorted(terrain.meshes) == [(0, 0, 0), (1, 0, 0), (2, 0, 0), (3, 0, 0)]
+    assert terrain.update((0, 0, 0)) == []
+
+    terrain.clear((4, 0, 0), (8, 4, 4))
+    assert terrain.scheduler.order((0, 0, 0)) == [(0, 0, 0), (1, 0, 0), (2, 0, 0)]
+    terrain.update((0, 0, 0), budget=float('inf'))
+    assert sorted(terrain.meshes) == [(0, 0, 0), (2, 0, 0), (3, 0, 0)]
+    assert mesh_key(terrain.meshes[(0, 0, 0)]) == mesh_key(terrain.mesh((0, 0, 0)))
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_workers_match_build(processes):
+    """工作池生成的网格与主线程中生成的相同，完成前重新提交的块只保留最后的结果."""
+    terrain = Terrain(8)
+    terrain.start(workers=2, processes=processes)
+    try:
+        terrain.fill((0, 0, 0), (20, 6, 12), 1)
+        terrain.fill((3, 2, 3), (9, 9, 9), 2)
+        assert sorted(terrain.scheduler.flush()) == sorted(terrain.chunks)
+        workers = terrain.scheduler.workers
+        assert workers.busy == 0 and workers.idle == workers.slots
+        for key in terrain.chunks:
+            assert mesh_key(terrain.meshes[key]) == mesh_key(terrain.mesh(key))
+
+        key = (0, 0, 0)
+        workers.submit(key, terrain.store.padded(key), terrain.store.origin(key))
+        terrain.set(1, 7, 1, 3)
+        workers.submit(key, terrain.store.padded(key), terrain.store.origin(key))
+        assert [mesh_key(mesh) for done, mesh in workers.drain(wait=True)] == [mesh_key(terrain.mesh(key))]
+    finally:
+        terrain.stop()
+    assert terrain.scheduler.workers is None
+
+
+def test_workers_attach_untracked(monkeypatch):
+    """工作进程打开共享内存时不在resource_tracker中登记，共享内存只由创建的进程删除."""
+    from multiprocessing import resource_tracker
+    from pyvoxel.plugins.terrain import worker
+
+    pool = worker.MeshWorkers(4, 1, processes=False)
+    name = pool._memory.name
+    registered = []
+    monkeypatch.setattr(resource_tracker, 'register', lambda name, rtype: registered.append(name))
+    try:
+        worker._attach(name, pool.slots, pool.shape)[1, 2, 3, 4] = 5
+        assert pool._buffer[1, 2, 3, 4] == 5 and registered == []
+    finally:
+        memory, array = worker._attached.pop(name)
+        del array
+        memory.close()
+        pool.close()
+
+
+def test_lod_select():
+    """远处使用合并后降低精度的节点，近处使用原来的块，修改后对应的各层节点同步更新."""
+    assert downsample(numpy.array([1, 1, 1, 1, 2, 2, 0, 0], dtype=MATERIAL_DTYPE).reshape(2, 2, 2), 2).tolist() == [[[1]]]
+    assert downsample(numpy.array([1, 1, 1, 0, 0, 0, 0, 0], dtype=MATERIAL_DTYPE).reshape(2, 2, 2), 2).tolist() == [[[AIR]]]
+
+    terrain = Terrain(4)
+    terrain.lod = LodTree(terrain.store, levels=2, radius=4)
+    terrain.fill((0, 0, 0), (16, 8, 16), 1)
+    assert terrain.select((1000, 0, 1000)) == [(2, (0, 0, 0))]
+    near = terrain.select((0, 0, 0))
+    assert (0, (0, 0, 0)) in near and (2, (0, 0, 0)) not in near
+    assert {level for level, key in near} == {0, 1}
+    far = terrain.lod.mesh(2, (0, 0, 0))
+    assert len(far) == 6 * 4 and far.vertices.max(axis=0).tolist() == [16, 8, 16]
+    assert terrain.stats()['lod'] == [4, 1]
+
+    terrain.clear((0, 0, 0), (16, 8, 16))
+    assert terrain.select((1000, 0, 1000)) == [] and terrain.stats()['lod'] == [0, 0]